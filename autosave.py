@@ -0,0 +1,186 @@
+import os
+import queue
+import tempfile
+import threading
+
+WRITE_CHUNK = 1 << 20   # Characters per write, so the worker never holds the GIL for long
+
+
+def current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Read once at import: os.umask can only be queried by setting it, which is
+# not safe to do from the save worker while other threads create files
+UMASK = current_umask()
+
+
+def atomic_write(path, pieces, binary=False):
+    """Write a Document snapshot to path via a synced temp file and a rename
+
+    Readers (and a crash half way) only ever see the old file or the
+    complete new one.  The original file's permissions are kept and a new
+    file gets the mode open() would give it.  A symlink is followed, so
+    the file it points to is replaced rather than the link.  With binary
+    set the pieces slice bytes and are written untranslated.
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.',
+                                suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as file:
+            for buffer, start, end in pieces:
+                for i in range(start, end, WRITE_CHUNK):
+                    file.write(buffer[i:min(end, i + WRITE_CHUNK)])
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o666 & ~UMASK   # New file
+        try:
+            os.chmod(temp, mode)
+        except OSError:
+            pass
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+
+class SaveQueue:
+    """Write-behind queue of file saves served by one worker thread
+
+    Saves are keyed by path: queuing a path that is still waiting replaces
+    its snapshot, so a burst of saves of one file costs a single write.
+    Each finished write is reported on `results` as (path, token, error).
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = {}       # Path -> (pieces, token), oldest first
+        self.writing = None     # Path the worker is writing right now
+        self.closed = False
+        self.results = queue.Queue()
+        self.thread = None
+
+    def submit(self, path, pieces, token=None):
+        with self.condition:
+            self.pending.pop(path, None)
+            self.pending[path] = (pieces, token)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def busy(self):
+        with self.condition:
+            return bool(self.pending) or self.writing is not None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                path = next(iter(self.pending))
+                pieces, token = self.pending.pop(path)
+                self.writing = path
+            error = None
+            try:
+                atomic_write(path, pieces)
+            except Exception as e:
+                error = e
+            with self.condition:
+                self.writing = None
+            self.results.put((path, token, error))
+
+    def close(self, timeout=None):
+        """Finish the queued writes, then stop the worker"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+
+class AutoSaver:
+    """Saves EditorTabs in the background, on request or once typing pauses
+
+    A save snapshots the editor's Document on the Tk thread (cheap, see
+    Document.snapshot) and hands it to a SaveQueue.  With `enabled` set,
+    every edit restarts an idle timer and after DELAY_MS of quiet all
+    modified editors that have a path are saved.  Finished writes are
+    picked up by an after() poll and reported to on_saved(editor, path,
+    error) on the Tk thread.
+    """
+    DELAY_MS = 1000
+    POLL_MS = 50
+
+    def __init__(self, widget, editors, on_saved=None):
+        self.widget = widget
+        self.editors = editors      # The CodeEditor's live list of EditorTabs
+        self.on_saved = on_saved
+        self.enabled = False
+        self.queue = SaveQueue()
+        self.idle_job = None
+        self.poll_job = None
+
+    def schedule(self):
+        """Edit hook: restart the idle timer"""
+        if not self.enabled:
+            return
+        if self.idle_job is not None:
+            self.widget.after_cancel(self.idle_job)
+        self.idle_job = self.widget.after(self.DELAY_MS, self.save_modified)
+
+    def save_modified(self):
+        self.idle_job = None
+        for editor in self.editors:
+            if editor.file_path and editor.is_modified():
+                self.save(editor)
+
+    def save(self, editor, path=None):
+        """Queue a write of the editor's current content"""
+        path = path or editor.file_path
+        self.queue.submit(path, editor.document.snapshot(), (editor, editor.document.version))
+        if self.poll_job is None:
+            self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        self.poll_job = None
+        while True:
+            try:
+                path, (editor, version), error = self.queue.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is None and editor.file_path == path:
+                editor.saved_version = version
+            if self.on_saved is not None:
+                self.on_saved(editor, path, error)
+        if self.queue.busy() or not self.queue.results.empty():
+            self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+
+    def close(self):
+        """Cancel the timers and flush whatever is still queued"""
+        for job in (self.idle_job, self.poll_job):
+            if job is not None:
+                self.widget.after_cancel(job)
+        self.idle_job = self.poll_job = None
+        self.queue.close()
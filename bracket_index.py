@@ -0,0 +1,372 @@
+import re
+import time
+from bisect import bisect_left
+
+from pygments.token import Token
+
+OPENERS = '([{'
+PAIRS = {'(': ')', '[': ']', '{': '}', ')': '(', ']': '[', '}': '{'}
+BRACKET_RE = re.compile(r'[()\[\]{}]')
+IDENTITY = (0, 0)
+
+
+def summarize(brackets):
+    """(depth change, lowest running depth) over a run of brackets"""
+    depth = low = 0
+    for _, char in brackets:
+        if char in OPENERS:
+            depth += 1
+        else:
+            depth -= 1
+            if depth < low:
+                low = depth
+    return depth, low
+
+
+def combine(left, right):
+    if left is None or right is None:
+        return None
+    return left[0] + right[0], min(left[1], left[0] + right[1])
+
+
+class BracketBlock:
+    """A run of consecutive lines and their bracket lists"""
+    def __init__(self, lines):
+        self.lines = lines      # Per line: (brackets, depth, low, exact) or None
+        self.summary = None
+        self.exact = False
+
+    def refresh(self):
+        summary = IDENTITY
+        self.exact = True
+        for entry in self.lines:
+            if entry is None:
+                self.summary = None
+                self.exact = False
+                return
+            summary = combine(summary, entry[1:3])
+            self.exact = self.exact and entry[3]
+        self.summary = summary
+
+
+class BracketIndex:
+    """Persistent index of bracket positions for an EditorTab
+
+    Lines are grouped into blocks and a segment tree over the blocks keeps
+    each block's line count and bracket summary (depth change and lowest
+    running depth).  Finding the partner of a bracket descends the tree in
+    O(log n) instead of walking the buffer, and an edit only rescans the
+    edited lines.  Brackets inside strings and comments are skipped using
+    the editor's lexer; lines scanned before the highlighter trusted their
+    lexer state are marked inexact and rescanned in the background.
+    """
+    BLOCK_LINES = 128
+    LEX_LIMIT = 4000    # Longer lines (minified files) are scanned without the lexer
+    IDLE_BUDGET = 8     # Milliseconds of background rescanning per run
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.highlighter = editor.highlighter
+        self.text_area = editor.text_area
+        self.scheduler = editor.scheduler
+        self.scheduler.add_task('brackets', self.scan_in_background, interval=50, delay=100,
+                                budget=self.IDLE_BUDGET)
+        self.reset()
+
+    def reset(self):
+        """Forget everything, e.g. after loading a new file"""
+        count = self.editor.document.line_count()
+        self.blocks = [BracketBlock([None] * min(self.BLOCK_LINES, count - start))
+                       for start in range(0, count, self.BLOCK_LINES)]
+        self.rebuild_tree()
+        self.schedule_background()
+
+    # Segment tree over blocks: each node is [line count, summary or None]
+
+    def rebuild_tree(self):
+        size = 1
+        while size < len(self.blocks):
+            size *= 2
+        self.size = size
+        self.tree = [[0, IDENTITY] for _ in range(2 * size)]
+        for i, block in enumerate(self.blocks):
+            self.tree[size + i] = [len(block.lines), block.summary]
+        for node in range(size - 1, 0, -1):
+            self.pull(node)
+
+    def pull(self, node):
+        left, right = self.tree[2 * node], self.tree[2 * node + 1]
+        self.tree[node] = [left[0] + right[0], combine(left[1], right[1])]
+
+    def update_block(self, index):
+        node = self.size + index
+        block = self.blocks[index]
+        self.tree[node] = [len(block.lines), block.summary]
+        node //= 2
+        while node:
+            self.pull(node)
+            node //= 2
+
+    def locate(self, lineno):
+        """(block index, line within block) for a 0-based line"""
+        node = 1
+        while node < self.size:
+            left = self.tree[2 * node][0]
+            if lineno < left:
+                node = 2 * node
+            else:
+                lineno -= left
+                node = 2 * node + 1
+        return node - self.size, lineno
+
+    # Keeping the index in step with the buffer
+
+    def on_edit(self, first, old_last, new_last):
+        """Edit listener: splice the edited lines out and unknown lines in"""
+        index, offset = self.locate(first - 1)
+        removed = old_last - first + 1
+        added = new_last - first + 1
+        reshaped = False
+        block = self.blocks[index]
+        # An edit spanning several blocks folds them into the first one
+        while len(block.lines) - offset < removed and index + 1 < len(self.blocks):
+            block.lines.extend(self.blocks.pop(index + 1).lines)
+            reshaped = True
+        block.lines[offset:offset + removed] = [None] * added
+        block.summary = None
+        if len(block.lines) > 2 * self.BLOCK_LINES:
+            lines = block.lines
+            block.lines = lines[:self.BLOCK_LINES]
+            self.blocks[index + 1:index + 1] = [
+                BracketBlock(lines[start:start + self.BLOCK_LINES])
+                for start in range(self.BLOCK_LINES, len(lines), self.BLOCK_LINES)]
+            reshaped = True
+        if reshaped:
+            self.rebuild_tree()
+        else:
+            self.update_block(index)
+        self.schedule_background()
+
+    def line_offset(self, index):
+        """First line of a block, walking up the tree"""
+        node = self.size + index
+        lines = 0
+        while node > 1:
+            if node % 2:
+                lines += self.tree[node - 1][0]
+            node //= 2
+        return lines
+
+    def invalidate_line(self, lineno):
+        """The lexer state at the start of a line changed; rescan it later"""
+        if lineno >= self.tree[1][0]:
+            return
+        index, offset = self.locate(lineno)
+        block = self.blocks[index]
+        if block.lines[offset] is not None:
+            block.lines[offset] = None
+            block.summary = None
+            self.update_block(index)
+            self.schedule_background()
+
+    def schedule_background(self):
+        self.scheduler.mark('brackets')
+
+    def scan_in_background(self, deadline):
+        """Fill in unknown lines and redo inexact ones the lexer now trusts"""
+        frontier = self.highlighter.frontier if self.highlighter.stateful else self.tree[1][0]
+        unfinished = False
+        start = 0
+        for index, block in enumerate(self.blocks):
+            if time.perf_counter() >= deadline:
+                unfinished = True
+                break
+            if block.summary is None or (not block.exact and start < frontier):
+                for offset, entry in enumerate(block.lines):
+                    if entry is None or (not entry[3] and start + offset < frontier):
+                        block.lines[offset] = self.scan_line(start + offset)
+                block.refresh()
+                self.update_block(index)
+            unfinished = unfinished or not block.exact
+            start += len(block.lines)
+        return unfinished
+
+    def scan_line(self, lineno):
+        """(brackets, depth, low, exact) for one line"""
+        text = self.highlighter.get_line(lineno)
+        exact = True
+        if len(text) > self.LEX_LIMIT:
+            brackets = [(m.start(), m.group()) for m in BRACKET_RE.finditer(text)]
+        else:
+            brackets = []
+            for pos, tokentype, value in self.highlighter.line_tokens(lineno):
+                if tokentype in Token.Literal.String or tokentype in Token.Comment:
+                    continue
+                for m in BRACKET_RE.finditer(value):
+                    brackets.append((pos + m.start(), m.group()))
+            exact = not self.highlighter.stateful or lineno < self.highlighter.frontier
+        depth, low = summarize(brackets)
+        return brackets, depth, low, exact
+
+    def entry(self, index, offset, start):
+        """Line entry, scanning the line if it is unknown"""
+        block = self.blocks[index]
+        entry = block.lines[offset]
+        if entry is None:
+            entry = block.lines[offset] = self.scan_line(start + offset)
+        return entry
+
+    def ensure_block(self, index):
+        """Make sure a block's summary is known"""
+        block = self.blocks[index]
+        if block.summary is None:
+            start = self.line_offset(index)
+            for offset in range(len(block.lines)):
+                self.entry(index, offset, start)
+            block.refresh()
+            self.update_block(index)
+        return block.summary
+
+    # Queries
+
+    def match(self, lineno, col):
+        """Partner of the bracket at 0-based (lineno, col), or None
+
+        Returns (lineno, col) of the partner.  A partner of a different kind
+        (e.g. "(" closed by "]") counts as no match.
+        """
+        if lineno >= self.tree[1][0]:
+            return None
+        index, offset = self.locate(lineno)
+        start = lineno - offset
+        brackets = self.entry(index, offset, start)[0]
+        i = bisect_left(brackets, (col,))
+        if i == len(brackets) or brackets[i][0] != col:
+            return None
+        char = brackets[i][1]
+        if char in OPENERS:
+            found = self.find_forward(index, offset, start, brackets, i + 1)
+        else:
+            found = self.find_backward(index, offset, start, brackets, i)
+        if found and PAIRS[char] == found[2]:
+            return found[:2]
+        return None
+
+    def find_forward(self, index, offset, start, brackets, i):
+        """Walk forward from brackets[i] until the depth first drops below zero"""
+        hit, depth = scan_forward(brackets, i, len(brackets), 0)
+        while hit is None:
+            block = self.blocks[index]
+            for line in range(offset + 1, len(block.lines)):
+                entry = self.entry(index, line, start)
+                if depth + entry[2] < 0:
+                    offset = line
+                    hit, _ = scan_forward(entry[0], 0, len(entry[0]), depth)
+                    break
+                depth += entry[1]
+            else:
+                # Skip whole blocks through the tree
+                found = self.next_block(index, depth)
+                if found is None:
+                    return None
+                index, depth = found
+                start, offset = self.line_offset(index), -1
+        return (start + offset,) + hit
+
+    def find_backward(self, index, offset, start, brackets, i):
+        """Walk backward from brackets[i] until an unmatched opener turns up"""
+        hit, depth = scan_backward(brackets, 0, i, 0)
+        while hit is None:
+            block = self.blocks[index]
+            for line in range(offset - 1, -1, -1):
+                entry = self.entry(index, line, start)
+                if depth + entry[2] - entry[1] < 0:
+                    offset = line
+                    hit, _ = scan_backward(entry[0], 0, len(entry[0]), depth)
+                    break
+                depth -= entry[1]
+            else:
+                found = self.prev_block(index, depth)
+                if found is None:
+                    return None
+                index, depth = found
+                start = self.line_offset(index)
+                offset = len(self.blocks[index].lines)
+        return (start + offset,) + hit
+
+    def next_block(self, index, depth):
+        """First block after index where depth drops below zero, and the depth entering it"""
+        for node in self.range_nodes(index + 1, len(self.blocks)):
+            found, depth = self.descend(node, depth, forward=True)
+            if found is not None:
+                return found, depth
+        return None
+
+    def prev_block(self, index, depth):
+        for node in reversed(self.range_nodes(0, index)):
+            found, depth = self.descend(node, depth, forward=False)
+            if found is not None:
+                return found, depth
+        return None
+
+    def range_nodes(self, lo, hi):
+        """Canonical tree nodes covering blocks lo..hi-1, left to right"""
+        left, right = [], []
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo % 2:
+                left.append(lo)
+                lo += 1
+            if hi % 2:
+                hi -= 1
+                right.append(hi)
+            lo //= 2
+            hi //= 2
+        return left + right[::-1]
+
+    def descend(self, node, depth, forward):
+        """Find the block under node where depth goes negative, or skip it"""
+        summary = self.tree[node][1]
+        if summary is None:
+            if node >= self.size:
+                summary = self.ensure_block(node - self.size)
+            else:
+                children = (2 * node, 2 * node + 1) if forward else (2 * node + 1, 2 * node)
+                for child in children:
+                    found, depth = self.descend(child, depth, forward)
+                    if found is not None:
+                        return found, depth
+                return None, depth
+        change, low = summary
+        reach = low if forward else low - change
+        if depth + reach >= 0:
+            return None, depth + change if forward else depth - change
+        if node >= self.size:
+            return node - self.size, depth
+        children = (2 * node, 2 * node + 1) if forward else (2 * node + 1, 2 * node)
+        for child in children:
+            found, depth = self.descend(child, depth, forward)
+            if found is not None:
+                return found, depth
+        return None, depth
+
+
+def scan_forward(brackets, lo, hi, depth):
+    """(col, char) where depth first drops below zero, and the depth reached"""
+    for index in range(lo, hi):
+        pos, char = brackets[index]
+        depth += 1 if char in OPENERS else -1
+        if depth < 0:
+            return (pos, char), depth
+    return None, depth
+
+
+def scan_backward(brackets, lo, hi, depth):
+    """(col, char) of the first unmatched opener going backward, and the depth"""
+    for index in range(hi - 1, lo - 1, -1):
+        pos, char = brackets[index]
+        depth += -1 if char in OPENERS else 1
+        if depth < 0:
+            return (pos, char), depth
+    return None, depth
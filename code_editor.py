@@ -6,19 +6,115 @@ from pygments.styles import get_style_by_name
 import re
 import subprocess
 import os
-from pathlib import Path
 import platform
+import queue
+from syntax_highlighter import SyntaxHighlighter, get_lexer_for_file
+from gutter import LineNumberGutter
+from minimap import Minimap
+from bracket_index import BracketIndex
+from document import Document
+from large_file import LargeFileViewer, LARGE_FILE_SIZE
+from trigram_index import TrigramIndex
+from search_engine import SearchEngine
+from file_explorer import LazyFileTree
+from fs_watcher import FileWatcher
+from render_scheduler import RenderScheduler
+from autosave import AutoSaver
+from git_status import GitStatusService
+from symbol_index import SymbolIndex
+from completion import WordIndex, Completer
+from find import FindEngine
+from tab_manager import TabManager, TabSnapshot, UndoLog
+from folding import FoldIndex
+from diagnostics import LintService, Linter
+from profiler import ProfilerPanel
+from lsp_client import LspManager, LanguageServerPanel
+from git_diff import GitBlobStore, LineDiff
+from replace_files import ReplacePreviewJob, VirtualList, start_apply, start_undo
+from terminal import TerminalPanel
 
 class EditorTab(ttk.Frame):
     """Class to handle individual editor tabs"""
-    def __init__(self, parent, theme):
+    def __init__(self, parent, theme, words=None, lint=None):
         super().__init__(parent)
         self.theme = theme
         self.modified = False
         self.filename = "Untitled"
+        self.file_path = None
+        self.document = Document()
+        self.saved_version = self.document.version
+        self.words = words if words is not None else WordIndex()
+        self.lint = lint  # Shared LintService, or None not to check
+        self.diagnostics = {}  # Live diagnostic -> as shown in the Problems panel
+        self.heat = {}  # 0-based line -> share of the last profiled run spent on it
+        self.lsp = None  # LspDocument while a language server follows the file
+        self.diff = None  # LineDiff against git HEAD while the file is on disk
+        self.snapshot = None    # TabSnapshot while hibernated
+        self.undo_log = UndoLog()  # The user's undo and redo groups, rebuilt into Tk on waking
+        self.build()
+
+    def build(self):
+        """Create the widgets and the components that work on them"""
+        self.tracking = True
+        self.replaying = False  # Inside Tk's undo or redo, which the UndoLog records itself
+        self.edit_listeners = []
+        self.cursor_listeners = []
+        self.bracket_pair = ()
+        self.scheduler = RenderScheduler(self)
+        self.scheduler.add_task('bracket_match', self.highlight_matching_bracket)
         self.create_editor()
         self.configure_tags()  # Move tags configuration here
         self.setup_keyboard_shortcuts()  # Move shortcuts to EditorTab
+        self.setup_edit_tracking()
+        self.highlighter = SyntaxHighlighter(self)
+        self.add_edit_listener(self.highlighter.on_edit)
+        self.folds = FoldIndex(self)
+        self.highlighter.folds = self.folds
+        self.add_edit_listener(self.folds.on_edit)
+        self.add_edit_listener(self.on_lines_changed)
+        self.add_edit_listener(self.shift_heat)
+        self.minimap = Minimap(self.text_area.master, self)
+        self.minimap.pack(side='right', fill='y', before=self.text_area)
+        self.add_edit_listener(self.minimap.on_edit)
+        self.highlighter.state_listeners.append(self.minimap.invalidate_line)
+        self.brackets = BracketIndex(self)
+        self.add_edit_listener(self.brackets.on_edit)
+        self.highlighter.state_listeners.append(self.brackets.invalidate_line)
+        self.add_cursor_listener(self.schedule_bracket_match)
+        self.completer = Completer(self, self.words)
+        self.finder = FindEngine(self)
+        self.linter = Linter(self, self.lint)
+        self.add_edit_listener(self.linter.on_edit)
+
+    @property
+    def hibernated(self):
+        return self.snapshot is not None
+
+    def hibernate(self):
+        """Destroy the widgets, keeping the Document and a compact TabSnapshot"""
+        if self.snapshot is None:
+            self.snapshot = TabSnapshot.capture(self)
+            self.teardown()
+
+    def rehydrate(self):
+        """Rebuild the widgets of a hibernated tab as they were"""
+        snapshot, self.snapshot = self.snapshot, None
+        if snapshot is not None:
+            self.build()
+            self.show_document()
+            snapshot.restore(self)
+
+    def teardown(self):
+        self.scheduler.cancel()
+        self.finder.destroy()
+        self.linter.destroy()
+        self.completer.destroy()
+        try:
+            self.tk.deletecommand(str(self.text_area))
+        except tk.TclError:
+            pass
+        for child in self.winfo_children():
+            child.destroy()
 
     def create_editor(self):
         # Editor container with gutter
@@ -26,21 +122,8 @@ class EditorTab(ttk.Frame):
         editor_container.pack(fill='both', expand=True)
 
         # Left gutter for line numbers
-        gutter = ttk.Frame(editor_container, width=50)
+        gutter = ttk.Frame(editor_container)
         gutter.pack(side='left', fill='y')
-        gutter.pack_propagate(False)
-
-        # Line numbers
-        self.line_numbers = tk.Text(gutter,
-            width=4,
-            padx=5,
-            pady=5,
-            bg=self.theme['bg'],
-            fg='#858585',
-            relief='flat',
-            state='disabled',
-            font=('Consolas', 12))
-        self.line_numbers.pack(fill='both', expand=True)
 
         # Editor area
         editor_frame = ttk.Frame(editor_container)
@@ -57,9 +140,14 @@ class EditorTab(ttk.Frame):
             pady=8,
             font=('Consolas', 12),
             spacing1=2,
-            undo=True)
+            undo=True,
+            autoseparators=False)  # The UndoLog places separators
         self.text_area.pack(fill='both', expand=True, side='left')
 
+        # Line numbers, drawn only for the visible rows
+        self.line_numbers = LineNumberGutter(gutter, self, self.theme)
+        self.line_numbers.pack(fill='both', expand=True)
+
         # Scrollbars
         v_scroll = ttk.Scrollbar(editor_container, orient='vertical', 
                                command=self.text_area.yview)
@@ -70,29 +158,161 @@ class EditorTab(ttk.Frame):
         h_scroll.pack(side='bottom', fill='x')
         
         # Configure scrolling
+        self.v_scroll = v_scroll
         self.text_area.configure(
-            yscrollcommand=v_scroll.set,
+            yscrollcommand=self.on_text_scroll,
             xscrollcommand=h_scroll.set
         )
-        self.line_numbers.configure(yscrollcommand=v_scroll.set)
         v_scroll.configure(command=self.sync_scroll)
+        self.text_area.bind('<Configure>', lambda e: self.apply_syntax_highlighting(), add='+')
 
     def sync_scroll(self, *args):
-        """Synchronize scrolling between line numbers and text area"""
-        self.line_numbers.yview_moveto(args[1])
-        self.text_area.yview_moveto(args[1])
+        """Scroll the text area; the gutter follows through on_text_scroll"""
+        self.text_area.yview(*args)
+
+    def on_text_scroll(self, first, last):
+        """Keep the scrollbar in sync and refresh whatever scrolled into view"""
+        self.v_scroll.set(first, last)
+        self.line_numbers.schedule_redraw()
+        self.minimap.schedule_refresh()
+        self.finder.schedule()
+        self.apply_syntax_highlighting()
+
+    def setup_edit_tracking(self):
+        """Route the text widget's Tcl command through dispatch_text_command
+
+        Every insert, delete and replace (including undo/redo, which Tk replays
+        through the same command) is applied to the document and reported to
+        the edit listeners as the range of lines it replaced.
+        """
+        widget = str(self.text_area)
+        self.text_area_cmd = widget + '_orig'
+        self.tk.call('rename', widget, self.text_area_cmd)
+        self.tk.createcommand(widget, self.dispatch_text_command)
+
+    def add_edit_listener(self, callback):
+        """Register callback(first, old_last, new_last) for edits
+
+        Lines first..old_last (1-based, inclusive) were replaced by first..new_last.
+        """
+        self.edit_listeners.append(callback)
+
+    def add_cursor_listener(self, callback):
+        """Register callback() for whenever the insert mark may have moved"""
+        self.cursor_listeners.append(callback)
+
+    def dispatch_text_command(self, operation, *args):
+        """Forward a widget command to the real text widget, reporting edits"""
+        edit = None
+        try:
+            if not self.tracking:
+                return self.tk.call((self.text_area_cmd, operation) + args)
+            if operation == 'edit' and args:
+                return self.dispatch_edit_command(*args)
+            if operation == 'insert' and len(args) >= 2:
+                start = self.resolve_index(args[0])
+                edit = (start, start, ''.join(args[1::2]))
+            elif operation == 'delete' and len(args) > 2:
+                # Several ranges: delete them back to front, one at a time
+                ranges = [(self.resolve_index(a), self.resolve_index(b))
+                          for a, b in zip(args[::2], args[1::2])]
+                if len(args) % 2:
+                    last = self.resolve_index(args[-1])
+                    ranges.append((last, self.resolve_index(f'{last}+1c')))
+                ranges.sort(key=lambda r: tuple(map(int, r[0].split('.'))), reverse=True)
+                for first, last in ranges:
+                    self.dispatch_text_command('delete', first, last)
+                return ''
+            elif operation in ('delete', 'replace') and args:
+                start = self.resolve_index(args[0])
+                end = self.resolve_index(args[1] if len(args) > 1 else f'{start}+1c')
+                text = ''.join(args[2::2]) if operation == 'replace' else ''
+                if self.tk.call(self.text_area_cmd, 'compare', end, '>', start) or text:
+                    edit = (start, end, text)
+            if edit:
+                start, end, text = edit
+                first, start_col = map(int, start.split('.'))
+                old_last, end_col = map(int, end.split('.'))
+                new_group = not self.replaying and self.undo_log.begins_group(
+                    first - 1, start_col, old_last - 1, end_col, text)
+                if new_group:
+                    self.tk.call(self.text_area_cmd, 'edit', 'separator')
+            result = self.tk.call((self.text_area_cmd, operation) + args)
+        except tk.TclError:
+            return ''
+        if edit:
+            new_last = first + text.count('\n')
+            change = self.document.replace_range(first - 1, start_col, old_last - 1, end_col, text)
+            if not self.replaying:
+                self.undo_log.record(change, new_group)
+            for callback in self.edit_listeners:
+                callback(first, old_last, new_last)
+        if edit or (operation == 'mark' and args[:2] == ('set', 'insert')):
+            for callback in self.cursor_listeners:
+                callback()
+        return result
+
+    def dispatch_edit_command(self, command, *args):
+        """Forward an 'edit' widget command, keeping the UndoLog in step with Tk"""
+        log = self.undo_log
+        if command in ('undo', 'redo'):
+            if not (log.undo if command == 'undo' else log.redo):
+                return ''
+            self.replaying = True
+            try:
+                self.tk.call(self.text_area_cmd, 'edit', command)
+            finally:
+                self.replaying = False
+            if command == 'undo':
+                log.undone()
+            else:
+                log.redone()
+            return ''
+        if command == 'separator':
+            log.separate()
+        elif command == 'reset':
+            log.clear()
+        return self.tk.call((self.text_area_cmd, 'edit', command) + args)
+
+    def resolve_index(self, index):
+        """Turn any text index into line.col, clamped before the final newline"""
+        index = self.tk.call(self.text_area_cmd, 'index', index)
+        if self.tk.call(self.text_area_cmd, 'compare', index, '>=', 'end'):
+            index = self.tk.call(self.text_area_cmd, 'index', 'end-1c')
+        return str(index)
+
+    def destroy(self):
+        if self.snapshot is None:
+            self.teardown()
+        super().destroy()
+
+    def is_modified(self):
+        """Whether the buffer changed since it was last loaded or saved"""
+        return self.document.version != self.saved_version
 
     def update_line_numbers(self):
-        """Update the line numbers"""
-        self.line_numbers.config(state='normal')
-        self.line_numbers.delete('1.0', tk.END)
-        
-        text_content = self.text_area.get('1.0', tk.END)
-        num_lines = text_content.count('\n') + 1
-        line_numbers = '\n'.join(str(i).rjust(3) for i in range(1, num_lines))
-        
-        self.line_numbers.insert('1.0', line_numbers)
-        self.line_numbers.config(state='disabled')
+        """Redraw the gutter if the visible rows or line count changed"""
+        self.line_numbers.schedule_redraw()
+
+    def on_lines_changed(self, first, old_last, new_last):
+        """Edit listener: the gutter only cares when the line count moves"""
+        if old_last != new_last:
+            self.line_numbers.schedule_redraw()
+
+    def set_heat(self, heat):
+        """Show profiler heat ({0-based line: fraction}) in the gutter"""
+        self.heat = heat
+        if self.snapshot is None:
+            self.line_numbers.schedule_redraw(force=True)
+
+    def shift_heat(self, first, old_last, new_last):
+        """Edit listener: heat follows its lines and leaves edited ones"""
+        if not self.heat:
+            return
+        start, old_end, delta = first - 1, old_last - 1, new_last - old_last
+        self.heat = {line if line < start else line + delta: fraction
+                     for line, fraction in self.heat.items()
+                     if line < start or line > old_end}
 
     def configure_tags(self):
         """Configure syntax highlighting tags"""
@@ -110,11 +330,88 @@ class EditorTab(ttk.Frame):
         current_line = self.text_area.index('insert').split('.')[0]
         self.text_area.tag_add('current_line', f'{current_line}.0', f'{current_line}.end+1c')
 
+    def schedule_bracket_match(self):
+        self.scheduler.mark('bracket_match')
+
+    def highlight_matching_bracket(self):
+        """Tag the bracket at (or just before) the cursor and its partner only"""
+        for start in self.bracket_pair:
+            self.text_area.tag_remove('matching_bracket', start, f'{start}+1c')
+        self.bracket_pair = ()
+        line, col = map(int, self.text_area.index('insert').split('.'))
+        for candidate in (col, col - 1):
+            if candidate < 0:
+                continue
+            partner = self.brackets.match(line - 1, candidate)
+            if partner:
+                self.bracket_pair = (f'{line}.{candidate}', f'{partner[0] + 1}.{partner[1]}')
+                for start in self.bracket_pair:
+                    self.text_area.tag_add('matching_bracket', start, f'{start}+1c')
+                return
+
     def apply_syntax_highlighting(self):
-        """Apply syntax highlighting to the current content"""
-        content = self.text_area.get('1.0', tk.END)
-        # Add syntax highlighting implementation here
-        pass
+        """Highlight the visible lines; edits are tracked by the highlighter"""
+        self.highlighter.schedule()
+
+    def load_text(self, text):
+        """Replace the whole buffer, e.g. with a file's contents"""
+        if self.snapshot is not None:
+            # Hibernated: the view is rebuilt from the document later
+            self.document.reset(text)
+            self.snapshot = TabSnapshot()
+            self.undo_log.clear()
+            if self.lsp is not None:
+                self.lsp.reset()
+            if self.diff is not None:
+                self.diff.reset()
+            return
+        self.tracking = False
+        try:
+            self.text_area.delete('1.0', tk.END)
+            self.text_area.insert('1.0', text)
+        finally:
+            self.tracking = True
+        self.text_area.edit_reset()  # Clears the UndoLog too
+        self.document.reset(text)
+        if self.lsp is not None:
+            self.lsp.reset()
+        if self.diff is not None:
+            self.diff.reset()
+        self.reset_view()
+
+    def show_document(self):
+        """Fill a freshly built view from the Document, leaving it untouched"""
+        self.tracking = False
+        try:
+            self.text_area.insert('1.0', self.document.get_text())
+        finally:
+            self.tracking = True
+        self.text_area.edit_reset()
+        if self.file_path:
+            self.highlighter.set_lexer(get_lexer_for_file(self.file_path))
+            self.folds.python = self.file_path.endswith(('.py', '.pyw'))
+            self.linter.python = self.folds.python
+        self.reset_view()
+
+    def reset_view(self):
+        """Let every component start over on the current document"""
+        self.highlighter.reset()
+        self.folds.reset()
+        self.minimap.reset()
+        self.brackets.reset()
+        self.completer.reset()
+        self.linter.reset()
+        self.line_numbers.schedule_redraw(force=True)
+
+    def set_language(self, filename):
+        """Pick the lexer for a file and re-highlight from scratch"""
+        if self.snapshot is not None:
+            return  # Picked up from file_path when the tab wakes up
+        self.highlighter.set_lexer(get_lexer_for_file(filename))
+        self.folds.set_python(filename.endswith(('.py', '.pyw')))
+        self.linter.set_python(self.folds.python)
+        self.minimap.reset()
+        self.brackets.reset()
 
     def setup_keyboard_shortcuts(self):
         """Setup keyboard shortcuts for this editor tab"""
@@ -123,6 +420,8 @@ class EditorTab(ttk.Frame):
         self.text_area.bind('<Control-f>', lambda e: self.master.master.show_find_dialog())
         self.text_area.bind('<Control-z>', lambda e: self.text_area.edit_undo())
         self.text_area.bind('<Control-y>', lambda e: self.text_area.edit_redo())
+        self.text_area.bind('<Control-bracketleft>', lambda e: self.folds.fold_at_cursor())
+        self.text_area.bind('<Control-bracketright>', lambda e: self.folds.unfold_at_cursor())
 
 
 class CodeEditor(ttk.Frame):
@@ -134,10 +433,31 @@ class CodeEditor(ttk.Frame):
         self.toolbar_buttons = []  # Store toolbar buttons
         self.current_project = None
         self.search_results = []
-        self.problems = []
+        self.search_index = None
+        self.symbol_index = None
+        self.words = WordIndex()  # Completion words shared by all editor tabs
+        self.search_engine = SearchEngine()
+        self.search_job = None
+        self.search_poll = None
+        self.replace_job = None
+        self.replace_poll = None
+        self.replace_plans = []  # (path, hash) of the previewed files
+        self.replace_args = None  # (query, regex, replacement) they were planned with
+        self.watcher = None
+        self.git_status = None
+        self.git_rows = {}  # Path -> changes_list item
+        self.problem_rows = {}  # EditorTab -> {diagnostic: problems_list item}
+        self.problem_items = {}  # problems_list item -> (EditorTab, diagnostic)
+        self.lint = LintService(self.search_engine.get_pool, self.update_problems)
+        self.blobs = GitBlobStore()  # HEAD contents for the diff gutter
+        self.lsp = LspManager(self, root_getter=lambda: self.current_project,
+                              on_status=lambda client: self.lsp_panel.refresh())
         self.terminal_process = None
         self.current_panel = None  # Track current visible panel
         self.editors = []  # Store editor tabs
+        self.editor_settings = None  # Last settings saved in the Settings tab
+        self.tabs = TabManager(on_rehydrate=self.on_rehydrate)
+        self.autosaver = AutoSaver(self, self.editors, self.on_file_saved)
         self.minimap = tk.Canvas(self, width=100, bg='#1e1e1e', highlightthickness=0)  # Initialize minimap attribute
         self.create_main_layout()
         self.file_label = ttk.Label(self)  # Initialize file_label to avoid AttributeError
@@ -212,12 +532,15 @@ class CodeEditor(ttk.Frame):
         self.file_tree = ttk.Treeview(explorer, show='tree')
         self.file_tree.pack(fill='both', expand=True)
         self.file_tree.bind('<Double-1>', self.open_selected_file)
+        self.file_explorer = LazyFileTree(self.file_tree)
 
     def create_editor_area(self):
         """Create main editor area with tabs"""
         # Editor tabs
         self.editor_tabs = ttk.Notebook(self.editor_container)
         self.editor_container.add(self.editor_tabs, weight=3)
+        # Waking a hibernated tab up happens on the way through get_current_editor
+        self.editor_tabs.bind('<<NotebookTabChanged>>', lambda e: self.get_current_editor())
 
         # Welcome page
         self.create_welcome_page()
@@ -238,37 +561,20 @@ class CodeEditor(ttk.Frame):
         self.problems_panel = ttk.Frame(bottom_panel)
         bottom_panel.add(self.problems_panel, text="Problems")
         self.problems_list = ttk.Treeview(self.problems_panel, 
-            columns=('severity', 'message', 'file', 'line'))
+            columns=('severity', 'message', 'file', 'line'), show='headings')
+        for column, width in (('severity', 70), ('message', 400), ('file', 150), ('line', 50)):
+            self.problems_list.heading(column, text=column.title())
+            self.problems_list.column(column, width=width, stretch=column == 'message')
         self.problems_list.pack(fill='both', expand=True)
+        self.problems_list.bind('<Double-1>', self.open_problem)
 
         # Output panel
         self.output = tk.Text(bottom_panel, height=8)
         bottom_panel.add(self.output, text="Output")
 
     def create_terminal(self, parent):
-        """Create interactive terminal"""
-        terminal_frame = ttk.Frame(parent)
-        
-        # Terminal output
-        terminal_output = tk.Text(terminal_frame,
-            bg='#1e1e1e',
-            fg='#d4d4d4',
-            insertbackground='#d4d4d4',
-            font=('Consolas', 10))
-        terminal_output.pack(fill='both', expand=True)
-
-        # Command input
-        cmd_frame = ttk.Frame(terminal_frame)
-        cmd_frame.pack(fill='x')
-        
-        prompt = ttk.Label(cmd_frame, text="➜")
-        prompt.pack(side='left')
-        
-        cmd_input = ttk.Entry(cmd_frame)
-        cmd_input.pack(side='left', fill='x', expand=True)
-        cmd_input.bind('<Return>', lambda e: self.execute_terminal_command(cmd_input.get()))
-
-        return terminal_frame
+        """Create interactive terminals, each running a persistent shell"""
+        return TerminalPanel(parent, lambda: self.current_project)
 
     def create_search_panel(self):
         """Create search in files panel"""
@@ -284,10 +590,48 @@ class CodeEditor(ttk.Frame):
         
         ttk.Button(search_frame, text="Find", 
                   command=self.search_in_files).pack(side='left')
+        ttk.Button(search_frame, text="Cancel",
+                  command=lambda: (self.cancel_search(), self.cancel_replace())).pack(side='left')
+        self.search_input.bind('<Return>', lambda e: self.search_in_files())
+
+        options = ttk.Frame(search)
+        options.pack(fill='x')
+        self.search_regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options, text="Regex", variable=self.search_regex_var).pack(side='left')
+        self.search_symbols_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options, text="Symbols", variable=self.search_symbols_var).pack(side='left')
+        self.search_status = ttk.Label(options, text="")
+        self.search_status.pack(side='left', padx=5)
+
+        # Replace in files: preview, apply (journaled) and undo
+        replace_frame = ttk.Frame(search)
+        replace_frame.pack(fill='x')
+        self.replace_input = ttk.Entry(replace_frame)
+        self.replace_input.pack(side='left', fill='x', expand=True)
+        ttk.Button(replace_frame, text="Preview",
+                  command=self.preview_replace).pack(side='left')
+        ttk.Button(replace_frame, text="Apply",
+                  command=self.apply_replace).pack(side='left')
+        ttk.Button(replace_frame, text="Undo",
+                  command=self.undo_replace).pack(side='left')
 
         # Results
-        self.search_results_tree = ttk.Treeview(search)
+        self.search_results_tree = ttk.Treeview(search, columns=('file', 'line', 'text'),
+                                                show='headings')
+        for column, width in (('file', 150), ('line', 50), ('text', 250)):
+            self.search_results_tree.heading(column, text=column.title())
+            self.search_results_tree.column(column, width=width, stretch=column == 'text')
         self.search_results_tree.pack(fill='both', expand=True)
+        self.search_results_tree.bind('<Double-1>', self.open_search_result)
+
+        self.replace_preview = ttk.Frame(search)
+        self.replace_list = VirtualList(self.replace_preview,
+                                        on_activate=lambda location: self.open_location(*location))
+        preview_scroll = ttk.Scrollbar(self.replace_preview, orient='vertical',
+                                       command=self.replace_list.yview)
+        self.replace_list.yscrollcommand = preview_scroll.set
+        preview_scroll.pack(side='right', fill='y')
+        self.replace_list.pack(fill='both', expand=True)
 
     def create_git_panel(self):
         """Create source control panel"""
@@ -312,15 +656,38 @@ class CodeEditor(ttk.Frame):
         """Create extensions panel"""
         extensions = ttk.Frame(self.side_panel)
         self.side_panel.add(extensions, text="Extensions")
-        # Add extensions panel implementation here
-        pass
+        self.lsp_panel = LanguageServerPanel(extensions, self.lsp, lambda: self.editors)
+        self.lsp_panel.pack(fill='both', expand=True)
 
     def create_debug_panel(self):
         """Create debug panel"""
         debug = ttk.Frame(self.side_panel)
         self.side_panel.add(debug, text="Run and Debug")
-        # Add debug panel implementation here
-        pass
+        self.profiler = ProfilerPanel(debug, self.profile_target, self.show_profile,
+                                      lambda text: self.output.insert('end', text),
+                                      self.open_profiled_location)
+        self.profiler.pack(fill='both', expand=True)
+
+    def profile_target(self):
+        """(path, modified) of the file to run under the profiler, or None"""
+        editor = self.get_current_editor()
+        if editor is None or not editor.file_path:
+            return None
+        return editor.file_path, editor.is_modified()
+
+    def profile_heat(self, file_path):
+        """Line heat of a file in the last profiled run"""
+        result = self.profiler.result
+        return result.heat_for(file_path) if result is not None and file_path else {}
+
+    def show_profile(self, result):
+        """Paint a run's line heat into every open file it covers"""
+        for editor in self.editors:
+            editor.set_heat(self.profile_heat(editor.file_path))
+
+    def open_profiled_location(self, path, line):
+        if os.path.isfile(path):
+            self.open_location(os.path.abspath(path), line)
 
     def create_welcome_page(self):
         """Create welcome page"""
@@ -331,12 +698,15 @@ class CodeEditor(ttk.Frame):
 
     def create_new_editor_tab(self):
         """Create a new editor tab"""
-        editor = EditorTab(self.editor_tabs, self.theme)
+        editor = EditorTab(self.editor_tabs, self.theme, self.words, self.lint)
         self.editor_tabs.add(editor, text="Untitled")
         self.editors.append(editor)
         
         # Bind events for the new editor
         self.bind_editor_events(editor)
+        self.apply_editor_settings(editor)
+        editor.document.listeners.append(lambda edit: self.autosaver.schedule())
+        self.tabs.add(editor)
         return editor
 
     def bind_editor_events(self, editor):
@@ -346,25 +716,43 @@ class CodeEditor(ttk.Frame):
         editor.text_area.bind('<KeyRelease>', lambda e: self.on_key_release(e, editor))
         editor.text_area.bind('<Control-s>', lambda e: self.save_file())
         editor.text_area.bind('<Control-f>', lambda e: self.show_find_dialog())
+        editor.text_area.bind('<F12>', lambda e: self.goto_definition())
+
+    def on_rehydrate(self, editor):
+        """Rebind and restyle the widgets a hibernated tab was rebuilt with"""
+        self.bind_editor_events(editor)
+        self.apply_editor_settings(editor)
+
+    def apply_editor_settings(self, editor):
+        """Apply the saved wrap and line number settings to one live editor"""
+        settings = self.editor_settings
+        if settings is None or editor.hibernated:
+            return
+        editor.text_area.config(wrap='word' if settings["wrap_text"] else 'none')
+        editor.line_numbers.pack_forget() if not settings["show_line_numbers"] else editor.line_numbers.pack(side='left', fill='y')
 
     def get_current_editor(self):
         """Get the currently active editor tab"""
         current = self.editor_tabs.select()
         if current:
+            widget = self.nametowidget(current)
+            if isinstance(widget, LargeFileViewer):
+                return None
+            if widget in self.editors:
+                self.tabs.activate(widget)
+                return widget
             tab_id = self.editor_tabs.index(current)
             if tab_id < len(self.editors):
+                self.tabs.activate(self.editors[tab_id])
                 return self.editors[tab_id]
         return None
 
     def execute_terminal_command(self, command):
         """Execute command in terminal"""
         try:
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            self.terminal.insert('end', f"\n{result.stdout}")
-            if result.stderr:
-                self.terminal.insert('end', f"\nError: {result.stderr}")
+            self.terminal.run(command)
         except Exception as e:
-            self.terminal.insert('end', f"\nError: {str(e)}")
+            self.output.insert('end', f"\nError: {str(e)}")
 
     def search_in_files(self):
         """Search text in all project files"""
@@ -372,47 +760,387 @@ class CodeEditor(ttk.Frame):
             return
             
         query = self.search_input.get()
+        self.cancel_search()
+        self.show_replace_preview(False)
         self.search_results_tree.delete(*self.search_results_tree.get_children())
+        if not query:
+            return
+        if self.search_symbols_var.get():
+            self.search_symbols(query)
+            return
         
-        for path in Path(self.current_project).rglob('*'):
-            if path.is_file():
-                try:
-                    with open(path, 'r') as f:
-                        for i, line in enumerate(f, 1):
-                            if query in line:
-                                self.search_results_tree.insert('', 'end', 
-                                    values=(path.relative_to(self.current_project), 
-                                           i, line.strip()))
-                except:
-                    continue
+        try:
+            self.search_job = self.search_engine.start(self.current_project, query,
+                                                       regex=self.search_regex_var.get(),
+                                                       index=self.get_search_index())
+        except Exception as e:
+            self.search_status.config(text=f"Error: {str(e)}")
+            return
+        self.search_status.config(text="Searching...")
+        self.search_poll = self.after(50, self.poll_search_results)
+
+    def poll_search_results(self):
+        """Move hits from the search thread into the results tree in batches"""
+        self.search_poll = None
+        job = self.search_job
+        if job is None:
+            return
+        shown = len(self.search_results_tree.get_children())
+        budget = 500    # Rows inserted per tick so Tk stays responsive
+        while budget > 0:
+            try:
+                hits = job.results.get_nowait()
+            except queue.Empty:
+                break
+            if hits is None:
+                self.search_job = None
+                self.finish_search(job, shown)
+                return
+            for name, i, line in hits:
+                self.search_results_tree.insert('', 'end', values=(name, i, line))
+            shown += len(hits)
+            budget -= len(hits)
+        self.search_status.config(text=f"Searching... {shown} results")
+        self.search_poll = self.after(50, self.poll_search_results)
+
+    def finish_search(self, job, shown):
+        if job.error is not None:
+            text = f"Error: {str(job.error)}"
+        elif job.cancelled.is_set():
+            text = f"Cancelled, {shown} results"
+        elif job.capped:
+            text = f"{shown} results (limit reached)"
+        else:
+            text = f"{shown} results"
+        self.search_status.config(text=text)
+
+    def search_symbols(self, query):
+        """Workspace symbol search: definitions whose name contains query"""
+        if self.symbol_index is None:
+            return
+        try:
+            hits = self.symbol_index.search(query)
+        except Exception as e:
+            self.search_status.config(text=f"Error: {str(e)}")
+            return
+        for name, kind, container, path, line, col in hits:
+            label = f"{kind} {container}.{name}" if container else f"{kind} {name}"
+            self.search_results_tree.insert('', 'end', values=(path, line, label))
+        self.search_status.config(text=f"{len(hits)} symbols")
+
+    def goto_definition(self):
+        """Jump to the definition of the name under the cursor"""
+        editor = self.get_current_editor()
+        if editor is None or self.symbol_index is None:
+            return 'break'
+        name = editor.text_area.get('insert wordstart', 'insert wordend').strip()
+        if not name.isidentifier():
+            return 'break'
+        try:
+            found = self.symbol_index.definitions(name)
+        except Exception as e:
+            self.output.insert('end', f"\nError: {str(e)}")
+            return 'break'
+        if len(found) == 1:
+            path, line, col, kind, container = found[0]
+            self.open_location(path, line, col)
+        elif found:
+            # Several candidates: list them in the search panel
+            self.cancel_search()
+            self.search_results_tree.delete(*self.search_results_tree.get_children())
+            for path, line, col, kind, container in found:
+                label = f"{kind} {container}.{name}" if container else f"{kind} {name}"
+                self.search_results_tree.insert('', 'end', values=(path, line, label))
+            self.search_status.config(text=f"{len(found)} definitions of {name}")
+            if self.current_panel != "search":
+                self.show_search()
+        return 'break'
+
+    def open_search_result(self, event=None):
+        selection = self.search_results_tree.selection()
+        if selection:
+            path, line = self.search_results_tree.item(selection[0], 'values')[:2]
+            self.open_location(path, int(line))
+
+    def open_location(self, path, line, col=0):
+        """Show a project file with the cursor at line (1-based) and col"""
+        full_path = os.path.join(self.current_project or '', path)
+        key = os.path.normcase(os.path.realpath(full_path))
+        for editor in self.editors:
+            # No samefile: an open editor's file may have been deleted or renamed
+            if editor.file_path and os.path.normcase(os.path.realpath(editor.file_path)) == key:
+                self.editor_tabs.select(editor)
+                break
+        else:
+            self.open_file(full_path)
+        editor = self.get_current_editor()
+        if editor is not None:
+            editor.text_area.mark_set('insert', f'{line}.{col}')
+            editor.text_area.see('insert')
+            editor.text_area.focus_set()
+
+    def update_problems(self, editor, added, removed, moved):
+        """Push one editor's changed diagnostics into the Problems panel"""
+        rows = self.problem_rows.setdefault(editor, {})
+        for diagnostic in removed:
+            item = rows.pop(diagnostic, None)
+            if item is not None:
+                self.problems_list.delete(item)
+                del self.problem_items[item]
+        for old, new in moved.items():
+            item = rows.pop(old, None)
+            if item is not None:
+                rows[new] = item
+                self.problem_items[item] = (editor, new)
+                self.problems_list.set(item, 'line', new[0] + 1)
+        for diagnostic in added:
+            line, col, severity, message = diagnostic
+            item = self.problems_list.insert('', 'end', values=(
+                severity.title(), message, editor.filename, line + 1))
+            rows[diagnostic] = item
+            self.problem_items[item] = (editor, diagnostic)
+
+    def open_problem(self, event=None):
+        selection = self.problems_list.selection()
+        if not selection or selection[0] not in self.problem_items:
+            return
+        editor, (line, col, _, _) = self.problem_items[selection[0]]
+        self.editor_tabs.select(editor)
+        if self.get_current_editor() is editor:
+            editor.text_area.mark_set('insert', f'{line + 1}.{col}')
+            editor.text_area.see('insert')
+            editor.text_area.focus_set()
+
+    def show_replace_preview(self, show):
+        """Swap the search results for the replace preview, or back"""
+        if show:
+            self.search_results_tree.pack_forget()
+            self.replace_preview.pack(fill='both', expand=True)
+        else:
+            self.replace_preview.pack_forget()
+            self.search_results_tree.pack(fill='both', expand=True)
+
+    def preview_replace(self):
+        """List what replacing the search text in every project file would change"""
+        query = self.search_input.get()
+        if not self.current_project or not query or self.replace_busy():
+            return
+        self.cancel_search()
+        self.replace_plans = []
+        self.replace_list.set_rows([])
+        self.show_replace_preview(True)
+        try:
+            self.replace_job = ReplacePreviewJob(
+                self.search_engine.get_pool(), self.current_project, query,
+                self.search_regex_var.get(), self.replace_input.get(),
+                self.get_search_index()).start()
+        except Exception as e:
+            self.search_status.config(text=f"Error: {str(e)}")
+            return
+        self.replace_args = (query, self.search_regex_var.get(), self.replace_input.get())
+        self.search_status.config(text="Previewing...")
+        self.replace_poll = self.after(50, self.poll_replace)
+
+    def apply_replace(self):
+        """Apply the previewed replace; unsaved open files are left alone"""
+        if not self.replace_plans or self.replace_busy():
+            return
+        unsaved = {os.path.relpath(editor.file_path, self.current_project).replace(os.sep, '/')
+                   for editor in self.editors if editor.file_path and editor.is_modified()}
+        plans = [plan for plan in self.replace_plans if plan[0] not in unsaved]
+        try:
+            self.replace_job = start_apply(self.search_engine.get_pool(), self.current_project,
+                                           plans, *self.replace_args)
+        except Exception as e:
+            self.search_status.config(text=f"Error: {str(e)}")
+            return
+        skipped = len(self.replace_plans) - len(plans)
+        self.replace_plans = []
+        self.search_status.config(text=f"Replacing... ({skipped} unsaved files skipped)"
+                                  if skipped else "Replacing...")
+        self.replace_poll = self.after(50, self.poll_replace)
+
+    def undo_replace(self):
+        """Put back every file changed by the last replace in files"""
+        if not self.current_project or self.replace_busy():
+            return
+        try:
+            self.replace_job = start_undo(self.search_engine.get_pool(), self.current_project)
+        except Exception as e:
+            self.search_status.config(text=f"Error: {str(e)}")
+            return
+        if self.replace_job is None:
+            self.search_status.config(text="Nothing to undo")
+            return
+        self.search_status.config(text="Undoing replace...")
+        self.replace_poll = self.after(50, self.poll_replace)
+
+    def replace_busy(self):
+        return self.replace_job is not None
+
+    def cancel_replace(self):
+        """Stop handing out files; batches already being written still finish"""
+        if self.replace_job is not None:
+            self.replace_job.cancel()
+
+    def poll_replace(self):
+        """Stream preview rows or apply/undo progress from the workers"""
+        self.replace_poll = None
+        job = self.replace_job
+        if job is None:
+            return
+        preview = isinstance(job, ReplacePreviewJob)
+        while True:
+            try:
+                results = job.results.get_nowait()
+            except queue.Empty:
+                break
+            if results is None:
+                self.replace_job = None
+                self.finish_replace(job, preview)
+                return
+            if preview:
+                rows = []
+                for path, file_hash, count, lines in results:
+                    self.replace_plans.append((path, file_hash))
+                    rows.append((f"{path} ({count})", '#4ec9b0', (path, 1)))
+                    for line, old, new in lines:
+                        rows.append((f"  {line}: {old}  →  {new}", '#d4d4d4', (path, line)))
+                self.replace_list.append(rows)
+        if preview:
+            self.search_status.config(text=f"Previewing... {len(self.replace_plans)} files")
+        else:
+            self.search_status.config(text=f"{sum(job.statuses.values())} files done...")
+        self.replace_poll = self.after(50, self.poll_replace)
+
+    def finish_replace(self, job, preview):
+        if job.error is not None:
+            self.search_status.config(text=f"Error: {str(job.error)}")
+        elif preview:
+            self.search_status.config(text=f"{len(self.replace_plans)} files to change")
+        else:
+            self.search_status.config(text=", ".join(f"{count} {status}"
+                                                     for status, count in job.statuses.items()))
+            self.replace_list.set_rows([])
+            self.reload_open_files()
+
+    def reload_open_files(self):
+        """Reload unmodified editors whose file changed on disk"""
+        for editor in self.editors:
+            if not editor.file_path or editor.is_modified():
+                continue
+            try:
+                with open(editor.file_path, 'r') as file:
+                    text = file.read()
+            except Exception as e:
+                self.output.insert('end', f"\nError: {str(e)}")
+                continue
+            if text != editor.document.get_text():
+                editor.load_text(text)
+                editor.saved_version = editor.document.version
+
+    def cancel_search(self):
+        """Stop the running search, keeping the results found so far"""
+        job = self.search_job
+        if job is None:
+            return
+        job.cancel()
+        if self.search_poll is not None:
+            self.after_cancel(self.search_poll)
+            self.search_poll = None
+        self.search_job = None
+        self.finish_search(job, len(self.search_results_tree.get_children()))
+
+    def destroy(self):
+        self.cancel_replace()
+        self.autosaver.close()
+        if self.symbol_index is not None:
+            self.symbol_index.close()
+        self.search_engine.shutdown()
+        self.lsp.shutdown()
+        self.blobs.close()
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.git_status is not None:
+            self.git_status.close()
+        super().destroy()
+
+    def get_search_index(self):
+        """Trigram index of the current project, loaded from disk on first use"""
+        if self.search_index is None or self.search_index.root != self.current_project:
+            self.search_index = TrigramIndex(self.current_project)
+            self.search_index.watched = self.watcher is not None
+        return self.search_index
 
     def open_project(self):
         """Open a project folder"""
         folder_path = filedialog.askdirectory()
         if folder_path:
             self.current_project = folder_path
+            self.search_index = None
             self.populate_file_tree()
+            self.watch_project()
+            self.track_git_status()
+            if self.symbol_index is not None:
+                self.symbol_index.close()
+            self.symbol_index = SymbolIndex(folder_path, self.search_engine.get_pool)
+            self.symbol_index.refresh()
+            self.words.project = self.symbol_index
+
+    def watch_project(self):
+        """Follow on-disk changes so the panels never need a full rescan"""
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.watcher = FileWatcher(self.current_project, self)
+        self.watcher.subscribe(self.file_explorer.apply_changes)
+        self.watcher.subscribe(self.on_files_changed)
+        self.watcher.start()
+
+    def on_files_changed(self, change_set):
+        """FileWatcher subscriber for the search index and the git changes list"""
+        if self.search_index is not None:
+            self.search_index.apply_changes(change_set)
+        if self.git_status is not None:
+            self.git_status.apply_changes(change_set)
+        if self.symbol_index is not None:
+            self.symbol_index.apply_changes(change_set)
+        if change_set.git:
+            self.reload_git_diffs()
+
+    def follow_git_diff(self, editor):
+        """Mark the lines of an editor's file that differ from git HEAD"""
+        if editor.diff is not None:
+            editor.diff.close()
+        editor.diff = LineDiff(editor, self.blobs) if editor.file_path else None
+
+    def reload_git_diffs(self):
+        """HEAD may have moved: diff open files against it again"""
+        for editor in self.editors:
+            if editor.diff is not None:
+                editor.diff.reload()
+
+    def track_git_status(self):
+        """Start a background git status cache for the new project"""
+        if self.git_status is not None:
+            self.git_status.close()
+        self.changes_list.delete(*self.changes_list.get_children())
+        self.git_rows.clear()
+        self.git_status = GitStatusService(self.current_project, self,
+                                           self.apply_git_diff, self.report_git_error)
+        self.git_status.refresh(full=True)
 
     def populate_file_tree(self):
         """Populate file tree with project files"""
-        self.file_tree.delete(*self.file_tree.get_children())
-        root_node = self.file_tree.insert('', 'end', text=self.current_project, open=True)
-        self.add_files_to_tree(root_node, self.current_project)
-
-    def add_files_to_tree(self, parent, path):
-        """Add files to the file tree"""
-        for item in os.listdir(path):
-            item_path = os.path.join(path, item)
-            node = self.file_tree.insert(parent, 'end', text=item, open=False)
-            if os.path.isdir(item_path):
-                self.add_files_to_tree(node, item_path)
+        self.file_explorer.set_root(self.current_project)
 
     def open_selected_file(self, event):
         """Open the selected file from the file tree"""
-        selected_item = self.file_tree.selection()[0]
-        file_path = self.file_tree.item(selected_item, 'text')
-        full_path = os.path.join(self.current_project, file_path)
-        self.open_file(full_path)
+        selection = self.file_tree.selection()
+        if not selection or self.file_explorer.is_directory(selection[0]):
+            return
+        full_path = self.file_explorer.path_of(selection[0])
+        if full_path:
+            self.open_file(full_path)
 
     def new_file(self):
         """Create a new file in the project"""
@@ -429,19 +1157,31 @@ class CodeEditor(ttk.Frame):
                 subprocess.run(['git', 'commit', '-m', commit_message], cwd=self.current_project)
                 self.commit_msg.delete(0, tk.END)
                 self.populate_git_changes()
+                self.reload_git_diffs()
             except Exception as e:
                 self.output.insert('end', f"\nError: {str(e)}")
 
     def populate_git_changes(self):
         """Populate the changes list with git status"""
-        self.changes_list.delete(*self.changes_list.get_children())
-        try:
-            result = subprocess.run(['git', 'status', '--porcelain'], cwd=self.current_project, capture_output=True, text=True)
-            for line in result.stdout.splitlines():
-                status, file = line[:2], line[3:]
-                self.changes_list.insert('', 'end', values=(status, file))
-        except Exception as e:
-            self.output.insert('end', f"\nError: {str(e)}")
+        # The list already shows the cached status; this only checks it is current
+        if self.git_status is not None:
+            self.git_status.refresh()
+
+    def apply_git_diff(self, updated, removed):
+        """GitStatusService callback: patch only the rows whose status changed"""
+        for file in removed:
+            item = self.git_rows.pop(file, None)
+            if item is not None:
+                self.changes_list.delete(item)
+        for file, status in updated.items():
+            item = self.git_rows.get(file)
+            if item is None:
+                self.git_rows[file] = self.changes_list.insert('', 'end', values=(status, file))
+            else:
+                self.changes_list.item(item, values=(status, file))
+
+    def report_git_error(self, error):
+        self.output.insert('end', f"\nError: {str(error)}")
 
     def create_widgets(self):
         # Main container
@@ -609,12 +1349,7 @@ class CodeEditor(ttk.Frame):
         self.text_area.bind('<ButtonRelease-1>', self.update_position)
         self.text_area.bind('<B1-Motion>', self.update_position)
         
-        # Line number updates
-        self.text_area.bind('<Return>', lambda e: self.after(1, self.update_line_numbers))
-        self.text_area.bind('<BackSpace>', lambda e: self.after(1, self.update_line_numbers))
-        self.text_area.bind('<Delete>', lambda e: self.after(1, self.update_line_numbers))
-        self.text_area.bind('<Control-v>', lambda e: self.after(1, self.update_line_numbers))
-        self.text_area.bind('<Control-x>', lambda e: self.after(1, self.update_line_numbers))
+        # Line numbers follow edits through each editor's render scheduler
 
     def configure_tags(self): pass  # Remove this method
     def highlight_current_line(self, event=None): pass  # Remove this method
@@ -634,26 +1369,72 @@ class CodeEditor(ttk.Frame):
         return 'break'
 
     def show_find_dialog(self):
+        """Find and replace in the current editor, searching as you type"""
         editor = self.get_current_editor()
         if editor:
+            finder = editor.finder
             dialog = tk.Toplevel(self)
             dialog.title("Find")
-            dialog.geometry("300x100")
+            dialog.geometry("360x170")
+            
+            ttk.Label(dialog, text="Find:").pack(pady=(5, 0))
+            find_var = tk.StringVar()
+            find_entry = ttk.Entry(dialog, width=40, textvariable=find_var)
+            find_entry.pack(pady=2)
+            ttk.Label(dialog, text="Replace:").pack()
+            replace_entry = ttk.Entry(dialog, width=40)
+            replace_entry.pack(pady=2)
+            
+            options = ttk.Frame(dialog)
+            options.pack(pady=2)
+            regex_var = tk.BooleanVar()
+            case_var = tk.BooleanVar()
+            ttk.Checkbutton(options, text="Regex", variable=regex_var).pack(side='left')
+            ttk.Checkbutton(options, text="Match case", variable=case_var).pack(side='left')
+            status = ttk.Label(options, text="")
+            status.pack(side='left', padx=10)
+            
+            def update_status():
+                if finder.error is not None:
+                    status.config(text=f"Error: {str(finder.error)}")
+                elif not finder.compiled:
+                    status.config(text="")
+                elif finder.searching() and not finder.count():
+                    status.config(text="Searching...")
+                elif finder.current is not None:
+                    status.config(text=f"{finder.current + 1} of {finder.count()}")
+                else:
+                    status.config(text=f"{finder.count()} matches")
+            
+            def find_text(*args):
+                finder.search(find_var.get(), regex_var.get(), case_var.get())
             
-            ttk.Label(dialog, text="Find:").pack(pady=5)
-            find_entry = ttk.Entry(dialog, width=40)
-            find_entry.pack(pady=5)
+            def replace_all():
+                count = finder.replace_all(replace_entry.get(), regex_var.get())
+                status.config(text=f"Replaced {count}")
             
-            def find_text():
-                text = find_entry.get()
-                start = editor.text_area.search(text, '1.0', tk.END)
-                if start:
-                    end = f"{start}+{len(text)}c"
-                    editor.text_area.tag_remove('sel', '1.0', tk.END)
-                    editor.text_area.tag_add('sel', start, end)
-                    editor.text_area.see(start)
+            def close():
+                finder.on_update = None
+                finder.clear()
+                dialog.destroy()
             
-            ttk.Button(dialog, text="Find Next", command=find_text).pack(pady=5)
+            finder.on_update = update_status
+            find_var.trace_add('write', find_text)
+            regex_var.trace_add('write', find_text)
+            case_var.trace_add('write', find_text)
+            find_entry.bind('<Return>', lambda e: finder.step())
+            find_entry.bind('<Shift-Return>', lambda e: finder.step(forward=False))
+            dialog.bind('<Escape>', lambda e: close())
+            dialog.protocol('WM_DELETE_WINDOW', close)
+            
+            buttons = ttk.Frame(dialog)
+            buttons.pack(pady=5)
+            ttk.Button(buttons, text="Previous", command=lambda: finder.step(forward=False)).pack(side='left')
+            ttk.Button(buttons, text="Find Next", command=finder.step).pack(side='left')
+            ttk.Button(buttons, text="Replace",
+                       command=lambda: finder.replace_current(replace_entry.get(), regex_var.get())).pack(side='left')
+            ttk.Button(buttons, text="Replace All", command=replace_all).pack(side='left')
+            find_entry.focus_set()
 
     def update_position(self, event=None):
         pos = self.text_area.index(tk.INSERT)
@@ -664,7 +1445,6 @@ class CodeEditor(ttk.Frame):
             self.modified = True
             self.update_title()
         self.update_minimap()
-        self.update_minimap()
 
     def update_title(self):
         filename = self.current_file or "Untitled"
@@ -679,40 +1459,23 @@ class CodeEditor(ttk.Frame):
         self.line_numbers.config(state='disabled')
 
     def update_line_numbers(self, event=None):
-        """Update the line numbers"""
-        self.line_numbers.config(state='normal')
-        self.line_numbers.delete('1.0', tk.END)
-        
-        # Get the total number of lines
-        text_content = self.text_area.get('1.0', tk.END)
-        num_lines = text_content.count('\n')
-        if text_content.endsWith('\n'):
-            num_lines += 1
-        
-        # Generate and insert line numbers
-        line_numbers = '\n'.join(str(i).rjust(3) for i in range(1, num_lines + 1))
-        self.line_numbers.insert('1.0', line_numbers)
-        
-        # Realign line numbers with text
-        self.line_numbers.yview_moveto(self.text_area.yview()[0])
-        self.line_numbers.config(state='disabled')
+        """Update the line numbers of the current editor"""
+        editor = self.get_current_editor()
+        if editor:
+            editor.update_line_numbers()
 
     def on_text_modified(self, editor):
         """Handle text modifications for a specific editor"""
         if editor.text_area.edit_modified():
-            editor.update_line_numbers()
+            # The edit listeners already marked the gutter and highlighter dirty
             editor.text_area.edit_modified(False)
-            editor.apply_syntax_highlighting()
 
     def on_key_press(self, event, editor):
         """Handle key press events for a specific editor"""
-        if event.keysym in ('Return', 'BackSpace', 'Delete'):
-            self.after(1, editor.update_line_numbers)
+        pass
 
     def on_key_release(self, event, editor):
         """Handle key release events for a specific editor"""
-        if event.keysym in ('Return', 'BackSpace', 'Delete'):
-            self.after(1, editor.update_line_numbers)
         self.on_text_change()
 
     # ...rest of existing methods...
@@ -721,52 +1484,80 @@ class CodeEditor(ttk.Frame):
         if not file_path:
             file_path = filedialog.askopenfilename()
         if file_path:
+            if os.path.getsize(file_path) >= LARGE_FILE_SIZE:
+                self.open_large_file(file_path)
+                return
             editor = self.get_current_editor() or self.create_new_editor_tab()
+            self.editor_tabs.select(editor)
             with open(file_path, 'r') as file:
-                editor.text_area.delete('1.0', tk.END)
-                editor.text_area.insert('1.0', file.read())
-                editor.update_line_numbers()
+                editor.load_text(file.read())
+                editor.file_path = file_path
+                editor.saved_version = editor.document.version
                 editor.filename = os.path.basename(file_path)
+                editor.set_language(file_path)
+                editor.set_heat(self.profile_heat(file_path))
+                self.lsp.attach(editor)
+                self.follow_git_diff(editor)
                 self.editor_tabs.tab(self.editor_tabs.select(), text=editor.filename)
-                editor.modified = False
+
+    def open_large_file(self, file_path):
+        """Open a huge file in a memory-mapped, read-only viewer tab"""
+        try:
+            viewer = LargeFileViewer(self.editor_tabs, self.theme, file_path)
+        except Exception as e:
+            self.output.insert('end', f"\nError: {str(e)}")
+            return
+        self.editor_tabs.add(viewer, text=f"{viewer.filename} (read-only)")
+        self.editor_tabs.select(viewer)
 
     def save_file(self):
+        """Save the current editor in the background, asking for a path only once"""
         editor = self.get_current_editor()
         if editor:
-            file_path = filedialog.asksaveasfilename()
+            file_path = editor.file_path or filedialog.asksaveasfilename()
             if file_path:
-                with open(file_path, 'w') as file:
-                    file.write(editor.text_area.get('1.0', tk.END))
-                editor.filename = os.path.basename(file_path)
-                self.editor_tabs.tab(self.editor_tabs.select(), text=editor.filename)
-                editor.modified = False
+                if file_path != editor.file_path:
+                    editor.file_path = file_path
+                    editor.filename = os.path.basename(file_path)
+                    editor.set_language(file_path)
+                    self.lsp.attach(editor)
+                    self.follow_git_diff(editor)
+                    self.editor_tabs.tab(editor, text=editor.filename)
+                self.autosaver.save(editor)
+
+    def on_file_saved(self, editor, file_path, error):
+        """AutoSaver callback once a queued write has finished"""
+        if error is not None:
+            self.output.insert('end', f"\nError: {str(error)}")
+            return
+        self.update_search_index(file_path)
+
+    def update_search_index(self, file_path):
+        """Re-index a saved file if it belongs to the indexed project"""
+        if self.search_index is None or self.search_index.watched:
+            return  # The watcher reports the save; the next search re-indexes it
+        try:
+            name = os.path.relpath(file_path, self.search_index.root)
+        except ValueError:
+            return  # Different drive
+        if not name.startswith(os.pardir) and self.search_index.lock.acquire(blocking=False):
+            # Skipped while a search holds the index; its mtime check catches up later
+            try:
+                self.search_index.update_file(name)
+            finally:
+                self.search_index.lock.release()
 
     def update_minimap(self):
         """Update minimap content"""
-        self.minimap.delete('all')
         editor = self.get_current_editor()
         if editor:
-            content = editor.text_area.get('1.0', tk.END)
-            lines = content.split('\n')
-            y = 0
-            for line in lines:
-                self.minimap.create_text(2, y, anchor='nw', text=line[:100], fill='#d4d4d4', font=('Consolas', 2))
-                y += 3
+            editor.minimap.schedule_refresh()
 
     def check_brackets(self, event=None):
-        """Match brackets"""
-        self.text_area.tag_remove('matching_bracket', '1.0', tk.END)
-        content = self.text_area.get('1.0', tk.END)
-        stack = []
-        brackets = {'(': ')', '[': ']', '{': '}'}
-        for i, char in enumerate(content):
-            if char in brackets.keys():
-                stack.append((char, i))
-            elif char in brackets.values():
-                if stack and brackets[stack[-1][0]] == char:
-                    opening_bracket, opening_index = stack.pop()
-                    self.text_area.tag_add('matching_bracket', f'1.0+{opening_index}c', f'1.0+{opening_index+1}c')
-                    self.text_area.tag_add('matching_bracket', f'1.0+{i}c', f'1.0+{i+1}c')
+        """Match the bracket at the cursor of the current editor"""
+        editor = self.get_current_editor()
+        if editor:
+            editor.highlight_matching_bracket()
 
     def show_explorer(self):
         """Show explorer panel"""
@@ -0,0 +1,311 @@
+import heapq
+import re
+import time
+from bisect import bisect_left, insort
+
+import tkinter as tk
+
+WORD_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]{2,}')     # Shorter words are not worth offering
+PREFIX_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*$')
+IDENTIFIER_RE = re.compile(r'[A-Za-z0-9_]+$')
+MAX_LINE = 4000         # Longer lines (minified files) are not mined for words
+
+
+def line_words(line):
+    if len(line) > MAX_LINE:
+        return ()
+    return tuple(WORD_RE.findall(line))
+
+
+def prefixed(words, prefix, limit):
+    """Up to limit entries of a sorted list that start with prefix"""
+    i = bisect_left(words, prefix)
+    found = []
+    while i < len(words) and len(found) < limit and words[i].startswith(prefix):
+        found.append(words[i])
+        i += 1
+    return found
+
+
+class WordIndex:
+    """Identifiers of the open buffers and the project, for completion
+
+    Buffer words are reference counted and kept in a sorted list, so a
+    prefix lookup is a bisect plus a short scan and adding or dropping a
+    line only touches the words on it.  Project words are the definition
+    names of the SymbolIndex, read from its sorted (names, counts) snapshot
+    of the most common MAX_NAMES, so memory stays bounded however large the
+    project is.
+    """
+    MAX_SCAN = 2000     # Candidates looked at per source and lookup
+
+    def __init__(self):
+        self.counts = {}
+        self.words = []
+        self.project = None     # SymbolIndex providing `names`
+
+    def add(self, words):
+        counts = self.counts
+        for word in words:
+            count = counts.get(word, 0)
+            if not count:
+                insort(self.words, word)
+            counts[word] = count + 1
+
+    def remove(self, words):
+        counts = self.counts
+        for word in words:
+            count = counts.get(word, 0)
+            if count > 1:
+                counts[word] = count - 1
+            elif count:
+                del counts[word]
+                del self.words[bisect_left(self.words, word)]
+
+    def complete(self, prefix, near=(), limit=50):
+        """Words starting with prefix, nearby ones first, then by frequency"""
+        names, name_counts = getattr(self.project, 'names', None) or ((), ())
+        scores = {}
+        for word in prefixed(self.words, prefix, self.MAX_SCAN):
+            scores[word] = self.counts[word]
+        i = bisect_left(names, prefix)
+        for j in range(i, min(len(names), i + self.MAX_SCAN)):
+            if not names[j].startswith(prefix):
+                break
+            scores[names[j]] = scores.get(names[j], 0) + name_counts[j]
+        # The word being typed is in the buffer too; it only counts if used elsewhere
+        if scores.get(prefix, 0) <= 1:
+            scores.pop(prefix, None)
+        return heapq.nlargest(limit, scores,
+                              key=lambda word: (word in near, scores[word], -len(word)))
+
+
+class BufferWords:
+    """Keeps one editor's words counted in the shared WordIndex
+
+    Lines are mined from the top in the background within a time budget
+    (a large file never blocks the Tk thread); an edit to lines already
+    mined swaps just those lines' words, and lines below the frontier are
+    left for the background pass.
+    """
+    CHUNK = 500         # Lines read from the Document at a time
+    IDLE_BUDGET = 5     # Milliseconds of background mining per run
+
+    def __init__(self, editor, index):
+        self.editor = editor
+        self.index = index
+        self.lines = []     # Words of lines 0..len(lines)-1, counted in the index
+        editor.scheduler.add_task('words', self.mine_in_background, interval=20, delay=100,
+                                  budget=self.IDLE_BUDGET)
+
+    def reset(self):
+        """Forget everything, e.g. after loading a new file"""
+        self.clear()
+        self.editor.scheduler.mark('words')
+
+    def clear(self):
+        for words in self.lines:
+            self.index.remove(words)
+        self.lines = []
+
+    def on_edit(self, first, old_last, new_last):
+        start = first - 1
+        if start >= len(self.lines):
+            self.editor.scheduler.mark('words')
+            return
+        if old_last > len(self.lines):
+            # The edit runs past the frontier: drop back and let the background redo it
+            for words in self.lines[start:]:
+                self.index.remove(words)
+            del self.lines[start:]
+            self.editor.scheduler.mark('words')
+            return
+        for words in self.lines[start:old_last]:
+            self.index.remove(words)
+        new = [line_words(line)
+               for line in self.editor.document.get_lines(start, new_last - 1)]
+        for words in new:
+            self.index.add(words)
+        self.lines[start:old_last] = new
+
+    def mine_in_background(self, deadline):
+        document = self.editor.document
+        count = document.line_count()
+        while len(self.lines) < count:
+            start = len(self.lines)
+            new = [line_words(line)
+                   for line in document.get_lines(start, min(count, start + self.CHUNK) - 1)]
+            for words in new:
+                self.index.add(words)
+            self.lines.extend(new)
+            if time.perf_counter() > deadline:
+                return len(self.lines) < count
+        return False
+
+
+class Completer:
+    """Completion popup for an EditorTab
+
+    Typing an identifier character marks the 'complete' render task, so
+    the popup is filled from the WordIndex in the same idle cycle the
+    keystroke is drawn in.  Candidates used within PROXIMITY lines of the
+    cursor rank first, then the most frequent.  When the tab's file is open
+    in a language server, its completions for the same position are added
+    once they arrive.  Up/Down pick, Tab or Return accept and Escape (or
+    moving away) closes it.
+    """
+    MIN_PREFIX = 2
+    PROXIMITY = 40
+    ROWS = 10
+
+    def __init__(self, editor, index):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.index = index
+        self.words = BufferWords(editor, index)
+        self.popup = None
+        self.listbox = None
+        self.shown = False
+        self.prefix = ''
+        self.candidates = []
+        self.accepting = False
+        editor.add_edit_listener(self.words.on_edit)
+        editor.document.listeners.append(self.on_document_edit)
+        editor.add_cursor_listener(self.on_cursor_moved)
+        editor.scheduler.add_task('complete', self.update)
+        for sequence, handler in (('<Down>', lambda e: self.move(1)),
+                                  ('<Up>', lambda e: self.move(-1)),
+                                  ('<Tab>', self.accept),
+                                  ('<Return>', self.accept),
+                                  ('<Escape>', self.hide)):
+            self.text_area.bind(sequence, handler, add='+')
+        self.text_area.bind('<FocusOut>', self.hide, add='+')
+        self.text_area.bind('<Button-1>', self.hide, add='+')
+
+    def reset(self):
+        self.hide()
+        self.words.reset()
+
+    def visible(self):
+        return self.shown
+
+    def on_document_edit(self, edit):
+        if self.accepting:
+            return
+        if edit.text and '\n' not in edit.text and IDENTIFIER_RE.search(edit.text):
+            self.editor.scheduler.mark('complete')
+        elif self.visible():
+            self.editor.scheduler.mark('complete')
+
+    def on_cursor_moved(self):
+        if self.visible():
+            self.editor.scheduler.mark('complete')
+
+    def update(self):
+        """Render task: refill the popup for the word before the cursor"""
+        before = self.text_area.get('insert linestart', 'insert')
+        match = PREFIX_RE.search(before)
+        if not match or len(match.group()) < self.MIN_PREFIX:
+            self.hide()
+            return
+        after = self.text_area.get('insert', 'insert+1c')
+        if after and (after.isalnum() or after == '_'):
+            self.hide()     # In the middle of a word
+            return
+        self.prefix = match.group()
+        line = int(self.text_area.index('insert').split('.')[0]) - 1
+        document = self.editor.document
+        first = max(0, line - self.PROXIMITY)
+        last = min(document.line_count() - 1, line + self.PROXIMITY)
+        near = set()
+        for text in document.get_lines(first, last):
+            near.update(line_words(text))
+        self.candidates = self.index.complete(self.prefix, near)
+        if self.candidates:
+            self.show()
+        else:
+            self.hide()
+        if self.editor.lsp is not None:
+            at = self.text_area.index('insert')
+            col = int(at.split('.')[1])
+            self.editor.lsp.complete(line, col,
+                                     lambda words: self.add_server_words(at, self.prefix, words))
+
+    def add_server_words(self, at, prefix, words):
+        """Merge a language server's answer, unless the cursor moved on since"""
+        try:
+            if self.text_area.index('insert') != at:
+                return
+        except tk.TclError:
+            return  # The tab was hibernated meanwhile
+        local = set(self.candidates)
+        extra = [word for word in words
+                 if word.startswith(prefix) and word != prefix and word not in local]
+        if extra:
+            self.candidates = self.candidates + extra
+            self.show()
+
+    def show(self):
+        if self.popup is None:
+            self.popup = tk.Toplevel(self.text_area)
+            self.popup.overrideredirect(True)
+            self.popup.withdraw()
+            self.listbox = tk.Listbox(self.popup, bg='#252526', fg='#d4d4d4',
+                                      selectbackground='#094771', relief='flat',
+                                      highlightthickness=1, activestyle='none',
+                                      font=('Consolas', 11), exportselection=False)
+            self.listbox.pack(fill='both', expand=True)
+        self.listbox.delete(0, 'end')
+        self.listbox.insert('end', *self.candidates)
+        self.listbox.configure(height=min(self.ROWS, len(self.candidates)))
+        self.listbox.selection_set(0)
+        bbox = self.text_area.bbox('insert')
+        if bbox is None:
+            self.hide()
+            return
+        x, y, _, height = bbox
+        self.popup.geometry(f'+{self.text_area.winfo_rootx() + x}'
+                            f'+{self.text_area.winfo_rooty() + y + height}')
+        if not self.shown:
+            self.shown = True
+            self.popup.deiconify()
+            self.popup.lift()
+
+    def hide(self, event=None):
+        if self.shown:
+            self.shown = False
+            self.popup.withdraw()
+            return 'break' if event is not None and event.keysym == 'Escape' else None
+
+    def move(self, step):
+        if not self.visible():
+            return None
+        selection = self.listbox.curselection()
+        index = (selection[0] if selection else 0) + step
+        index = max(0, min(len(self.candidates) - 1, index))
+        self.listbox.selection_clear(0, 'end')
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return 'break'
+
+    def accept(self, event=None):
+        if not self.visible():
+            return None
+        selection = self.listbox.curselection()
+        word = self.candidates[selection[0] if selection else 0]
+        self.hide()
+        if word.startswith(self.prefix) and len(word) > len(self.prefix):
+            self.accepting = True
+            try:
+                self.text_area.insert('insert', word[len(self.prefix):])
+            finally:
+                self.accepting = False
+        return 'break'
+
+    def destroy(self):
+        self.editor.document.listeners.remove(self.on_document_edit)
+        self.words.clear()
+        if self.popup is not None:
+            self.popup.destroy()
+            self.popup = None
+            self.shown = False
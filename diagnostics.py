@@ -0,0 +1,320 @@
+import ast
+import hashlib
+import queue
+import threading
+import warnings
+from collections import OrderedDict
+
+import tkinter as tk
+
+try:
+    from pyflakes.checker import Checker
+except ImportError:
+    Checker = None
+
+MAX_SOURCE = 8 << 20        # Characters; bigger buffers are not checked
+MAX_FULL_CHECK = 1 << 20    # Characters; bigger sources are only compiled
+MAX_DIAGNOSTICS = 1000      # Per file, so the panel and tags stay cheap
+SEVERITIES = ('error', 'warning')
+
+
+def unused_imports(tree):
+    """(line, col, message) for module-level imports that are never used
+
+    The fallback when pyflakes is not installed: a name counts as used if
+    it is loaded anywhere in the module or listed in __all__.
+    """
+    imported = []
+    statements = list(tree.body)
+    while statements:
+        node = statements.pop()
+        if isinstance(node, (ast.If, ast.Try, ast.With, ast.For, ast.While)):
+            # Conditional imports are still module level
+            for field in ('body', 'orelse', 'finalbody'):
+                statements.extend(getattr(node, field, ()))
+            for handler in getattr(node, 'handlers', ()):
+                statements.extend(handler.body)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                bound = alias.asname or alias.name.split('.')[0]
+                imported.append((node, bound, alias.name))
+        elif isinstance(node, ast.ImportFrom) and node.module != '__future__':
+            for alias in node.names:
+                if alias.name != '*':
+                    imported.append((node, alias.asname or alias.name, alias.name))
+    imported = [(node, bound, name if bound == name.split('.')[0] else f'{name} as {bound}')
+                for node, bound, name in imported]
+    if not imported:
+        return []
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Store):
+            used.add(node.id)
+        elif (isinstance(node, ast.Assign) and any(isinstance(target, ast.Name) and
+                                                  target.id == '__all__'
+                                                  for target in node.targets)):
+            used.update(item.value for item in ast.walk(node.value)
+                        if isinstance(item, ast.Constant) and isinstance(item.value, str))
+    return [(node.lineno - 1, node.col_offset, f"'{name}' imported but unused")
+            for node, bound, name in imported if bound not in used]
+
+
+def check_source(text, filename):
+    """Worker: sorted (line, col, severity, message) diagnostics of Python source
+
+    Lines are 0-based.  Syntax errors (including the ones only the compiler
+    finds) stop the check; otherwise compiler warnings are reported along
+    with pyflakes' messages, or unused imports when pyflakes is missing.
+    Sources over MAX_FULL_CHECK only get the compiler's errors and warnings,
+    which cost a fraction of building and walking a Python-level tree.
+    Runs in a pool process, so it only takes and returns plain data.
+    """
+    tree = None
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            if len(text) > MAX_FULL_CHECK:
+                compile(text, filename, 'exec', dont_inherit=True)
+            else:
+                tree = ast.parse(text, filename)
+                compile(tree, filename, 'exec', dont_inherit=True)
+    except SyntaxError as e:
+        line = max(1, e.lineno or 1) - 1
+        return [(line, max(1, e.offset or 1) - 1, 'error', e.msg)]
+    except (ValueError, RecursionError, MemoryError) as e:
+        return [(0, 0, 'error', str(e))]
+    found = set()
+    for warning in caught:
+        found.add((max(1, warning.lineno or 1) - 1, 0, 'warning', str(warning.message)))
+    if tree is not None and Checker is not None:
+        for message in Checker(tree, filename=filename).messages:
+            found.add((message.lineno - 1, message.col, 'warning',
+                       message.message % message.message_args))
+    elif tree is not None:
+        for line, col, message in unused_imports(tree):
+            found.add((line, col, 'warning', message))
+    return sorted(found)[:MAX_DIAGNOSTICS]
+
+
+class LintService:
+    """Shared by every EditorTab: the worker pool, a result cache and the Problems panel
+
+    Results are cached by content hash, so switching back to a file, undoing
+    to an earlier state or waking a hibernated tab costs a hash and no check.
+    on_change(editor, added, removed, moved) is called on the Tk thread with
+    the diagnostics that appeared, disappeared or only moved to another line
+    ({old: new}).
+    """
+    MAX_CACHED = 64
+
+    def __init__(self, get_pool, on_change=None):
+        self.get_pool = get_pool
+        self.on_change = on_change
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        with self.lock:
+            result = self.cache.get(key)
+            if result is not None:
+                self.cache.move_to_end(key)
+            return result
+
+    def store(self, key, result):
+        with self.lock:
+            self.cache[key] = result
+            while len(self.cache) > self.MAX_CACHED:
+                self.cache.popitem(last=False)
+
+    def changed(self, editor, added, removed, moved):
+        if self.on_change is not None and (added or removed or moved):
+            self.on_change(editor, added, removed, moved)
+
+
+class LintJob:
+    """Hashes a Document snapshot and checks it in the pool unless cached"""
+    def __init__(self, service, pieces, filename, version):
+        self.service = service
+        self.pieces = pieces
+        self.filename = filename
+        self.version = version
+        self.cancelled = threading.Event()
+        self.results = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            text = ''.join(buffer[start:end] for buffer, start, end in self.pieces)
+            key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'),
+                                  digest_size=16).digest()
+            result = self.service.lookup(key)
+            if result is None and not self.cancelled.is_set():
+                future = self.service.get_pool().submit(check_source, text, self.filename)
+                result = future.result()
+                self.service.store(key, result)
+        except Exception as e:
+            result = e
+        self.results.put(result)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class Linter:
+    """Diagnostics of one EditorTab, as underlines and Problems panel rows
+
+    A check is debounced after edits and runs off the Tk thread (see
+    LintJob), so a large file is checked while typing carries on.  The tab
+    keeps `diagnostics`, a {live: shown} map from each diagnostic at its
+    current line to the one last pushed to the panel.  Edits move the live
+    lines and drop the diagnostics on edited lines, and a new result is
+    diffed against the live set, so only diagnostics that changed are
+    retagged and pushed to the panel.
+    """
+    DELAY = 500
+    POLL_MS = 30
+
+    def __init__(self, editor, service):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.document = editor.document
+        self.service = service
+        self.python = False
+        self.job = None
+        self.poll_job = None
+        self.error = None
+        self.text_area.tag_configure('lint_error', underline=True)
+        self.text_area.tag_configure('lint_warning', underline=True)
+        try:
+            self.text_area.tag_configure('lint_error', underlinefg='#f14c4c')
+            self.text_area.tag_configure('lint_warning', underlinefg='#cca700')
+        except tk.TclError:
+            pass    # Tk before 8.6.6 underlines in the text colour
+        editor.scheduler.add_task('lint', self.start, delay=self.DELAY)
+        self.document.listeners.append(self.on_document_edit)
+
+    def set_python(self, python):
+        self.python = python
+        self.reset()
+
+    def reset(self):
+        """Check again once the view holds the document, e.g. after loading a file
+
+        The last diagnostics are tagged again meanwhile, so waking a
+        hibernated tab shows its underlines straight away.
+        """
+        for diagnostic in self.editor.diagnostics:
+            self.tag(diagnostic)
+        self.editor.scheduler.mark('lint')
+
+    def served(self):
+        """Whether a running language server provides the diagnostics"""
+        return self.editor.lsp is not None and self.editor.lsp.client.ready
+
+    def on_document_edit(self, edit):
+        if self.python and not self.served():
+            self.editor.scheduler.mark('lint')
+
+    def start(self):
+        """Render task: check the current version off the Tk thread"""
+        if self.job is not None:
+            return  # One check at a time: poll() starts the next one when it is done
+        if self.served():
+            self.apply(self.editor.lsp.diagnostics)  # The language server publishes them
+            return
+        if (self.service is None or not self.python
+                or len(self.document) > MAX_SOURCE):
+            self.apply([])
+            return
+        filename = self.editor.file_path or self.editor.filename
+        self.job = LintJob(self.service, self.document.snapshot(), filename,
+                           self.document.version)
+        self.job.thread.start()
+        self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        self.poll_job = None
+        job = self.job
+        if job is None:
+            return
+        try:
+            result = job.results.get_nowait()
+        except queue.Empty:
+            self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+            return
+        self.job = None
+        if isinstance(result, Exception):
+            self.error = result
+        elif job.version == self.document.version and self.python:
+            self.error = None
+            self.apply(result)
+        else:
+            self.editor.scheduler.mark('lint')  # Edited while checking: check again
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        if self.poll_job is not None:
+            self.editor.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def destroy(self):
+        self.cancel()
+        self.document.listeners.remove(self.on_document_edit)
+
+    def apply(self, result):
+        """Show a new set of diagnostics, touching only what changed"""
+        shown = self.editor.diagnostics
+        new = set(result)
+        added = [d for d in result if d not in shown]
+        removed = [d for d in shown if d not in new]
+        moved = {shown[d]: d for d in new if d in shown and shown[d] != d}
+        for diagnostic in removed:
+            self.untag(diagnostic)
+        for diagnostic in added:
+            self.tag(diagnostic)
+        if removed:
+            # Tags of a removed diagnostic may have covered a kept one's text
+            lines = {d[0] for d in removed}
+            for diagnostic in new:
+                if diagnostic[0] in lines:
+                    self.tag(diagnostic)
+        self.editor.diagnostics = {d: d for d in result}
+        if self.service is not None:
+            self.service.changed(self.editor, added, [shown[d] for d in removed], moved)
+
+    def tag(self, diagnostic):
+        line, col, severity, _ = diagnostic
+        start = f'{line + 1}.{col}'
+        self.text_area.tag_add(f'lint_{severity}', start, f'{start} wordend')
+
+    def untag(self, diagnostic):
+        line, col, severity, _ = diagnostic
+        start = f'{line + 1}.{col}'
+        self.text_area.tag_remove(f'lint_{severity}', start, f'{start} wordend')
+
+    def on_edit(self, first, old_last, new_last):
+        """Edit listener: move the diagnostics below an edit, drop the ones on it"""
+        shown = self.editor.diagnostics
+        if not shown:
+            return
+        start, old_end = first - 1, old_last - 1
+        delta = new_last - old_last
+        if not delta and not any(start <= d[0] <= old_end for d in shown):
+            return
+        live, dropped = {}, []
+        for diagnostic, pushed in shown.items():
+            line = diagnostic[0]
+            if line < start:
+                live[diagnostic] = pushed
+            elif line > old_end:
+                live[(line + delta,) + diagnostic[1:]] = pushed
+            else:
+                dropped.append(pushed)
+        self.editor.diagnostics = live
+        if dropped:
+            for severity in SEVERITIES:
+                self.text_area.tag_remove(f'lint_{severity}', f'{first}.0', f'{new_last}.end')
+            if self.service is not None:
+                self.service.changed(self.editor, [], dropped, {})
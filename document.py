@@ -0,0 +1,295 @@
+import re
+from bisect import bisect_left
+from collections import deque, namedtuple
+
+# One recorded edit: lines/cols are 0-based and describe the replaced range
+# before the edit, offsets are character offsets into the document.  deleted
+# is the replaced text, or None when it was too large to keep.
+TextEdit = namedtuple('TextEdit', 'version start_line start_col end_line end_col '
+                                  'offset removed text deleted')
+
+NEWLINE_RE = re.compile('\n')
+
+
+class Document:
+    """Piece-table text model that is the source of truth for an EditorTab
+
+    The loaded text stays untouched in the original buffer and everything
+    typed is appended to add buffers; the document is a sequence of pieces
+    pointing into those buffers.  Pieces are grouped into blocks with a
+    segment tree over the blocks holding their character and newline
+    counts, so offset <-> line/column lookups are O(log n) and reading a
+    line or a range never joins more than the pieces it spans.
+    """
+    BLOCK_PIECES = 64
+    ADD_CHUNK = 1 << 16     # Add buffers are extended in place up to this size
+    HISTORY = 1000          # Edits kept for changes_since()
+    MAX_DELETED = 1 << 20   # Larger deletions are recorded without their text
+
+    def __init__(self, text=''):
+        self.version = 0
+        self.history = deque(maxlen=self.HISTORY)
+        self.listeners = []     # Called with each TextEdit after it is applied
+        self.reset(text)
+
+    def reset(self, text=''):
+        """Start over from text, e.g. a freshly loaded file"""
+        self.buffers = [text]
+        self.newlines = [[m.start() for m in NEWLINE_RE.finditer(text)]]
+        self.blocks = [[]]
+        if text:
+            self.blocks[0].append([0, 0, len(text), len(self.newlines[0])])
+        self.add_index = None
+        self.version += 1
+        self.history.clear()
+        self.rebuild_tree()
+
+    # Block summaries: [chars, newlines] per node of a segment tree
+
+    def rebuild_tree(self):
+        size = 1
+        while size < len(self.blocks):
+            size *= 2
+        self.size = size
+        self.tree = [[0, 0] for _ in range(2 * size)]
+        for i, block in enumerate(self.blocks):
+            self.tree[size + i] = self.summarize(block)
+        for node in range(size - 1, 0, -1):
+            left, right = self.tree[2 * node], self.tree[2 * node + 1]
+            self.tree[node] = [left[0] + right[0], left[1] + right[1]]
+
+    def summarize(self, block):
+        return [sum(piece[2] - piece[1] for piece in block),
+                sum(piece[3] for piece in block)]
+
+    def update_block(self, index):
+        node = self.size + index
+        self.tree[node] = self.summarize(self.blocks[index])
+        node //= 2
+        while node:
+            left, right = self.tree[2 * node], self.tree[2 * node + 1]
+            self.tree[node] = [left[0] + right[0], left[1] + right[1]]
+            node //= 2
+
+    # Size and lookups
+
+    def __len__(self):
+        return self.tree[1][0]
+
+    def line_count(self):
+        return self.tree[1][1] + 1
+
+    def locate(self, offset):
+        """(block index, piece index, offset in piece) for a character offset"""
+        node = 1
+        while node < self.size:
+            left = self.tree[2 * node][0]
+            if offset < left or (offset == left and not self.tree[2 * node + 1][0]):
+                node = 2 * node
+            else:
+                offset -= left
+                node = 2 * node + 1
+        index = node - self.size
+        block = self.blocks[index]
+        for i, piece in enumerate(block):
+            length = piece[2] - piece[1]
+            if offset < length:
+                return index, i, offset
+            offset -= length
+        return index, len(block), offset
+
+    def line_start(self, line):
+        """Offset of the first character of a 0-based line"""
+        if line <= 0:
+            return 0
+        if line > self.tree[1][1]:
+            return len(self)
+        # Find the block holding the line'th newline
+        node, chars, wanted = 1, 0, line
+        while node < self.size:
+            left = self.tree[2 * node]
+            if wanted <= left[1]:
+                node = 2 * node
+            else:
+                wanted -= left[1]
+                chars += left[0]
+                node = 2 * node + 1
+        for buffer, start, end, newlines in self.blocks[node - self.size]:
+            if wanted <= newlines:
+                positions = self.newlines[buffer]
+                position = positions[bisect_left(positions, start) + wanted - 1]
+                return chars + position - start + 1
+            wanted -= newlines
+            chars += end - start
+        return chars
+
+    def offset_of(self, line, col):
+        """Character offset of a 0-based line and column"""
+        return min(self.line_start(line) + col, len(self))
+
+    def position_of(self, offset):
+        """0-based (line, col) of a character offset"""
+        node, line, remaining = 1, 0, offset
+        while node < self.size:
+            left = self.tree[2 * node]
+            if remaining < left[0] or (remaining == left[0] and not self.tree[2 * node + 1][0]):
+                node = 2 * node
+            else:
+                remaining -= left[0]
+                line += left[1]
+                node = 2 * node + 1
+        for buffer, start, end, newlines in self.blocks[node - self.size]:
+            if remaining < end - start:
+                positions = self.newlines[buffer]
+                line += bisect_left(positions, start + remaining) - bisect_left(positions, start)
+                break
+            remaining -= end - start
+            line += newlines
+        return line, offset - self.line_start(line)
+
+    # Reading
+
+    def iter_chunks(self, start=0, end=None):
+        """Yield the text between two offsets piece by piece"""
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return
+        index, i, inner = self.locate(start)
+        remaining = end - start
+        while remaining > 0 and index < len(self.blocks):
+            block = self.blocks[index]
+            while i < len(block) and remaining > 0:
+                buffer, piece_start, piece_end, _ = block[i]
+                chunk = self.buffers[buffer][piece_start + inner:min(piece_end, piece_start + inner + remaining)]
+                remaining -= len(chunk)
+                inner = 0
+                i += 1
+                yield chunk
+            index, i = index + 1, 0
+
+    def get_text(self, start=0, end=None):
+        return ''.join(self.iter_chunks(start, end))
+
+    def snapshot(self):
+        """Frozen copy of the content as (buffer, start, end) slices
+
+        Buffers are immutable strings that later edits only replace, so the
+        snapshot costs O(pieces) to take and stays valid, e.g. for another
+        thread to write out, while editing carries on.
+        """
+        return [(self.buffers[buffer], start, end)
+                for block in self.blocks for buffer, start, end, _ in block]
+
+    def get_line(self, line):
+        """Text of a 0-based line without its newline"""
+        start = self.line_start(line)
+        if line + 1 > self.tree[1][1]:
+            return self.get_text(start)
+        return self.get_text(start, self.line_start(line + 1) - 1)
+
+    def get_lines(self, first, last):
+        """Lines first..last (inclusive, 0-based) as a list"""
+        end = self.line_start(last + 1) if last + 1 <= self.tree[1][1] else len(self)
+        text = self.get_text(self.line_start(first), end)
+        if text.endswith('\n') and last + 1 <= self.tree[1][1]:
+            text = text[:-1]
+        return text.split('\n')
+
+    # Editing
+
+    def replace_range(self, start_line, start_col, end_line, end_col, text):
+        """Replace a line/column range with text and record the delta"""
+        offset = self.offset_of(start_line, start_col)
+        removed = self.offset_of(end_line, end_col) - offset
+        deleted = self.get_text(offset, offset + removed) if removed <= self.MAX_DELETED else None
+        self.version += 1
+        edit = TextEdit(self.version, start_line, start_col, end_line, end_col,
+                        offset, removed, text, deleted)
+        if removed:
+            self.delete(offset, removed)
+        if text:
+            self.insert(offset, text)
+        self.history.append(edit)
+        for callback in self.listeners:
+            callback(edit)
+        return edit
+
+    def changes_since(self, version):
+        """Edits after a version, or None if they fell out of the history"""
+        if version == self.version:
+            return []
+        if not self.history or self.history[0].version > version + 1:
+            return None
+        return [edit for edit in self.history if edit.version > version]
+
+    def append_to_add_buffer(self, text):
+        """Store text in an add buffer, returning (buffer, start, end)"""
+        index = self.add_index
+        if index is None or len(self.buffers[index]) + len(text) > self.ADD_CHUNK:
+            index = self.add_index = len(self.buffers)
+            self.buffers.append('')
+            self.newlines.append([])
+        base = len(self.buffers[index])
+        self.buffers[index] += text
+        self.newlines[index].extend(base + m.start() for m in NEWLINE_RE.finditer(text))
+        return index, base, base + len(text)
+
+    def insert(self, offset, text):
+        index, i, inner = self.locate(offset)
+        block = self.blocks[index]
+        buffer, start, end = self.append_to_add_buffer(text)
+        newlines = text.count('\n')
+        if inner == 0 and i > 0 and block[i - 1][0] == buffer and block[i - 1][2] == start:
+            # Typing straight after the previous insert: grow that piece
+            block[i - 1][2] = end
+            block[i - 1][3] += newlines
+        else:
+            if inner:
+                head = self.split_piece(block[i], inner)
+                block.insert(i, head)
+                i += 1
+            block.insert(i, [buffer, start, end, newlines])
+        self.settle(index)
+
+    def delete(self, offset, length):
+        index, i, inner = self.locate(offset)
+        block = self.blocks[index]
+        folded = False
+        # Fold following blocks in until this one holds the whole range
+        while sum(p[2] - p[1] for p in block[i:]) - inner < length and index + 1 < len(self.blocks):
+            block.extend(self.blocks.pop(index + 1))
+            folded = True
+        if inner:
+            block.insert(i, self.split_piece(block[i], inner))
+            i += 1
+        while length > 0 and i < len(block):
+            piece = block[i]
+            size = piece[2] - piece[1]
+            if size <= length:
+                del block[i]
+                length -= size
+            else:
+                self.split_piece(piece, length)
+                length = 0
+        self.settle(index, folded)
+
+    def split_piece(self, piece, at):
+        """Cut the first `at` characters off piece (in place) and return them"""
+        buffer, start, end, newlines = piece
+        positions = self.newlines[buffer]
+        head_newlines = bisect_left(positions, start + at) - bisect_left(positions, start)
+        piece[1] = start + at
+        piece[3] = newlines - head_newlines
+        return [buffer, start, start + at, head_newlines]
+
+    def settle(self, index, reshaped=False):
+        """Split an oversized block and refresh the summaries"""
+        block = self.blocks[index]
+        if len(block) > 2 * self.BLOCK_PIECES:
+            self.blocks[index:index + 1] = [block[i:i + self.BLOCK_PIECES]
+                                            for i in range(0, len(block), self.BLOCK_PIECES)]
+            reshaped = True
+        if reshaped:
+            self.rebuild_tree()
+        else:
+            self.update_block(index)
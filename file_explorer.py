@@ -0,0 +1,220 @@
+import os
+import queue
+import threading
+from bisect import bisect_left
+from collections import deque
+from fnmatch import fnmatch
+
+# Names hidden from the explorer
+EXCLUDE_GLOBS = ['.git', '.hg', '.svn', '__pycache__', '*.pyc', '.DS_Store', '.quantam']
+
+
+class LazyFileTree:
+    """Fills a ttk.Treeview with a directory tree one level at a time
+
+    Only the first level is listed up front.  Directories get a placeholder
+    child so they can be expanded, and their contents are read with
+    os.scandir on a worker thread the first time they are opened, then
+    inserted a batch at a time from after() callbacks.  Opening a huge
+    project therefore costs the same as opening a small one.
+    """
+    BATCH = 500         # Rows inserted per tick
+    PLACEHOLDER = 'Loading...'
+
+    def __init__(self, tree, exclude=None):
+        self.tree = tree
+        self.exclude = list(EXCLUDE_GLOBS if exclude is None else exclude)
+        self.root = None
+        self.paths = {}         # Node -> absolute path
+        self.nodes = {}         # Absolute path -> node
+        self.directories = set()
+        self.loaded = set()     # Directory nodes whose children were requested
+        self.in_flight = set()  # Directory nodes being listed on a worker thread
+        self.generation = 0     # Bumped on set_root so stale listings are dropped
+        self.results = queue.Queue()
+        self.pending = deque()  # (node, entries) waiting to be inserted
+        self.listing = 0        # Listings still running on worker threads
+        self.poll_job = None
+        tree.bind('<<TreeviewOpen>>', self.on_open, add='+')
+
+    def set_root(self, root):
+        """Show a new project, listing only its top level"""
+        self.generation += 1
+        self.tree.delete(*self.tree.get_children())
+        self.paths.clear()
+        self.nodes.clear()
+        self.directories.clear()
+        self.loaded.clear()
+        self.in_flight.clear()
+        self.pending.clear()
+        self.root = root
+        node = self.tree.insert('', 'end', text=root, open=True)
+        self.paths[node] = root
+        self.nodes[root] = node
+        self.directories.add(node)
+        self.load(node)
+
+    def path_of(self, node):
+        return self.paths.get(node)
+
+    def is_directory(self, node):
+        return node in self.directories
+
+    def excluded(self, name):
+        return any(fnmatch(name, pattern) for pattern in self.exclude)
+
+    def on_open(self, event=None):
+        node = self.tree.focus()
+        if node in self.directories and node not in self.loaded:
+            self.load(node)
+
+    def load(self, node):
+        """List a directory on a worker thread"""
+        self.loaded.add(node)
+        self.in_flight.add(node)
+        self.listing += 1
+        threading.Thread(target=self.list_directory,
+                         args=(self.generation, node, self.paths[node]),
+                         daemon=True).start()
+        self.schedule_poll()
+
+    def reload(self, node):
+        """Re-list an already expanded directory, e.g. after files changed"""
+        if node not in self.loaded:
+            return
+        self.tree.delete(*self.tree.get_children(node))
+        self.forget_children(node)
+        self.load(node)
+
+    def forget_children(self, node):
+        prefix = self.paths[node] + os.sep
+        for child in [child for child, path in self.paths.items() if path.startswith(prefix)]:
+            self.forget(child)
+
+    def forget(self, node):
+        del self.nodes[self.paths.pop(node)]
+        self.directories.discard(node)
+        self.loaded.discard(node)
+        self.in_flight.discard(node)
+
+    # Filesystem watcher updates
+
+    def apply_changes(self, change_set):
+        """FileWatcher subscriber: patch only the directories that changed"""
+        if self.root is None:
+            return
+        if change_set.overflow:
+            for node in list(self.loaded):
+                self.reload(node)
+            return
+        for path, kind in sorted(change_set.changes.items()):
+            if kind == 'created':
+                self.add_path(path)
+            elif kind == 'deleted':
+                self.remove_path(path)
+
+    def listed(self, node):
+        """Whether a directory's children are in the tree and settled"""
+        return (node in self.loaded and node not in self.in_flight
+                and not any(item[0] == node for item in self.pending))
+
+    def add_path(self, relative):
+        """Insert a new path and any missing parents below listed directories"""
+        node, path = self.nodes[self.root], self.root
+        parts = relative.split(os.sep)
+        for depth, part in enumerate(parts):
+            if not self.listed(node) or self.excluded(part):
+                return  # Listed in full once it is expanded
+            path = os.path.join(path, part)
+            child = self.nodes.get(path)
+            if child is None:
+                is_dir = depth < len(parts) - 1 or os.path.isdir(path)
+                child = self.insert_entry(node, part, is_dir, sort=True)
+            node = child
+
+    def remove_path(self, relative):
+        """Drop the topmost vanished node on the way down to a deleted path"""
+        path = os.path.join(self.root, relative)
+        while os.path.dirname(path) != self.root and not os.path.exists(os.path.dirname(path)):
+            path = os.path.dirname(path)
+        node = self.nodes.get(path)
+        if node is not None and not os.path.exists(path):
+            self.forget_children(node)
+            self.forget(node)
+            self.tree.delete(node)
+
+    def insert_entry(self, parent, name, is_dir, sort=False):
+        """Add one child row, keeping directories first when sort is set"""
+        index = 'end'
+        if sort:
+            siblings = self.tree.get_children(parent)
+            keys = [(child not in self.directories, self.tree.item(child, 'text').lower())
+                    for child in siblings]
+            index = bisect_left(keys, (not is_dir, name.lower()))
+        child = self.tree.insert(parent, index, text=name, open=False)
+        path = os.path.join(self.paths[parent], name)
+        self.paths[child] = path
+        self.nodes[path] = child
+        if is_dir:
+            self.directories.add(child)
+            self.tree.insert(child, 'end', text=self.PLACEHOLDER)
+        return child
+
+    def list_directory(self, generation, node, path):
+        """Thread body: directories first, then files, each sorted by name"""
+        entries = []
+        try:
+            with os.scandir(path) as scan:
+                for entry in scan:
+                    if self.excluded(entry.name):
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    entries.append((not is_dir, entry.name.lower(), entry.name, is_dir))
+        except OSError:
+            pass
+        entries.sort()
+        self.results.put((generation, node, [(name, is_dir) for _, _, name, is_dir in entries]))
+
+    def schedule_poll(self):
+        if self.poll_job is None:
+            self.poll_job = self.tree.after(20, self.poll)
+
+    def cancel(self):
+        if self.poll_job is not None:
+            self.tree.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def poll(self):
+        """Insert finished listings, at most BATCH rows per tick"""
+        self.poll_job = None
+        while True:
+            try:
+                generation, node, entries = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.listing -= 1
+            if generation != self.generation:
+                continue
+            self.in_flight.discard(node)
+            if self.tree.exists(node):
+                self.forget_children(node)
+                self.tree.delete(*self.tree.get_children(node))
+                self.pending = deque(item for item in self.pending if item[0] != node)
+                self.pending.append((node, deque(entries)))
+        budget = self.BATCH
+        while self.pending and budget > 0:
+            node, entries = self.pending[0]
+            if node not in self.paths or not self.tree.exists(node):
+                self.pending.popleft()
+                continue
+            while entries and budget > 0:
+                name, is_dir = entries.popleft()
+                self.insert_entry(node, name, is_dir)
+                budget -= 1
+            if not entries:
+                self.pending.popleft()
+        if self.pending or self.listing:
+            self.schedule_poll()
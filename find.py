@@ -0,0 +1,310 @@
+import queue
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+MAX_MATCHES = 1000000
+MAX_TAGGED = 2000       # Matches tagged in one viewport
+
+
+def compile_pattern(pattern, regex=False, case=False):
+    """Compiled search pattern; raises re.error for a bad regex"""
+    flags = re.MULTILINE | (0 if case else re.IGNORECASE)
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+
+def find_matches(pieces, compiled, cancelled, limit=MAX_MATCHES):
+    """Sorted (starts, ends) of the non-empty matches in a Document snapshot"""
+    text = ''.join(buffer[start:end] for buffer, start, end in pieces)
+    starts, ends = [], []
+    for i, match in enumerate(compiled.finditer(text)):
+        if match.end() > match.start():
+            starts.append(match.start())
+            ends.append(match.end())
+            if len(starts) >= limit:
+                break
+        if not i % 1000 and cancelled.is_set():
+            return None
+    return starts, ends
+
+
+class FindJob:
+    def __init__(self, pieces, compiled, version):
+        self.pieces = pieces
+        self.compiled = compiled
+        self.version = version
+        self.cancelled = threading.Event()
+        self.results = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            result = find_matches(self.pieces, self.compiled, self.cancelled)
+        except Exception as e:
+            result = e
+        self.results.put(result)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class FindEngine:
+    """Incremental find over an EditorTab's Document
+
+    A search runs on a snapshot of the document on a worker thread and
+    produces sorted match start/end offsets for the version it saw.  Edits
+    made since are applied to those offsets on the fly through
+    Document.changes_since (matches an edit touched drop out) while a new
+    search is debounced, so counting, next and previous stay O(log n)
+    bisects.  Only the matches in the viewport are tagged, by the editor's
+    'find' render task.  on_update() is called on the Tk thread whenever
+    the matches or the current match change.
+    """
+    POLL_MS = 30
+    RESEARCH_MS = 250   # Quiet time after an edit before searching again
+
+    def __init__(self, editor, on_update=None):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.document = editor.document
+        self.on_update = on_update
+        self.compiled = None
+        self.starts = []
+        self.ends = []
+        self.version = 0        # Document version the offsets belong to
+        self.current = None     # Index of the selected match
+        self.job = None
+        self.poll_job = None
+        self.error = None
+        self.text_area.tag_configure('find_match', background='#613214')
+        self.text_area.tag_configure('find_current', background='#515c6a')
+        self.text_area.tag_raise('find_current', 'find_match')
+        editor.scheduler.add_task('find', self.tag_visible)
+        editor.scheduler.add_task('find_search', self.research, delay=self.RESEARCH_MS)
+        self.document.listeners.append(self.on_document_edit)
+
+    # Searching
+
+    def search(self, pattern, regex=False, case=False):
+        """Start a new search; an empty pattern clears the matches"""
+        self.cancel()
+        self.error = None
+        self.compiled = None
+        self.starts, self.ends, self.current = [], [], None
+        if pattern:
+            try:
+                self.compiled = compile_pattern(pattern, regex, case)
+            except re.error as e:
+                self.error = e
+        if self.compiled is not None:
+            self.start_job()
+        self.changed()
+
+    def start_job(self):
+        self.cancel()
+        self.job = FindJob(self.document.snapshot(), self.compiled, self.document.version)
+        self.job.thread.start()
+        self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+
+    def research(self):
+        if self.compiled is not None:
+            self.start_job()
+
+    def searching(self):
+        return self.job is not None
+
+    def poll(self):
+        self.poll_job = None
+        job = self.job
+        if job is None:
+            return
+        try:
+            result = job.results.get_nowait()
+        except queue.Empty:
+            self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+            return
+        self.job = None
+        if isinstance(result, Exception):
+            self.error = result
+        elif result is not None:
+            self.starts, self.ends = result
+            self.version = job.version
+            self.current = None
+        self.changed()
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        if self.poll_job is not None:
+            self.editor.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    def destroy(self):
+        self.cancel()
+        self.document.listeners.remove(self.on_document_edit)
+
+    def clear(self):
+        self.search('')
+        self.text_area.tag_remove('find_match', '1.0', 'end')
+        self.text_area.tag_remove('find_current', '1.0', 'end')
+
+    def schedule(self):
+        """Retag after a scroll, if there is anything to show"""
+        if self.starts:
+            self.editor.scheduler.mark('find')
+
+    def on_document_edit(self, edit):
+        if self.compiled is not None:
+            self.editor.scheduler.mark('find_search')
+            self.editor.scheduler.mark('find')
+
+    def changed(self):
+        self.editor.scheduler.mark('find')
+        if self.on_update is not None:
+            self.on_update()
+
+    # Offsets: stored for self.version, mapped to and from the live document
+
+    def pending_edits(self):
+        """Edits since the search, or None if too many to replay"""
+        edits = self.document.changes_since(self.version)
+        if edits is None or len(edits) > 100:
+            return None
+        return edits
+
+    def live(self, index, edits):
+        """Current (start, end) of match index, or None if an edit touched it"""
+        start, end = self.starts[index], self.ends[index]
+        for edit in edits:
+            if end <= edit.offset:
+                continue
+            if start < edit.offset + edit.removed:
+                return None
+            delta = len(edit.text) - edit.removed
+            start, end = start + delta, end + delta
+        return start, end
+
+    def stored(self, offset, edits):
+        """A live offset translated back to the searched version"""
+        for edit in reversed(edits):
+            if offset >= edit.offset + len(edit.text):
+                offset -= len(edit.text) - edit.removed
+            elif offset > edit.offset:
+                offset = edit.offset
+        return offset
+
+    def count(self):
+        return len(self.starts)
+
+    def index_after(self, offset, edits):
+        """First match at or after a live offset"""
+        return bisect_left(self.starts, self.stored(offset, edits))
+
+    def step(self, forward=True):
+        """Select the next (or previous) match from the cursor, wrapping around"""
+        edits = self.pending_edits()
+        if not self.starts or edits is None:
+            return None
+        if forward:
+            anchor = self.document.offset_of(*self.cursor('insert'))
+            index = self.index_after(anchor, edits)
+        else:
+            selection = self.text_area.tag_ranges('sel')
+            anchor = self.document.offset_of(*self.cursor(selection[0] if selection else 'insert'))
+            index = self.index_after(anchor, edits) - 1
+        for _ in range(min(len(self.starts), 100)):
+            index %= len(self.starts)
+            found = self.live(index, edits)
+            if found is not None:
+                self.select(index, *found)
+                return index
+            index += 1 if forward else -1
+        return None
+
+    def cursor(self, index):
+        line, col = map(int, self.text_area.index(index).split('.'))
+        return line - 1, col
+
+    def tk_index(self, offset):
+        line, col = self.document.position_of(offset)
+        return f'{line + 1}.{col}'
+
+    def select(self, index, start, end):
+        self.current = index
+        first, last = self.tk_index(start), self.tk_index(end)
+        self.text_area.tag_remove('sel', '1.0', 'end')
+        self.text_area.tag_add('sel', first, last)
+        self.text_area.mark_set('insert', last)
+        self.text_area.see(first)
+        self.changed()
+
+    def tag_visible(self):
+        """Render task: tag the matches on screen, and only those"""
+        self.text_area.tag_remove('find_match', '1.0', 'end')
+        self.text_area.tag_remove('find_current', '1.0', 'end')
+        edits = self.pending_edits()
+        if not self.starts or edits is None:
+            return
+        top = int(self.text_area.index('@0,0').split('.')[0]) - 1
+        bottom = int(self.text_area.index(f'@0,{self.text_area.winfo_height()}').split('.')[0])
+        first = self.document.offset_of(top, 0)
+        last = self.document.offset_of(bottom, 0)
+        # Matches that end in the viewport may start above it
+        index = max(0, bisect_right(self.ends, self.stored(first, edits)) - 1)
+        end = bisect_left(self.starts, self.stored(last, edits) + 1)
+        for i in range(index, min(end, index + MAX_TAGGED)):
+            found = self.live(i, edits)
+            if found is None or found[1] <= first or found[0] > last:
+                continue
+            tag = 'find_current' if i == self.current else 'find_match'
+            self.text_area.tag_add(tag, self.tk_index(found[0]), self.tk_index(found[1]))
+
+    # Replacing
+
+    def replacement(self, match, replace, regex):
+        return match.expand(replace) if regex else replace
+
+    def replace_current(self, replace, regex=False):
+        """Replace the selected match and move on to the next one"""
+        edits = self.pending_edits()
+        if self.current is None or edits is None or self.current >= len(self.starts):
+            return self.step()
+        found = self.live(self.current, edits)
+        if found is None:
+            return self.step()
+        # Match in place: lookarounds, anchors and \b depend on the text around it
+        match = self.compiled.search(self.document.get_text(), found[0])
+        if match is None or match.span() != found:
+            return self.step()
+        first, last = self.tk_index(found[0]), self.tk_index(found[1])
+        self.text_area.replace(first, last, self.replacement(match, replace, regex))
+        self.current = None
+        return self.step()
+
+    def replace_all(self, replace, regex=False):
+        """Replace every match as one edit spanning the first to the last
+
+        Returns the number of replacements.  The edit is a single undo step
+        and the highlighter, gutter and indexes see one changed range.
+        """
+        if self.compiled is None:
+            return 0
+        text = self.document.get_text()
+        pieces, position, count = [], None, 0
+        for match in self.compiled.finditer(text):
+            if match.end() == match.start():
+                continue
+            if position is None:
+                span_start = match.start()
+            else:
+                pieces.append(text[position:match.start()])
+            pieces.append(self.replacement(match, replace, regex))
+            position = match.end()
+            count += 1
+        if not count:
+            return 0
+        self.text_area.edit_separator()
+        self.text_area.replace(self.tk_index(span_start), self.tk_index(position), ''.join(pieces))
+        self.text_area.edit_separator()
+        return count
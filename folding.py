@@ -0,0 +1,246 @@
+import ast
+
+TAB_SIZE = 4
+BLANK = -1
+
+
+def indent_of(line):
+    """Indentation width of a line, or BLANK if it is only whitespace"""
+    stripped = line.lstrip(' \t')
+    if not stripped:
+        return BLANK
+    return len(line[:len(line) - len(stripped)].expandtabs(TAB_SIZE))
+
+
+def python_fold_ranges(source):
+    """{header line: last line} (0-based) of the multi-line statements in Python source"""
+    ranges = {}
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.stmt) and node.end_lineno > node.lineno:
+            # Outer statements are walked first and win a shared header line
+            ranges.setdefault(node.lineno - 1, node.end_lineno - 1)
+    return ranges
+
+
+class FoldIndex:
+    """Fold ranges of an EditorTab and the regions currently folded
+
+    Ranges come from indentation: a line heads a fold when the next
+    non-blank line is indented deeper, and the fold runs to the last line
+    before the indentation drops back.  Indents are cached per line and
+    computed on demand, and an edit only invalidates the lines it
+    replaced, so nothing is scanned up front even in huge files.  Small
+    Python files are also parsed with ast once typing pauses, which also
+    folds multi-line statements that indentation cannot see.
+
+    Folded regions are hidden with an elided tag from the end of the
+    header line to the end of the fold, so the text stays in the widget
+    and display-line based work (scrolling, the gutter, the viewport the
+    highlighter tags) only sees what is shown.
+    """
+    MAX_AST = 256 << 10     # Characters; bigger files fold by indentation only
+    AST_DELAY = 500
+    MAX_SCAN = 10000        # Lines looked at when searching for an enclosing fold
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.document = editor.document
+        self.indents = []
+        self.folded = {}        # Header line -> last line, both 0-based
+        self.ast_ranges = {}
+        self.ast_version = None
+        self.python = False
+        self.text_area.tag_configure('folded', elide=True)
+        editor.scheduler.add_task('fold_ast', self.parse, delay=self.AST_DELAY)
+        self.reset()
+
+    def reset(self):
+        """Forget everything, e.g. after loading a new file"""
+        self.text_area.tag_remove('folded', '1.0', 'end')
+        self.folded = {}
+        self.indents = [None] * self.document.line_count()
+        self.ast_ranges = {}
+        self.ast_version = None
+        if self.python:
+            self.editor.scheduler.mark('fold_ast')
+
+    def set_python(self, python):
+        self.python = python
+        self.reset()
+
+    # Ranges
+
+    def indent(self, line):
+        value = self.indents[line]
+        if value is None:
+            value = self.indents[line] = indent_of(self.document.get_line(line))
+        return value
+
+    def parse(self):
+        """Render task: refresh the ast ranges of a small Python file"""
+        if not self.python or len(self.document) > self.MAX_AST:
+            return
+        version = self.document.version
+        try:
+            self.ast_ranges = python_fold_ranges(self.document.get_text())
+        except (SyntaxError, ValueError, RecursionError):
+            return  # Half-typed code: keep the last good parse until it parses again
+        self.ast_version = version
+        self.editor.line_numbers.schedule_redraw(force=True)
+
+    def ast_end(self, line):
+        if self.ast_version == self.document.version:
+            return self.ast_ranges.get(line)
+        return None
+
+    def next_indent(self, line):
+        """Indent of the first non-blank line after line, or BLANK"""
+        count = len(self.indents)
+        for other in range(line + 1, min(count, line + 100)):
+            value = self.indent(other)
+            if value != BLANK:
+                return value
+        return BLANK
+
+    def foldable(self, line):
+        if self.ast_end(line) is not None:
+            return True
+        value = self.indent(line)
+        return value != BLANK and self.next_indent(line) > value
+
+    def fold_end(self, line):
+        """Last line (0-based) of the fold headed by line, or None"""
+        end = self.ast_end(line)
+        if end is not None:
+            return end
+        value = self.indent(line)
+        if value == BLANK:
+            return None
+        end = None
+        for other in range(line + 1, len(self.indents)):
+            other_indent = self.indent(other)
+            if other_indent == BLANK:
+                continue
+            if other_indent <= value:
+                break
+            end = other
+        return end
+
+    def enclosing(self, line):
+        """Header of the innermost indentation fold containing line, or None"""
+        target = self.indent(line)
+        if target == BLANK:
+            target = self.next_indent(line)
+        if target == BLANK:
+            return None
+        for header in range(line - 1, max(-1, line - self.MAX_SCAN), -1):
+            value = self.indent(header)
+            if value != BLANK and value < target:
+                return header
+        return None
+
+    def marker(self, line):
+        """Gutter marker for a 0-based line"""
+        if line in self.folded:
+            return '▸'
+        return '▾' if self.foldable(line) else ''
+
+    def visible_segments(self, first, last):
+        """Runs of lines in first..last that are not folded away"""
+        segments = []
+        start = first
+        for header, end in sorted(self.folded.items()):
+            if end < start or header >= last:
+                continue
+            if header + 1 > start:
+                segments.append((start, header))
+            start = max(start, end + 1)
+        if start <= last:
+            segments.append((start, last))
+        return segments
+
+    # Folding
+
+    def toggle(self, line):
+        """Fold or unfold the region headed by line (0-based)"""
+        if line in self.folded:
+            self.unfold(line)
+        else:
+            self.fold(line)
+
+    def fold(self, line):
+        end = self.fold_end(line)
+        if end is None or end <= line:
+            return
+        self.folded[line] = end
+        self.text_area.tag_add('folded', f'{line + 1}.end', f'{end + 1}.end')
+        cursor = int(self.text_area.index('insert').split('.')[0]) - 1
+        if line < cursor <= end:
+            self.text_area.mark_set('insert', f'{line + 1}.end')
+        self.changed()
+
+    def unfold(self, line):
+        end = self.folded.pop(line, None)
+        if end is None:
+            return
+        self.text_area.tag_remove('folded', f'{line + 1}.end', f'{end + 1}.end')
+        # Folds nested inside stay folded
+        for header, inner_end in self.folded.items():
+            if line < header <= end:
+                self.text_area.tag_add('folded', f'{header + 1}.end', f'{inner_end + 1}.end')
+        self.changed()
+
+    def fold_at_cursor(self):
+        line = int(self.text_area.index('insert').split('.')[0]) - 1
+        header = line if self.foldable(line) and line not in self.folded else self.enclosing(line)
+        if header is not None and header not in self.folded:
+            self.fold(header)
+        return 'break'
+
+    def unfold_at_cursor(self):
+        line = int(self.text_area.index('insert').split('.')[0]) - 1
+        for header, end in list(self.folded.items()):
+            if header <= line <= end:
+                self.unfold(header)
+        return 'break'
+
+    def unfold_all(self):
+        self.text_area.tag_remove('folded', '1.0', 'end')
+        self.folded = {}
+        self.changed()
+
+    def changed(self):
+        self.editor.line_numbers.schedule_redraw(force=True)
+        self.editor.highlighter.schedule()
+
+    def on_edit(self, first, old_last, new_last):
+        """Edit listener: splice the indent cache and move or drop folds"""
+        start, old_end, new_end = first - 1, old_last - 1, new_last - 1
+        self.indents[start:old_end + 1] = [None] * (new_end - start + 1)
+        delta = new_end - old_end
+        folded = {}
+        dropped = []
+        for header, end in self.folded.items():
+            if end < start:
+                folded[header] = end
+            elif header > old_end:
+                folded[header + delta] = end + delta
+            elif header == start == old_end == new_end:
+                folded[header] = end    # Typing on the header line itself
+            else:
+                dropped.append((header, end))
+        self.folded = folded
+        shown = []
+        for header, end in dropped:
+            # The edit reached into the fold: show it rather than hide changed text
+            last = max(header, min(end + delta, len(self.indents) - 1))
+            self.text_area.tag_remove('folded', f'{header + 1}.end', f'{last + 1}.end')
+            shown.append((header, last))
+        for header, end in self.folded.items():
+            if any(first < header <= last for first, last in shown):
+                self.text_area.tag_add('folded', f'{header + 1}.end', f'{end + 1}.end')
+        if dropped:
+            self.changed()
+        if self.python:
+            self.editor.scheduler.mark('fold_ast')
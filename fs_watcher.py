@@ -0,0 +1,318 @@
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from search_engine import GitIgnore
+from trigram_index import SKIP_DIRS
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+GIT_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class ChangeSet:
+    """Debounced batch of changes below a watched root"""
+    def __init__(self, changes, overflow=False, git=False):
+        self.changes = changes      # Relative path -> 'created', 'modified' or 'deleted'
+        self.overflow = overflow    # Events were lost: consumers should rescan
+        self.git = git              # HEAD, the index or refs changed under .git
+
+    def __bool__(self):
+        return bool(self.changes) or self.overflow or self.git
+
+    def directories(self):
+        """Directories whose listing changed (relative, '' for the root)"""
+        return {os.path.dirname(path) for path, kind in self.changes.items()
+                if kind != 'modified'}
+
+
+def merge_change(changes, path, kind):
+    """Fold a new event into the pending changes for a path"""
+    previous = changes.get(path)
+    if previous == 'created' and kind == 'deleted':
+        del changes[path]
+    elif previous == 'created' and kind == 'modified':
+        pass
+    elif previous == 'deleted' and kind == 'created':
+        changes[path] = 'modified'
+    else:
+        changes[path] = kind
+
+
+class InotifyBackend:
+    """Recursive inotify watches on Linux, added per directory"""
+    def __init__(self, root, ignore, report):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.root = root
+        self.ignore = ignore
+        self.report = report
+        self.watches = {}   # Watch descriptor -> relative directory ('' for the root)
+
+    def watch(self, directory, created=False):
+        """Watch a directory and everything below it that is not ignored
+
+        For a directory that just appeared, its contents are reported as
+        created since their own events happened before the watch existed.
+        """
+        stack = [directory]
+        while stack:
+            relative = stack.pop()
+            path = os.path.join(self.root, relative)
+            wd = self.add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                continue
+            self.watches[wd] = relative
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            for entry in entries:
+                name = os.path.join(relative, entry.name) if relative else entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir and entry.name == '.git' and not relative:
+                    wd = self.add_watch(self.fd, os.fsencode(entry.path), GIT_MASK)
+                    if wd >= 0:
+                        self.watches[wd] = None
+                    continue
+                if entry.name in SKIP_DIRS or self.ignore.ignored(name, is_dir):
+                    continue
+                if is_dir:
+                    stack.append(name)
+                if created:
+                    self.report(name, 'created')
+
+    def start(self):
+        self.watch('')
+
+    def run(self, stopped):
+        while not stopped.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self.parse(data)
+
+    def parse(self, data):
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.report(None, 'overflow')
+                continue
+            if wd not in self.watches:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            directory = self.watches[wd]
+            if directory is None:
+                if name in ('HEAD', 'index', 'packed-refs') or name.endswith('.lock'):
+                    self.report(None, 'git')
+                continue
+            if not name or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+            path = os.path.join(directory, name) if directory else name
+            is_dir = bool(mask & IN_ISDIR)
+            if name in SKIP_DIRS or self.ignore.ignored(path, is_dir):
+                continue
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self.report(path, 'created')
+                if is_dir:
+                    self.watch(path, created=True)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.report(path, 'deleted')
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE):
+                self.report(path, 'modified')
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """Fallback that compares mtime snapshots of the tree every INTERVAL seconds"""
+    INTERVAL = 2.0
+
+    def __init__(self, root, ignore, report):
+        self.root = root
+        self.ignore = ignore
+        self.report = report
+        self.snapshot = {}
+        self.git_snapshot = None
+
+    def scan(self):
+        snapshot = {}
+        for name in self.ignore.walk():
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            snapshot[name.replace('/', os.sep)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def scan_git(self):
+        stamps = []
+        for name in ('HEAD', 'index'):
+            try:
+                stamps.append(os.stat(os.path.join(self.root, '.git', name)).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return stamps
+
+    def start(self):
+        self.snapshot = self.scan()
+        self.git_snapshot = self.scan_git()
+
+    def run(self, stopped):
+        while not stopped.wait(self.INTERVAL):
+            snapshot = self.scan()
+            for name, stamp in snapshot.items():
+                previous = self.snapshot.get(name)
+                if previous is None:
+                    self.report(name, 'created')
+                elif previous != stamp:
+                    self.report(name, 'modified')
+            for name in self.snapshot.keys() - snapshot.keys():
+                self.report(name, 'deleted')
+            self.snapshot = snapshot
+            git_snapshot = self.scan_git()
+            if git_snapshot != self.git_snapshot:
+                self.git_snapshot = git_snapshot
+                self.report(None, 'git')
+
+    def close(self):
+        pass
+
+
+class FileWatcher:
+    """Watches a project tree and publishes debounced ChangeSets on the Tk thread
+
+    Events are gathered by a backend thread (inotify on Linux, mtime polling
+    elsewhere) and merged per path.  Once nothing has happened for DEBOUNCE
+    seconds the merged batch is handed to every subscriber from an after()
+    callback, so subscribers can touch widgets directly.
+    """
+    DEBOUNCE = 0.2
+    POLL_MS = 100
+
+    def __init__(self, root, widget):
+        self.root = root
+        self.widget = widget
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.changes = {}
+        self.overflow = False
+        self.git = False
+        self.last_event = 0
+        self.stopped = threading.Event()
+        self.backend = None
+        self.thread = None
+        self.poll_job = None
+        self.error = None   # Set if the watcher thread died
+
+    def subscribe(self, callback):
+        """Register callback(change_set), called on the Tk thread"""
+        self.subscribers.append(callback)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+        return self
+
+    def create_backend(self):
+        """inotify where available, polling if it is missing or fails to start"""
+        ignore = GitIgnore(self.root)
+        if sys.platform.startswith('linux') and ctypes is not None:
+            backend = None
+            try:
+                backend = InotifyBackend(self.root, ignore, self.report)
+                backend.start()
+                return backend
+            except (OSError, AttributeError):
+                if backend is not None:
+                    backend.close()
+        backend = PollingBackend(self.root, ignore, self.report)
+        backend.start()
+        return backend
+
+    def run(self):
+        """Thread body: set up the watches, then pump events until stopped"""
+        try:
+            self.backend = self.create_backend()
+            self.backend.run(self.stopped)
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.backend is not None:
+                self.backend.close()
+
+    def report(self, path, kind):
+        """Backend callback, called on the watcher thread"""
+        with self.lock:
+            if kind == 'overflow':
+                self.overflow = True
+            elif kind == 'git':
+                self.git = True
+            else:
+                merge_change(self.changes, path, kind)
+            self.last_event = time.monotonic()
+
+    def poll(self):
+        self.poll_job = None
+        change_set = None
+        with self.lock:
+            if self.last_event and time.monotonic() - self.last_event >= self.DEBOUNCE:
+                change_set = ChangeSet(self.changes, self.overflow, self.git)
+                self.changes, self.overflow, self.git = {}, False, False
+                self.last_event = 0
+        if not self.stopped.is_set():
+            self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+        if change_set:
+            for callback in self.subscribers:
+                callback(change_set)
+
+    def stop(self):
+        self.stopped.set()
+        if self.poll_job is not None:
+            self.widget.after_cancel(self.poll_job)
+            self.poll_job = None
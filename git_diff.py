@@ -0,0 +1,333 @@
+import os
+import queue
+import subprocess
+import threading
+from bisect import bisect_right
+from difflib import SequenceMatcher
+
+INLINE_LINES = 5000     # Dirty regions up to this size are re-diffed on the Tk thread
+DIFF_COLORS = {'added': '#587c0c', 'modified': '#0c7d9d', 'deleted': '#94151b'}
+
+
+def diff_hunks(base, lines, base_offset=0, offset=0):
+    """Changed regions [start, end, base_start, base_end] between two line lists
+
+    Ranges are half-open: lines[start:end] replaced base[base_start:base_end],
+    shifted by the offsets.  Common leading and trailing lines are skipped
+    before SequenceMatcher sees the rest, so a few edits in a big file
+    cost a linear scan.
+    """
+    count = min(len(base), len(lines))
+    prefix = 0
+    while prefix < count and base[prefix] == lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < count - prefix and
+           base[len(base) - 1 - suffix] == lines[len(lines) - 1 - suffix]):
+        suffix += 1
+    old = base[prefix:len(base) - suffix]
+    new = lines[prefix:len(lines) - suffix]
+    start, base_start = offset + prefix, base_offset + prefix
+    if not old and not new:
+        return []
+    if not old or not new:
+        return [[start, start + len(new), base_start, base_start + len(old)]]
+    return [[start + j1, start + j2, base_start + i1, base_start + i2]
+            for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new).get_opcodes()
+            if tag != 'equal']
+
+
+def base_lines(data):
+    """Lines of a HEAD blob as the editor would show them"""
+    text = data.decode('utf-8', errors='replace')
+    return text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+
+class GitBlobStore:
+    """HEAD contents of files, through one long-lived `git cat-file --batch` per repository
+
+    Safe to call from any thread; reads are serialised by a lock.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.processes = {}     # Work tree top -> cat-file process
+        self.tops = {}          # Directory -> work tree top, or None outside a repository
+
+    def toplevel(self, directory):
+        if directory not in self.tops:
+            try:
+                result = subprocess.run(['git', 'rev-parse', '--show-toplevel'], cwd=directory,
+                                        capture_output=True, text=True)
+                top = result.stdout.strip() if result.returncode == 0 else None
+            except OSError:
+                top = None
+            self.tops[directory] = top and os.path.realpath(top)
+        return self.tops[directory]
+
+    def read_head(self, path):
+        """(blob id, bytes) of a file in HEAD, or None if git does not track it"""
+        path = os.path.realpath(path)
+        with self.lock:
+            top = self.toplevel(os.path.dirname(path))
+            if top is None:
+                return None
+            name = os.path.relpath(path, top).replace(os.sep, '/')
+            if '\n' in name or name.startswith('..'):
+                return None
+            process = self.processes.get(top)
+            try:
+                if process is None or process.poll() is not None:
+                    process = self.processes[top] = subprocess.Popen(
+                        ['git', 'cat-file', '--batch'], cwd=top,
+                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                        stderr=subprocess.DEVNULL)
+                process.stdin.write(f'HEAD:{name}\n'.encode('utf-8'))
+                process.stdin.flush()
+                header = process.stdout.readline().split()
+                if len(header) != 3:
+                    return None     # '<name> missing': untracked, or no commits yet
+                data = process.stdout.read(int(header[2]))
+                process.stdout.read(1)
+            except (OSError, ValueError):
+                process.kill()
+                del self.processes[top]
+                return None
+            return (header[0].decode(), data) if header[1] == b'blob' else None
+
+    def close(self):
+        with self.lock:
+            for process in self.processes.values():
+                try:
+                    process.stdin.close()
+                    process.wait(timeout=1)
+                except (OSError, subprocess.TimeoutExpired):
+                    process.kill()
+            self.processes = {}
+
+
+class DiffJob:
+    """Loads the HEAD blob if asked to and diffs a Document snapshot against it"""
+    def __init__(self, store, path, base, pieces, version, window=None):
+        self.store = store
+        self.path = path
+        self.base = base            # (blob id, lines), or None to load it
+        self.pieces = pieces
+        self.version = version
+        self.window = window        # [start, end, base_start, base_end] to re-diff, or all
+        self.results = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            base = self.base
+            if base is None:
+                blob = self.store.read_head(self.path)
+                base = (blob[0], base_lines(blob[1])) if blob is not None else (None, None)
+            hunks = None
+            if base[1] is not None:
+                lines = ''.join(buffer[s:e] for buffer, s, e in self.pieces).split('\n')
+                if self.window is None:
+                    hunks = diff_hunks(base[1], lines)
+                else:
+                    start, end, base_start, base_end = self.window
+                    hunks = diff_hunks(base[1][base_start:base_end], lines[start:end],
+                                       base_start, start)
+            result = (base, hunks)
+        except Exception as e:
+            result = e
+        self.results.put(result)
+
+
+class LineDiff:
+    """Lines of an EditorTab's Document changed relative to git HEAD
+
+    The HEAD blob is loaded once (per commit) through GitBlobStore and the
+    changes are kept as sorted hunks.  An edit does not start over:
+    hunks below it are shifted, and the edited lines, together with any
+    hunk they touch, become one dirty hunk spanning both the current and
+    base lines involved.  Once edits pause, only dirty hunks are diffed
+    again (inline when small, on a worker thread otherwise), so the cost
+    follows the size of the edit rather than the file.  marker(line) is a
+    bisect, for the gutter's visible rows.
+    """
+    IDLE_MS = 300
+    POLL_MS = 30
+
+    def __init__(self, editor, store):
+        self.editor = editor
+        self.document = editor.document
+        self.store = store
+        self.path = editor.file_path
+        self.blob = None
+        self.base = None        # HEAD lines, None when git does not track the file
+        self.hunks = []         # [start, end, base_start, base_end], sorted
+        self.dirty = set()      # Indexes into hunks that need diffing again
+        self.starts = None      # Hunk starts for bisect, rebuilt lazily
+        self.job = None
+        self.idle_job = None
+        self.poll_job = None
+        self.error = None
+        self.document.listeners.append(self.on_document_edit)
+        self.reload()
+
+    def close(self):
+        self.document.listeners.remove(self.on_document_edit)
+        if self.idle_job is not None:
+            self.editor.after_cancel(self.idle_job)
+            self.idle_job = None
+        if self.poll_job is not None:
+            self.editor.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.job = None
+
+    def reload(self):
+        """(Re)load the HEAD blob and diff the whole document against it"""
+        self.start_job(DiffJob(self.store, self.path, None, self.document.snapshot(),
+                               self.document.version))
+
+    def reset(self):
+        """The whole text was replaced, e.g. by a reload from disk"""
+        if self.base is not None:
+            self.start_job(DiffJob(self.store, self.path, (self.blob, self.base),
+                                   self.document.snapshot(), self.document.version))
+
+    def start_job(self, job):
+        self.job = job
+        job.thread.start()
+        if self.poll_job is None:
+            self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        self.poll_job = None
+        job = self.job
+        if job is None:
+            return
+        try:
+            result = job.results.get_nowait()
+        except queue.Empty:
+            self.poll_job = self.editor.after(self.POLL_MS, self.poll)
+            return
+        self.job = None
+        if isinstance(result, Exception):
+            self.error = result
+            return
+        (blob, base), hunks = result
+        if job.base is None and blob == self.blob and self.base is not None:
+            return      # HEAD has not moved for this file
+        self.blob, self.base = blob, base
+        if base is None:
+            self.set_hunks([])
+        elif job.version != self.document.version:
+            self.set_hunks([[0, self.document.line_count(), 0, len(base)]], dirty=True)
+            self.schedule()
+        elif job.window is None:
+            self.set_hunks(hunks)
+        else:
+            for index in self.dirty:
+                if self.hunks[index] == job.window:
+                    self.replace_dirty(index, hunks)
+                    break
+            self.changed()
+            if self.dirty:
+                self.schedule()
+
+    def set_hunks(self, hunks, dirty=False):
+        self.hunks = hunks
+        self.dirty = set(range(len(hunks))) if dirty else set()
+        self.changed()
+
+    def changed(self):
+        self.starts = None
+        if not self.editor.hibernated:
+            self.editor.line_numbers.schedule_redraw(force=True)
+
+    # Edits
+
+    def on_document_edit(self, edit):
+        if self.base is None:
+            return
+        start, old_end = edit.start_line, edit.end_line + 1
+        delta = edit.text.count('\n') - (edit.end_line - edit.start_line)
+        before, touched, after = [], [], []
+        for index, hunk in enumerate(self.hunks):
+            if hunk[1] < start:
+                before.append(index)
+            elif hunk[0] > old_end:
+                after.append(index)
+            else:
+                touched.append(index)
+        # Between hunks, line n of the document is line n - offset of the base
+        offset = self.hunks[before[-1]][1] - self.hunks[before[-1]][3] if before else 0
+        window = [start, old_end, start - offset, 0]
+        if touched:
+            first, last = self.hunks[touched[0]], self.hunks[touched[-1]]
+            window[0] = min(start, first[0])
+            window[1] = max(old_end, last[1])
+            window[2] = min(window[2], first[2])
+            offset = last[1] - last[3]
+        window[3] = window[1] - offset
+        window[1] += delta
+        hunks = [self.hunks[index] for index in before] + [window]
+        hunks += [[s + delta, e + delta, bs, be] for s, e, bs, be in
+                  (self.hunks[index] for index in after)]
+        self.dirty = ({index for index in self.dirty if index < len(before)} |
+                      {len(before)} |
+                      {index - len(touched) + 1 for index in self.dirty
+                       if after and index >= after[0]})
+        self.hunks = hunks
+        self.changed()
+        self.schedule()
+
+    def schedule(self):
+        if self.idle_job is not None:
+            self.editor.after_cancel(self.idle_job)
+        self.idle_job = self.editor.after(self.IDLE_MS, self.refine)
+
+    def size(self, index):
+        start, end, base_start, base_end = self.hunks[index]
+        return max(end - start, base_end - base_start)
+
+    def refine(self):
+        """Diff the dirty hunks again, small ones right away and a big one on a worker"""
+        self.idle_job = None
+        if not self.dirty:
+            return
+        if self.job is not None:
+            self.schedule()     # Wait for the running job
+            return
+        while self.dirty:
+            index = min(self.dirty, key=self.size)
+            start, end, base_start, base_end = window = list(self.hunks[index])
+            if self.size(index) > INLINE_LINES:
+                self.start_job(DiffJob(self.store, self.path, (self.blob, self.base),
+                                       self.document.snapshot(), self.document.version,
+                                       window))
+                break
+            lines = self.document.get_lines(start, end - 1) if end > start else []
+            self.replace_dirty(index, diff_hunks(self.base[base_start:base_end], lines,
+                                                 base_start, start))
+        self.changed()
+
+    def replace_dirty(self, index, hunks):
+        """Swap dirty hunk index for the hunks found inside it"""
+        self.hunks[index:index + 1] = hunks
+        shift = len(hunks) - 1
+        self.dirty = {i if i < index else i + shift for i in self.dirty if i != index}
+
+    # Queries
+
+    def marker(self, line):
+        """'added', 'modified', 'deleted' (lines removed just above) or None"""
+        if not self.hunks:
+            return None
+        if self.starts is None:
+            self.starts = [hunk[0] for hunk in self.hunks]
+        i = bisect_right(self.starts, line) - 1
+        if i < 0:
+            return None
+        start, end, base_start, base_end = self.hunks[i]
+        if start <= line < end:
+            return 'added' if base_start == base_end and i not in self.dirty else 'modified'
+        if start == end == line:
+            return 'deleted'
+        return None
@@ -0,0 +1,194 @@
+import os
+import queue
+import subprocess
+import threading
+
+STATUS_COMMAND = ['git', '--no-optional-locks', '--literal-pathspecs',
+                  'status', '--porcelain=v2', '-z']
+MAX_PATHS = 200     # More changed paths than this and a full status is cheaper
+
+
+def parse_porcelain_v2(data):
+    """{path: status} from `git status --porcelain=v2 -z` output
+
+    Status is the two-letter XY code of the short format ('M ', ' M',
+    'R ', '??', ...); paths are relative to the top of the work tree and
+    untracked directories keep their trailing '/'.
+    """
+    statuses = {}
+    records = data.split(b'\0')
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        kind = record[:1]
+        if kind == b'1':
+            fields = record.split(b' ', 8)
+            statuses[os.fsdecode(fields[8])] = fields[1].decode().replace('.', ' ')
+        elif kind == b'2':
+            fields = record.split(b' ', 9)
+            statuses[os.fsdecode(fields[9])] = fields[1].decode().replace('.', ' ')
+            i += 1  # The original path of the rename or copy
+        elif kind == b'u':
+            fields = record.split(b' ', 10)
+            statuses[os.fsdecode(fields[10])] = fields[1].decode()
+        elif kind == b'?':
+            statuses[os.fsdecode(record[2:])] = '??'
+    return statuses
+
+
+def under(path, paths):
+    """Whether path is one of paths or lies below one of them"""
+    return any(path == other or path.startswith(other + '/') for other in paths)
+
+
+class GitStatusService:
+    """Background, cached `git status` for the Source Control panel
+
+    Statuses are kept in `entries` and refreshed on a worker thread: in
+    full when the index or HEAD changed (their mtimes are the cache key),
+    or only for the paths a FileWatcher reported otherwise.  Each refresh
+    is compared with the cache and just the difference is handed to
+    on_diff(updated, removed) on the Tk thread, so the Treeview is patched
+    rather than rebuilt and showing the panel costs nothing.
+    """
+    POLL_MS = 50
+
+    def __init__(self, root, widget, on_diff, on_error=None):
+        self.root = root
+        self.widget = widget
+        self.on_diff = on_diff
+        self.on_error = on_error
+        self.entries = {}       # Path from the top of the work tree -> XY status
+        self.stamp = None       # (index mtime, HEAD mtime) of the cached full status
+        self.git_dir = None
+        self.prefix = None      # Project root relative to the top of the work tree
+        self.condition = threading.Condition()
+        self.pending = False    # A refresh was requested
+        self.full = False       # ...and it must be a full status
+        self.paths = set()      # Paths to re-check, relative to the project root
+        self.working = False
+        self.closed = False
+        self.thread = None
+        self.results = queue.Queue()
+        self.poll_job = None
+
+    def refresh(self, full=False):
+        """Bring the cache up to date in the background"""
+        with self.condition:
+            self.pending = True
+            self.full = self.full or full
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        self.schedule_poll()
+
+    def apply_changes(self, change_set):
+        """FileWatcher subscriber: re-check only the paths that changed"""
+        with self.condition:
+            if change_set.overflow or change_set.git:
+                self.full = True
+            self.paths.update(path.replace(os.sep, '/') for path in change_set.changes)
+        self.refresh()
+
+    def run(self):
+        """Thread body: serve refresh requests, coalescing any that pile up"""
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                full, paths = self.full, self.paths
+                self.pending, self.full, self.paths = False, False, set()
+                self.working = True
+            try:
+                result = self.update(full, paths)
+            except Exception as e:
+                self.stamp = None   # Start over with a full status next time
+                result = e
+            self.results.put(result)
+            with self.condition:
+                self.working = False
+
+    def run_status(self, paths=()):
+        args = STATUS_COMMAND + (['--'] + list(paths) if paths else [])
+        result = subprocess.run(args, cwd=self.root, capture_output=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors='replace').strip())
+        return parse_porcelain_v2(result.stdout)
+
+    def index_stamp(self):
+        stamps = []
+        for name in ('index', 'HEAD'):
+            try:
+                stamps.append(os.stat(os.path.join(self.git_dir, name)).st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def update(self, full, paths):
+        """Refresh the cache; returns (updated {path: status}, removed paths)"""
+        if self.git_dir is None:
+            result = subprocess.run(['git', 'rev-parse', '--absolute-git-dir', '--show-prefix'],
+                                    cwd=self.root, capture_output=True, text=True)
+            # Outside a repository the panel simply stays empty
+            self.git_dir, self.prefix = (result.stdout.splitlines() + ['', ''])[:2]
+        if not self.git_dir:
+            return {}, set()
+        stamp = self.index_stamp()
+        if full or stamp != self.stamp or len(paths) > MAX_PATHS:
+            statuses = self.run_status()
+            affected = None
+        else:
+            # A new directory's pathspec covers its contents and lets git collapse
+            # it to 'dir/', as does an untracked directory entry already listed
+            paths = [path for path in paths
+                     if not any(path.startswith(other + '/') for other in paths)
+                     and not any(entry.endswith('/') and (self.prefix + path).startswith(entry)
+                                 for entry in self.entries)]
+            if not paths:
+                return {}, set()
+            statuses = self.run_status(paths)
+            affected = [self.prefix + path for path in paths]
+        self.stamp = stamp
+        updated = {path: status for path, status in statuses.items()
+                   if self.entries.get(path) != status}
+        removed = {path for path in self.entries
+                   if path not in statuses and (affected is None or under(path.rstrip('/'), affected))}
+        for path in removed:
+            del self.entries[path]
+        self.entries.update(updated)
+        return updated, removed
+
+    def schedule_poll(self):
+        if self.poll_job is None:
+            self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        self.poll_job = None
+        with self.condition:
+            busy = self.pending or self.working
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(result, Exception):
+                if self.on_error is not None:
+                    self.on_error(result)
+            elif result[0] or result[1]:
+                self.on_diff(*result)
+        if busy and not self.closed:
+            self.schedule_poll()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.poll_job is not None:
+            self.widget.after_cancel(self.poll_job)
+            self.poll_job = None
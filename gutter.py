@@ -0,0 +1,128 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+from git_diff import DIFF_COLORS
+from profiler import heat_color
+
+
+class LineNumberGutter(tk.Canvas):
+    """Line-number gutter that only draws the rows currently on screen
+
+    Each visible row owns one canvas text item which is reused between
+    redraws, so a redraw costs O(visible lines) whatever the file size.
+    Redraws are skipped entirely unless the view scrolled, the widget was
+    resized or the number of lines changed.  A second item per row shows
+    the fold marker; clicking it folds or unfolds that line.  A bar at
+    the left edge paints the profiler's heat for the line, if any, and
+    one next to it marks lines added, modified or deleted since git HEAD.
+    """
+    def __init__(self, parent, editor, theme, font=('Consolas', 12)):
+        super().__init__(parent,
+            bg=theme['bg'],
+            highlightthickness=0,
+            borderwidth=0)
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.fg = '#858585'
+        self.font = tkfont.Font(font=font)
+        self.items = []         # Reusable text items, one per visible row
+        self.markers = []       # Fold marker items, one per visible row
+        self.bars = []          # Heat bar items, one per visible row
+        self.diff_bars = []     # Git diff bar items, one per visible row
+        self.rows = []          # (line number, y, marker, heat, diff) drawn by the last redraw
+        self.shown = 0
+        self.digits = 0
+        self.last_view = None
+        editor.scheduler.add_task('gutter', self.redraw)
+        self.bind('<Configure>', lambda e: self.schedule_redraw(force=True))
+        self.bind('<Button-1>', self.on_click)
+
+    def schedule_redraw(self, force=False):
+        """Redraw once the current event has been handled"""
+        if force:
+            self.last_view = None
+        self.editor.scheduler.mark('gutter')
+
+    def line_count(self):
+        return self.editor.document.line_count()
+
+    def visible_rows(self):
+        """(line number, y) for every line with a display line on screen"""
+        rows = []
+        folded = self.editor.folds.folded
+        count = self.line_count()
+        index = self.text_area.index('@0,0')
+        while True:
+            info = self.text_area.dlineinfo(index)
+            if info is None:
+                break
+            lineno = int(index.split('.')[0])
+            rows.append((lineno, info[1]))
+            # A folded line's body is elided: carry on after it
+            next_line = folded.get(lineno - 1, lineno - 1) + 2
+            if next_line > count:
+                break
+            index = f'{next_line}.0'
+        return rows
+
+    def on_click(self, event):
+        """Fold or unfold the line whose marker was clicked"""
+        lineno = int(self.text_area.index(f'@0,{event.y}').split('.')[0])
+        self.editor.folds.toggle(lineno - 1)
+
+    def redraw(self):
+        """Update the visible rows, touching only items whose row changed"""
+        count = self.line_count()
+        view = (self.text_area.index('@0,0'), self.text_area.yview()[0],
+                self.text_area.winfo_height(), count)
+        if view == self.last_view:
+            return
+        self.last_view = view
+
+        digits = max(3, len(str(count)))
+        if digits != self.digits:
+            self.digits = digits
+            self.configure(width=self.font.measure('0' * digits) + 26)
+            self.rows = []
+        x = int(self.cget('width')) - 4
+
+        folds = self.editor.folds
+        heat = self.editor.heat
+        diff = self.editor.diff
+        rows = [(lineno, y, folds.marker(lineno - 1), heat.get(lineno - 1),
+                 diff.marker(lineno - 1) if diff is not None else None)
+                for lineno, y in self.visible_rows()]
+        height = self.font.metrics('linespace')
+        while len(self.items) < len(rows):
+            self.items.append(self.create_text(0, 0, anchor='ne',
+                                               font=self.font, fill=self.fg))
+            self.markers.append(self.create_text(0, 0, anchor='ne',
+                                                 font=self.font, fill=self.fg))
+            self.bars.append(self.create_rectangle(0, 0, 0, 0, width=0, state='hidden'))
+            self.diff_bars.append(self.create_rectangle(0, 0, 0, 0, width=0, state='hidden'))
+        for i, row in enumerate(rows):
+            if i >= len(self.rows) or self.rows[i] != row:
+                lineno, y, marker, fraction, change = row
+                self.itemconfigure(self.items[i], text=str(lineno), state='normal')
+                self.coords(self.items[i], x - 14, y)
+                self.itemconfigure(self.markers[i], text=marker, state='normal')
+                self.coords(self.markers[i], x, y)
+                if fraction is None:
+                    self.itemconfigure(self.bars[i], state='hidden')
+                else:
+                    self.itemconfigure(self.bars[i], fill=heat_color(fraction), state='normal')
+                    self.coords(self.bars[i], 0, y, 4, y + height)
+                if change is None:
+                    self.itemconfigure(self.diff_bars[i], state='hidden')
+                else:
+                    self.itemconfigure(self.diff_bars[i], fill=DIFF_COLORS[change], state='normal')
+                    # Lines deleted above this one: a notch on its top edge
+                    bottom = y + 3 if change == 'deleted' else y + height
+                    self.coords(self.diff_bars[i], 6, y, 9, bottom)
+        for i in range(len(rows), self.shown):
+            self.itemconfigure(self.items[i], state='hidden')
+            self.itemconfigure(self.markers[i], state='hidden')
+            self.itemconfigure(self.bars[i], state='hidden')
+            self.itemconfigure(self.diff_bars[i], state='hidden')
+        self.rows = rows
+        self.shown = len(rows)
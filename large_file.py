@@ -0,0 +1,351 @@
+import tkinter as tk
+from tkinter import ttk
+import mmap
+import os
+import queue
+import threading
+from bisect import bisect_left, bisect_right
+
+# Files at least this big open in the read-only viewer instead of an EditorTab
+LARGE_FILE_SIZE = 64 << 20
+
+
+class LineIndex:
+    """Sparse line-offset index over a memory-mapped file
+
+    The file is cut into CHUNK sized pieces and only the newline count in
+    front of each chunk is recorded, so the index for a 4 GB file is a few
+    thousand integers.  The start of any line is found by jumping to its
+    chunk and splitting at most one chunk.  The index is built on a
+    background thread; until it finishes only the lines scanned so far can
+    be looked up.
+    """
+    CHUNK = 1 << 18
+
+    def __init__(self, mm):
+        self.mm = mm
+        self.size = len(mm)
+        self.offsets = [0]      # Chunk start offsets
+        self.before = [0]       # Newlines in front of each chunk start
+        self.done = self.size == 0
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        if not self.done:
+            self.thread = threading.Thread(target=self.build, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def build(self):
+        """Thread body: count newlines a chunk at a time"""
+        offset, newlines = 0, 0
+        while offset < self.size and not self.stopped:
+            end = min(offset + self.CHUNK, self.size)
+            newlines += self.mm[offset:end].count(b'\n')
+            offset = end
+            # Append before publishing the offset so readers never see a gap
+            self.before.append(newlines)
+            self.offsets.append(offset)
+        self.done = offset >= self.size
+
+    @property
+    def scanned(self):
+        return self.offsets[-1]
+
+    def line_count(self):
+        """Lines indexed so far (all of them once done)"""
+        return self.before[len(self.offsets) - 1] + 1
+
+    def estimated_lines(self):
+        """Guess at the total line count while the index is still being built"""
+        known = self.line_count()
+        if self.done or not self.scanned:
+            return known
+        return max(known, int(known * self.size / self.scanned))
+
+    def line_start(self, line):
+        """Byte offset where a 0-based line starts, or None if not indexed yet"""
+        if line <= 0:
+            return 0
+        count = len(self.offsets)
+        # The chunk holding the line'th newline
+        i = bisect_left(self.before, line, 0, count) - 1
+        if i + 1 >= count:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        data = self.mm[start:end]
+        return end - len(data.split(b'\n', line - self.before[i])[-1])
+
+    def line_of(self, offset):
+        """0-based line holding a byte offset, or None if not indexed yet"""
+        count = len(self.offsets)
+        if offset > self.offsets[count - 1] and not self.done:
+            return None
+        i = bisect_right(self.offsets, offset, 0, count) - 1
+        return self.before[i] + self.mm[self.offsets[i]:offset].count(b'\n')
+
+
+class LargeFileViewer(ttk.Frame):
+    """Read-only view of a huge file, paging only the visible lines into Tk
+
+    The file is memory-mapped rather than read, a LineIndex is built in the
+    background and the text widget only ever holds the lines on screen, so
+    opening a multi-gigabyte log is as quick as opening a small one.
+    Searching runs over the mapping on a worker thread.
+    """
+    MAX_LINE = 4000         # Characters shown of very long lines
+    SEARCH_WINDOW = 16 << 20
+
+    def __init__(self, parent, theme, path):
+        super().__init__(parent)
+        self.theme = theme
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = LineIndex(self.mm)
+        self.top = 0
+        self.rows = 1
+        self.match = None           # (byte offset, length) of the last hit
+        self.search_thread = None
+        self.search_results = queue.Queue()
+        self.cancel_search = threading.Event()
+        self.poll_job = None
+        self.search_job = None
+        self.create_widgets()
+        self.index.start()
+        self.poll_index()
+
+    def create_widgets(self):
+        # Find bar
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x')
+        ttk.Label(toolbar, text="Find:").pack(side='left', padx=5)
+        self.find_entry = ttk.Entry(toolbar)
+        self.find_entry.pack(side='left', fill='x', expand=True)
+        self.find_entry.bind('<Return>', lambda e: self.find_next())
+        ttk.Button(toolbar, text="Find Next", command=self.find_next).pack(side='left')
+        self.status = ttk.Label(toolbar, text="")
+        self.status.pack(side='left', padx=5)
+
+        container = ttk.Frame(self)
+        container.pack(fill='both', expand=True)
+
+        text_options = dict(
+            wrap='none',
+            bg='#1e1e1e',
+            relief='flat',
+            pady=8,
+            font=('Consolas', 12),
+            spacing1=2,
+            cursor='arrow')
+        self.line_numbers = tk.Text(container, width=8, padx=6, fg='#858585',
+                                    takefocus=0, **text_options)
+        self.line_numbers.pack(side='left', fill='y')
+        self.line_numbers.tag_configure('right', justify='right')
+
+        self.text_area = tk.Text(container, fg='#d4d4d4', padx=12, **text_options)
+        self.text_area.tag_configure('found', background='#613214')
+
+        self.v_scroll = ttk.Scrollbar(container, orient='vertical', command=self.on_scrollbar)
+        self.v_scroll.pack(side='right', fill='y')
+        self.text_area.pack(side='left', fill='both', expand=True)
+        h_scroll = ttk.Scrollbar(self, orient='horizontal', command=self.text_area.xview)
+        h_scroll.pack(side='bottom', fill='x')
+        self.text_area.configure(xscrollcommand=h_scroll.set, state='disabled')
+        self.line_numbers.configure(state='disabled')
+
+        self.text_area.bind('<Configure>', lambda e: self.render())
+        for widget in (self.text_area, self.line_numbers):
+            widget.bind('<MouseWheel>', lambda e: self.scroll_by(-3 if e.delta > 0 else 3))
+            widget.bind('<Button-4>', lambda e: self.scroll_by(-3))
+            widget.bind('<Button-5>', lambda e: self.scroll_by(3))
+        self.text_area.bind('<Up>', lambda e: self.scroll_by(-1))
+        self.text_area.bind('<Down>', lambda e: self.scroll_by(1))
+        self.text_area.bind('<Prior>', lambda e: self.scroll_by(-self.rows))
+        self.text_area.bind('<Next>', lambda e: self.scroll_by(self.rows))
+        self.text_area.bind('<Control-Home>', lambda e: self.scroll_to(0))
+        self.text_area.bind('<Control-End>', lambda e: self.scroll_to(self.index.line_count()))
+        self.text_area.bind('<Control-f>', lambda e: self.find_entry.focus())
+        self.text_area.bind('<Button-1>', lambda e: self.text_area.focus_set())
+
+    def destroy(self):
+        self.cancel_search.set()
+        if self.search_thread is not None:
+            self.search_thread.join()
+        self.index.stop()
+        for job in (self.poll_job, self.search_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.mm.close()
+        self.file.close()
+        super().destroy()
+
+    # Paging
+
+    def poll_index(self):
+        """Track indexing progress until the whole file is indexed"""
+        self.poll_job = None
+        self.update_status()
+        self.update_scrollbar()
+        if not self.index.done:
+            self.poll_job = self.after(200, self.poll_index)
+
+    def update_status(self, message=None):
+        if message is None:
+            lines = self.index.line_count()
+            if self.index.done:
+                message = f"{lines:,} lines, read-only"
+            else:
+                percent = 100 * self.index.scanned // max(1, self.index.size)
+                message = f"Indexing {percent}% ({lines:,} lines so far), read-only"
+        self.status.configure(text=message)
+
+    def update_scrollbar(self):
+        total = max(1, self.index.estimated_lines())
+        self.v_scroll.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+
+    def on_scrollbar(self, action, *args):
+        if action == 'moveto':
+            self.scroll_to(int(float(args[0]) * self.index.estimated_lines()))
+        elif action == 'scroll':
+            amount = int(args[0])
+            self.scroll_by(amount * self.rows if args[1] == 'pages' else amount)
+
+    def scroll_by(self, lines):
+        self.scroll_to(self.top + lines)
+        return 'break'
+
+    def scroll_to(self, line):
+        """Show lines from line onwards, limited to what is indexed"""
+        line = max(0, min(line, self.index.line_count() - self.rows))
+        if line != self.top:
+            self.top = line
+            self.render()
+        return 'break'
+
+    def read_lines(self, first, count):
+        """Up to count decoded lines starting at a 0-based line"""
+        offset = self.index.line_start(first)
+        lines = []
+        if offset is None:
+            return lines
+        size = len(self.mm)
+        while len(lines) < count and offset <= size:
+            # Only the shown part of a line is scanned for its newline
+            end = self.mm.find(b'\n', offset, offset + self.MAX_LINE + 1)
+            if end >= 0:
+                next_offset = end + 1
+            else:
+                end = min(size, offset + self.MAX_LINE)
+                next_offset = self.index.line_start(first + len(lines) + 1)
+                if next_offset is None and self.index.done:
+                    next_offset = size + 1
+            data = self.mm[offset:end]
+            lines.append(data.decode('utf-8', errors='replace').rstrip('\r'))
+            if next_offset is None:
+                break   # The next line is not indexed yet
+            offset = next_offset
+        return lines
+
+    def render(self):
+        """Replace the widget contents with the lines now on screen"""
+        linespace = self.text_area.tk.call('font', 'metrics', self.text_area.cget('font'),
+                                           '-linespace') + 2
+        self.rows = max(1, self.text_area.winfo_height() // linespace)
+        lines = self.read_lines(self.top, self.rows)
+        numbers = '\n'.join(str(n) for n in range(self.top + 1, self.top + len(lines) + 1))
+
+        self.text_area.configure(state='normal')
+        self.line_numbers.configure(state='normal')
+        self.text_area.delete('1.0', 'end')
+        self.text_area.insert('1.0', '\n'.join(lines))
+        self.line_numbers.delete('1.0', 'end')
+        self.line_numbers.insert('1.0', numbers, 'right')
+        self.line_numbers.configure(width=max(4, len(str(self.top + len(lines)))) + 1)
+        self.show_match()
+        self.text_area.configure(state='disabled')
+        self.line_numbers.configure(state='disabled')
+        self.update_scrollbar()
+
+    # Searching
+
+    def find_next(self):
+        """Search forward from the last hit (or the top line), wrapping around"""
+        query = self.find_entry.get().encode('utf-8')
+        if not query or self.search_thread is not None:
+            return
+        if self.match is not None:
+            start = self.match[0] + 1
+        else:
+            start = self.index.line_start(self.top) or 0
+        self.cancel_search.clear()
+        self.search_thread = threading.Thread(target=self.search, args=(query, start),
+                                              daemon=True)
+        self.search_thread.start()
+        self.update_status("Searching...")
+        self.search_job = self.after(50, self.poll_search)
+
+    def search(self, query, start):
+        """Thread body: scan the mapping in windows so it can be cancelled"""
+        size = len(self.mm)
+        found = -1
+        for lo, hi in ((start, size), (0, min(size, start + len(query) - 1))):
+            pos = lo
+            while pos < hi and found < 0 and not self.cancel_search.is_set():
+                end = min(hi, pos + self.SEARCH_WINDOW + len(query) - 1)
+                found = self.mm.find(query, pos, end)
+                pos += self.SEARCH_WINDOW
+            if found >= 0:
+                break
+        self.search_results.put((found, len(query)))
+
+    def poll_search(self):
+        self.search_job = None
+        try:
+            found, length = self.search_results.get_nowait()
+        except queue.Empty:
+            self.search_job = self.after(50, self.poll_search)
+            return
+        self.search_thread = None
+        if found < 0:
+            self.match = None
+            self.update_status("No matches")
+        else:
+            self.match = (found, length)
+            self.reveal_match()
+
+    def reveal_match(self):
+        """Scroll to the last hit once the index has reached it"""
+        self.search_job = None
+        line = self.index.line_of(self.match[0])
+        if line is None:
+            self.update_status("Waiting for the index to reach the match...")
+            self.search_job = self.after(200, self.reveal_match)
+            return
+        self.top = max(0, line - self.rows // 3)
+        self.render()
+        self.update_status(f"Match on line {line + 1:,}")
+
+    def show_match(self):
+        """Tag the last hit if it is on screen"""
+        if self.match is None:
+            return
+        offset, length = self.match
+        line = self.index.line_of(offset)
+        if line is None or not self.top <= line < self.top + self.rows:
+            return
+        line_start = self.index.line_start(line)
+        if offset - line_start > self.MAX_LINE:
+            return
+        col = len(self.mm[line_start:offset].decode('utf-8', errors='replace'))
+        width = len(self.mm[offset:offset + length].decode('utf-8', errors='replace'))
+        row = line - self.top + 1
+        self.text_area.tag_add('found', f'{row}.{col}', f'{row}.{col + width}')
+        self.text_area.see(f'{row}.{col}')
@@ -0,0 +1,572 @@
+import asyncio
+import itertools
+import json
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from tkinter import ttk
+
+# Language id -> (file extensions, server command); servers not on PATH are skipped
+DEFAULT_SERVERS = {
+    'python': (('.py', '.pyw'), ['pylsp']),
+}
+MAX_COMPLETIONS = 50
+
+
+def encode_message(payload):
+    """One JSON-RPC message with its LSP Content-Length header"""
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return b'Content-Length: %d\r\n\r\n' % len(body) + body
+
+
+async def read_message(reader):
+    """Next message from a stream, or None at end of file"""
+    length = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode('ascii').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        raise ValueError("message without Content-Length")
+    return json.loads(await reader.readexactly(length))
+
+
+def path_to_uri(path):
+    return Path(os.path.abspath(path)).as_uri()
+
+
+def uri_to_path(uri):
+    return url2pathname(unquote(urlparse(uri).path))
+
+
+def utf16_units(text):
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+
+def utf16_to_column(line, units):
+    """Column in a line of the position `units` UTF-16 code units in"""
+    if line.isascii():
+        return min(units, len(line))
+    count = 0
+    for col, char in enumerate(line):
+        if count >= units:
+            return col
+        count += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+class LspError(Exception):
+    """An error response from a language server"""
+
+
+class JsonRpcConnection:
+    """JSON-RPC over a child process's stdio, driven by an asyncio loop in its own thread
+
+    request() and notify() may be called from any thread; request returns a
+    concurrent.futures.Future.  Messages go out in the order they were
+    handed over.  on_notification(method, params), on_request(method,
+    params) (whose return value is the reply) and on_close() are called on
+    the loop's thread.
+    """
+    def __init__(self, command, cwd=None, on_notification=None, on_request=None,
+                 on_close=None):
+        self.command = command
+        self.cwd = cwd
+        self.on_notification = on_notification
+        self.on_request = on_request
+        self.on_close = on_close
+        self.ids = itertools.count(1)
+        self.pending = {}       # Request id -> asyncio future, loop thread only
+        self.process = None
+        self.started = asyncio.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return asyncio.run_coroutine_threadsafe(self.spawn(), self.loop)
+
+    async def spawn(self):
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *self.command, cwd=self.cwd, stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        finally:
+            self.started.set()  # Writes waiting for the process fail if it did not start
+        self.loop.create_task(self.read_loop())
+
+    def request(self, method, params=None):
+        return asyncio.run_coroutine_threadsafe(self.send_request(method, params), self.loop)
+
+    def notify(self, method, params=None):
+        asyncio.run_coroutine_threadsafe(
+            self.write({'jsonrpc': '2.0', 'method': method, 'params': params}), self.loop)
+
+    async def send_request(self, method, params=None):
+        request_id = next(self.ids)
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        try:
+            await self.write({'jsonrpc': '2.0', 'id': request_id, 'method': method,
+                              'params': params})
+        except Exception:
+            del self.pending[request_id]
+            raise
+        return await future
+
+    async def write(self, payload):
+        await self.started.wait()
+        if self.process is None or self.process.stdin.is_closing():
+            raise ConnectionError("language server has exited")
+        self.process.stdin.write(encode_message(payload))
+        await self.process.stdin.drain()
+
+    async def read_loop(self):
+        try:
+            while True:
+                message = await read_message(self.process.stdout)
+                if message is None:
+                    break
+                await self.dispatch(message)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("language server has exited"))
+            self.pending.clear()
+            if self.on_close is not None:
+                self.on_close()
+
+    async def dispatch(self, message):
+        method = message.get('method')
+        if method is None:
+            future = self.pending.pop(message.get('id'), None)
+            if future is None or future.done():
+                return
+            if 'error' in message:
+                future.set_exception(LspError(message['error'].get('message', 'error')))
+            else:
+                future.set_result(message.get('result'))
+        elif 'id' in message:
+            result = None
+            if self.on_request is not None:
+                result = self.on_request(method, message.get('params'))
+            await self.write({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+        elif self.on_notification is not None:
+            self.on_notification(method, message.get('params'))
+
+    async def shutdown(self, timeout=2):
+        """Ask the server to exit, then make sure it did"""
+        try:
+            await asyncio.wait_for(self.send_request('shutdown'), timeout)
+            await self.write({'jsonrpc': '2.0', 'method': 'exit'})
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except Exception:
+            pass
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+
+    def close(self):
+        """Shut the server and the loop down without blocking the caller"""
+        if not self.thread.is_alive():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+        future.add_done_callback(lambda f: self.loop.call_soon_threadsafe(self.loop.stop))
+
+
+class LanguageClient:
+    """One running language server and the documents open in it
+
+    Everything the server sends back is handed to post(callback, *args),
+    which must run the callback on the Tk thread.  `ready` turns true (on
+    the Tk thread) once the initialize handshake is done; documents
+    attached before then are opened at that point.
+    """
+    def __init__(self, language, command, root, post, on_status=None):
+        self.language = language
+        self.command = command
+        self.root = root
+        self.post = post
+        self.on_status = on_status
+        self.status = 'starting'
+        self.ready = False
+        self.closed = False
+        self.sync_kind = 2          # TextDocumentSyncKind: 0 none, 1 full, 2 incremental
+        self.encoding = 'utf-16'
+        self.documents = {}         # URI -> LspDocument
+        self.connection = JsonRpcConnection(command, root, self.on_notification,
+                                            self.on_request, self.on_close)
+
+    def start(self):
+        self.connection.start()
+        asyncio.run_coroutine_threadsafe(self.initialize(), self.connection.loop)
+        return self
+
+    async def initialize(self):
+        params = {
+            'processId': os.getpid(),
+            'rootUri': path_to_uri(self.root) if self.root else None,
+            'capabilities': {
+                'general': {'positionEncodings': ['utf-32', 'utf-16']},
+                'textDocument': {
+                    'synchronization': {'dynamicRegistration': False},
+                    'completion': {'completionItem': {'snippetSupport': False}},
+                    'publishDiagnostics': {'versionSupport': True},
+                },
+            },
+        }
+        try:
+            result = await self.connection.send_request('initialize', params)
+            await self.connection.write({'jsonrpc': '2.0', 'method': 'initialized',
+                                         'params': {}})
+        except Exception as e:
+            self.post(self.set_status, f"failed: {e}")
+            return
+        capabilities = (result or {}).get('capabilities', {})
+        sync = capabilities.get('textDocumentSync', 0)
+        sync_kind = sync.get('change', 0) if isinstance(sync, dict) else sync
+        self.post(self.on_ready, sync_kind, capabilities.get('positionEncoding', 'utf-16'))
+
+    def on_ready(self, sync_kind, encoding):
+        if self.closed:
+            return
+        self.sync_kind = sync_kind
+        self.encoding = encoding
+        self.ready = True
+        self.set_status('running')
+        for document in self.documents.values():
+            document.open()
+
+    def set_status(self, status):
+        self.status = status
+        for document in self.documents.values():
+            document.status_changed()
+        if self.on_status is not None:
+            self.on_status(self)
+
+    def on_notification(self, method, params):
+        if method == 'textDocument/publishDiagnostics' and params:
+            self.post(self.show_diagnostics, params)
+
+    def on_request(self, method, params):
+        if method == 'workspace/configuration':
+            return [None] * len((params or {}).get('items', ()))
+        return None
+
+    def on_close(self):
+        self.post(self.on_exit)
+
+    def on_exit(self):
+        self.ready = False
+        if not self.closed:
+            self.set_status('exited')
+
+    def show_diagnostics(self, params):
+        document = self.documents.get(params.get('uri'))
+        if document is not None:
+            document.show_diagnostics(params.get('diagnostics', ()), params.get('version'))
+
+    def notify(self, method, params):
+        if self.ready:
+            self.connection.notify(method, params)
+
+    def request(self, method, params, callback):
+        """Send a request; callback(result) runs on the Tk thread, and not on errors"""
+        if not self.ready:
+            return
+        future = self.connection.request(method, params)
+
+        def done(future):
+            if not future.cancelled() and future.exception() is None:
+                self.post(callback, future.result())
+
+        future.add_done_callback(done)
+
+    def close(self):
+        self.closed = True
+        self.ready = False
+        for document in list(self.documents.values()):
+            document.close()
+        self.connection.close()
+        self.set_status('stopped')
+
+
+class LspDocument:
+    """Keeps one EditorTab's Document in sync with a language server
+
+    The tab's edits are turned into incremental didChange ranges as they
+    happen (the Document listener sees each TextEdit with the text it
+    replaced, so old end positions can be worked out) and sent together
+    SYNC_MS after the last one.  A reload, an edit too big to have kept
+    its deleted text or a server without incremental sync gets the full
+    text instead.  Positions are converted to UTF-16 code units unless the
+    server agreed to count code points.
+    """
+    SYNC_MS = 50
+
+    def __init__(self, editor, client):
+        self.editor = editor
+        self.client = client
+        self.document = editor.document
+        self.uri = path_to_uri(editor.file_path)
+        self.opened = False
+        self.changes = []
+        self.full = False
+        self.sync_job = None
+        self.diagnostics = []   # (line, col, severity, message) from the last publish
+        self.document.listeners.append(self.on_document_edit)
+        client.documents[self.uri] = self
+        if client.ready:
+            self.open()
+
+    def open(self):
+        self.opened = True
+        self.changes, self.full = [], False
+        self.client.notify('textDocument/didOpen', {'textDocument': {
+            'uri': self.uri, 'languageId': self.client.language,
+            'version': self.document.version, 'text': self.document.get_text()}})
+
+    def close(self):
+        self.cancel_sync()
+        if self.on_document_edit in self.document.listeners:
+            self.document.listeners.remove(self.on_document_edit)
+        if self.client.documents.get(self.uri) is self:
+            del self.client.documents[self.uri]
+        if self.opened:
+            self.client.notify('textDocument/didClose', {'textDocument': {'uri': self.uri}})
+        self.opened = False
+
+    def reset(self):
+        """The whole text was replaced, e.g. by a reload from disk"""
+        self.full = True
+        self.schedule_sync()
+
+    def status_changed(self):
+        """The server came up, failed or exited: the tab's linter picks its source again"""
+        if not self.editor.hibernated:
+            self.editor.scheduler.mark('lint')
+
+    def column(self, line_text, col):
+        if self.client.encoding == 'utf-32':
+            return col
+        return utf16_units(line_text[:col])
+
+    def on_document_edit(self, edit):
+        if not self.opened:
+            return      # didOpen will carry the text
+        if self.full or self.client.sync_kind != 2 or edit.deleted is None:
+            self.full = True
+        else:
+            prefix = self.document.get_line(edit.start_line)[:edit.start_col]
+            if '\n' in edit.deleted:
+                end_prefix = edit.deleted[edit.deleted.rfind('\n') + 1:]
+            else:
+                end_prefix = prefix + edit.deleted
+            self.changes.append({
+                'range': {'start': {'line': edit.start_line,
+                                    'character': self.column(prefix, edit.start_col)},
+                          'end': {'line': edit.end_line,
+                                  'character': self.column(end_prefix, edit.end_col)}},
+                'text': edit.text})
+        self.schedule_sync()
+
+    def schedule_sync(self):
+        if self.sync_job is None:
+            self.sync_job = self.editor.after(self.SYNC_MS, self.sync)
+
+    def cancel_sync(self):
+        if self.sync_job is not None:
+            self.editor.after_cancel(self.sync_job)
+            self.sync_job = None
+
+    def sync(self):
+        """Send the changes made since the last sync as one didChange"""
+        self.cancel_sync()
+        if not self.opened or not (self.full or self.changes):
+            return
+        if self.client.sync_kind == 0:
+            changes = []
+        elif self.full:
+            changes = [{'text': self.document.get_text()}]
+        else:
+            changes = self.changes
+        self.changes, self.full = [], False
+        if changes:
+            self.client.notify('textDocument/didChange', {
+                'textDocument': {'uri': self.uri, 'version': self.document.version},
+                'contentChanges': changes})
+
+    def complete(self, line, col, callback):
+        """Ask for completions at a 0-based position; callback(words) on the Tk thread"""
+        if not self.opened:
+            return
+        self.sync()
+        character = self.column(self.document.get_line(line), col)
+
+        def done(result):
+            items = result.get('items', []) if isinstance(result, dict) else result or []
+            words = []
+            for item in items[:MAX_COMPLETIONS]:
+                edit = item.get('textEdit')
+                words.append(edit['newText'] if edit and 'newText' in edit
+                             else item.get('insertText') or item['label'])
+            callback(words)
+
+        self.client.request('textDocument/completion', {
+            'textDocument': {'uri': self.uri},
+            'position': {'line': line, 'character': character}}, done)
+
+    def show_diagnostics(self, diagnostics, version=None):
+        if version is not None and version != self.document.version:
+            return      # About an older text: the server publishes again
+        found = set()
+        for diagnostic in diagnostics:
+            start = diagnostic['range']['start']
+            line = start['line']
+            if line >= self.document.line_count():
+                continue
+            col = start['character']
+            if self.client.encoding != 'utf-32':
+                col = utf16_to_column(self.document.get_line(line), col)
+            severity = 'error' if diagnostic.get('severity', 1) == 1 else 'warning'
+            found.add((line, col, severity, diagnostic.get('message', '')))
+        self.diagnostics = sorted(found)
+        if not self.editor.hibernated:
+            self.editor.linter.apply(self.diagnostics)
+
+
+class LspManager:
+    """Starts a language server per language on demand and attaches EditorTabs to them
+
+    Callbacks from the servers' loop threads are queued and run on the Tk
+    thread by polling from `widget`.
+    """
+    POLL_MS = 30
+
+    def __init__(self, widget, servers=None, root_getter=None, on_status=None):
+        self.widget = widget
+        self.servers = dict(DEFAULT_SERVERS if servers is None else servers)
+        self.root_getter = root_getter or (lambda: None)
+        self.on_status = on_status
+        self.clients = {}       # Language -> LanguageClient
+        self.calls = queue.Queue()
+        self.poll_job = None
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread"""
+        self.calls.put((callback, args))
+
+    def poll(self):
+        self.poll_job = None
+        try:
+            while True:
+                callback, args = self.calls.get_nowait()
+                try:
+                    callback(*args)
+                except Exception:
+                    pass    # A stale reply (e.g. for a closed tab) must not stop the others
+        except queue.Empty:
+            pass
+        if self.clients:
+            self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+
+    def language_for(self, path):
+        for language, (extensions, _) in self.servers.items():
+            if path.endswith(extensions):
+                return language
+        return None
+
+    def status(self, language):
+        client = self.clients.get(language)
+        if client is not None:
+            return client.status
+        command = self.servers[language][1]
+        return 'stopped' if shutil.which(command[0]) else 'not installed'
+
+    def client_for(self, language):
+        client = self.clients.get(language)
+        if client is None:
+            command = self.servers[language][1]
+            if not shutil.which(command[0]):
+                return None
+            client = LanguageClient(language, command, self.root_getter(), self.post,
+                                    self.on_status)
+            self.clients[language] = client
+            client.start()
+            if self.poll_job is None:
+                self.poll_job = self.widget.after(self.POLL_MS, self.poll)
+            if self.on_status is not None:
+                self.on_status(client)
+        return client
+
+    def attach(self, editor):
+        """Follow an editor's file: open it in its language's server, if there is one"""
+        self.detach(editor)
+        language = self.language_for(editor.file_path) if editor.file_path else None
+        client = self.client_for(language) if language else None
+        if client is not None:
+            editor.lsp = LspDocument(editor, client)
+
+    def detach(self, editor):
+        if editor.lsp is not None:
+            editor.lsp.close()
+            editor.lsp = None
+
+    def restart(self, language, editors):
+        """Stop a language's server and start it again for the editors using it"""
+        client = self.clients.pop(language, None)
+        if client is not None:
+            client.close()
+        for editor in editors:
+            if editor.file_path and self.language_for(editor.file_path) == language:
+                self.attach(editor)
+
+    def shutdown(self):
+        for client in self.clients.values():
+            client.close()
+        self.clients = {}
+        if self.poll_job is not None:
+            self.widget.after_cancel(self.poll_job)
+            self.poll_job = None
+
+
+class LanguageServerPanel(ttk.Frame):
+    """Extensions panel: the configured language servers and their state"""
+    def __init__(self, parent, manager, get_editors):
+        super().__init__(parent)
+        self.manager = manager
+        self.get_editors = get_editors
+        ttk.Label(self, text="Language Servers").pack(anchor='w')
+        self.table = ttk.Treeview(self, columns=('language', 'command', 'status'),
+                                  show='headings', height=6)
+        for column, width in (('language', 80), ('command', 120), ('status', 90)):
+            self.table.heading(column, text=column.title())
+            self.table.column(column, width=width, stretch=column == 'command')
+        self.table.pack(fill='both', expand=True)
+        ttk.Button(self, text="Restart Server", command=self.restart).pack(anchor='w')
+        self.refresh()
+
+    def refresh(self, client=None):
+        self.table.delete(*self.table.get_children())
+        for language, (_, command) in self.manager.servers.items():
+            self.table.insert('', 'end', iid=language, values=(
+                language, ' '.join(command), self.manager.status(language)))
+
+    def restart(self):
+        selection = self.table.selection()
+        if selection:
+            self.manager.restart(selection[0], self.get_editors())
+            self.refresh()
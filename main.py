@@ -8,6 +8,7 @@ from styles import apply_light_theme  # Change import
 from settings import Settings  # Add import
 from updater import update_application  # Import updater
 import os  # Add import
+import multiprocessing
 
 class MainApplication:
     def __init__(self, root):
@@ -59,6 +60,7 @@ class MainApplication:
         file_menu.add_command(label="Exit", command=self.root.quit)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Frozen builds start pool workers through main
     root = tk.Tk()
     app = MainApplication(root)
     root.mainloop()
@@ -0,0 +1,193 @@
+import tkinter as tk
+
+from syntax_highlighter import HIGHLIGHT_TAGS
+
+
+class Minimap(tk.Canvas):
+    """Downsampled overview of an EditorTab drawn into a cached PhotoImage
+
+    Every document line becomes one row of pixels (one pixel per column,
+    coloured by its syntax tag) plus a blank spacer row.  The rendered
+    string for each line is cached and only rebuilt when that line is
+    edited, and the image only ever holds the slice of the document that
+    fits on the canvas, so refreshing costs O(canvas height) rather than
+    O(file size).  Refreshes are throttled to one per THROTTLE_MS by the
+    editor's RenderScheduler.
+
+    Lines past the highlighter's frontier have no trusted start state yet
+    and are drawn as if lexed from the root state.  Those rows are kept as
+    guesses and drawn again once the frontier passes them or their start
+    state changes.
+    """
+    WIDTH = 100
+    ROW_HEIGHT = 2
+    THROTTLE_MS = 100
+
+    def __init__(self, parent, editor, bg='#1e1e1e'):
+        super().__init__(parent, width=self.WIDTH, bg=bg, highlightthickness=0)
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.bg = bg
+        self.image = tk.PhotoImage(width=self.WIDTH, height=1)
+        self.create_image(0, 0, anchor='nw', image=self.image)
+        self.viewport = self.create_rectangle(0, 0, 0, 0, outline='#555555')
+        self.spacer = '{' + ' '.join([bg] * self.WIDTH) + '}'
+        self.colors = None
+        self.rows = [None] * self.line_count()  # Cached pixel row per line
+        self.dirty_lines = set()
+        self.guessed = set()    # Lines whose cached row was lexed from a guessed state
+        self.shift_from = None  # First line whose row moved since the last refresh
+        self.top = None         # First document line shown in the image
+        self.height = 0
+        editor.scheduler.add_task('minimap', self.refresh, interval=self.THROTTLE_MS)
+        self.bind('<Configure>', lambda e: self.schedule_refresh(full=True))
+        self.bind('<Button-1>', self.scroll_to)
+        self.bind('<B1-Motion>', self.scroll_to)
+
+    def line_count(self):
+        return self.editor.document.line_count()
+
+    def reset(self):
+        """Drop every cached row, e.g. after the lexer changed"""
+        self.rows = [None] * self.line_count()
+        self.dirty_lines.clear()
+        self.guessed.clear()
+        self.shift_from = None
+        self.colors = None
+        self.schedule_refresh(full=True)
+
+    def on_edit(self, first, old_last, new_last):
+        """Edit listener: drop cached rows for the edited lines"""
+        start = first - 1
+        self.rows[start:old_last] = [None] * (new_last - first + 1)
+        if self.guessed:
+            delta = new_last - old_last
+            self.guessed = {line if line < start else line + delta
+                            for line in self.guessed if line < start or line >= old_last}
+        if old_last != new_last:
+            if self.shift_from is None or start < self.shift_from:
+                self.shift_from = start
+        else:
+            self.dirty_lines.add(start)
+        self.schedule_refresh()
+
+    def invalidate_line(self, lineno):
+        """The lexer state at the start of a line changed; redraw its row"""
+        if lineno < len(self.rows) and self.rows[lineno] is not None:
+            self.rows[lineno] = None
+            self.guessed.discard(lineno)
+            self.dirty_lines.add(lineno)
+            self.schedule_refresh()
+
+    def schedule_refresh(self, full=False):
+        """Refresh at most once per THROTTLE_MS"""
+        if full:
+            self.top = None
+        self.editor.scheduler.mark('minimap')
+
+    def refresh(self):
+        """Re-rasterize only the rows that changed since the last refresh"""
+        height = self.winfo_height()
+        if height <= 1:
+            return
+        if height != self.height:
+            self.height = height
+            self.image.configure(height=height)
+            self.top = None
+        if self.guessed:
+            frontier = self.editor.highlighter.frontier
+            for lineno in [line for line in self.guessed if line < frontier]:
+                self.guessed.discard(lineno)
+                self.rows[lineno] = None
+                self.dirty_lines.add(lineno)
+
+        count = len(self.rows)
+        capacity = height // self.ROW_HEIGHT
+        first, last = self.text_area.yview()
+        if count <= capacity or last - first >= 1:
+            top = 0
+        else:
+            top = int(round(first / (1 - (last - first)) * (count - capacity)))
+            top = max(0, min(top, count - capacity))
+        bottom = min(count, top + capacity)
+
+        if top != self.top:
+            self.image.blank()
+            self.draw_lines(top, top, bottom)
+        else:
+            if self.shift_from is not None and self.shift_from < bottom:
+                self.draw_lines(top, max(top, self.shift_from), bottom)
+                self.clear_below(top, bottom)
+            for lineno in sorted(self.dirty_lines):
+                if top <= lineno < bottom and (self.shift_from is None
+                                               or lineno < self.shift_from):
+                    self.draw_lines(top, lineno, lineno + 1)
+        self.top = top
+        self.dirty_lines.clear()
+        self.shift_from = None
+        if any(top <= line < bottom for line in self.guessed):
+            self.schedule_refresh()     # Until the background lexer catches up
+
+        # Viewport indicator
+        view_top = int(self.text_area.index('@0,0').split('.')[0]) - 1
+        view_lines = max(1, int((last - first) * count))
+        y0 = (view_top - top) * self.ROW_HEIGHT
+        self.coords(self.viewport, 0, y0, self.WIDTH - 1, y0 + view_lines * self.ROW_HEIGHT)
+
+    def draw_lines(self, top, first, last):
+        """Put the cached rows for lines first..last-1 into the image in one call"""
+        if first >= last:
+            return
+        data = []
+        for lineno in range(first, last):
+            row = self.rows[lineno]
+            if row is None:
+                row = self.rows[lineno] = self.render_line(lineno)
+            data.append(row)
+            data.append(self.spacer)
+        self.image.put(' '.join(data), to=(0, (first - top) * self.ROW_HEIGHT))
+
+    def clear_below(self, top, bottom):
+        """Paint over rows left behind when the document got shorter"""
+        y = (bottom - top) * self.ROW_HEIGHT
+        if y < self.height:
+            self.image.put(self.bg, to=(0, y, self.WIDTH, self.height))
+
+    def render_line(self, lineno):
+        """Pixel row for one line: a colour per column, background where blank"""
+        if self.colors is None:
+            self.colors = self.tag_colors()
+        pixels = [self.bg] * self.WIDTH
+        highlighter = self.editor.highlighter
+        if highlighter.stateful and lineno >= highlighter.frontier:
+            self.guessed.add(lineno)
+        for pos, tokentype, value in highlighter.line_tokens(lineno):
+            if pos >= self.WIDTH:
+                break
+            color = self.colors.get(highlighter.tag_for(tokentype), self.colors[None])
+            for offset, char in enumerate(value[:self.WIDTH - pos]):
+                if not char.isspace():
+                    pixels[pos + offset] = color
+        return '{' + ' '.join(pixels) + '}'
+
+    def tag_colors(self):
+        """Syntax tag colours, blended towards the background"""
+        colors = {None: self.blend(self.text_area.cget('fg'))}
+        for tag in HIGHLIGHT_TAGS:
+            color = self.text_area.tag_cget(tag, 'foreground')
+            if color:
+                colors[tag] = self.blend(color)
+        return colors
+
+    def blend(self, color, amount=0.6):
+        fg = self.winfo_rgb(color)
+        bg = self.winfo_rgb(self.bg)
+        mixed = [int(b + (f - b) * amount) >> 8 for f, b in zip(fg, bg)]
+        return '#%02x%02x%02x' % tuple(mixed)
+
+    def scroll_to(self, event):
+        """Jump the editor to the line under the pointer"""
+        if self.top is None:
+            return
+        lineno = self.top + event.y // self.ROW_HEIGHT + 1
+        self.text_area.see(f'{lineno}.0')
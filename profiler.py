@@ -0,0 +1,270 @@
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from tkinter import ttk
+
+SAMPLE_INTERVAL = 0.001     # Seconds between stack samples
+MAX_ROWS = 500              # Functions listed in the hot-function table
+HEAT_COLORS = ['#4b1d1d', '#6e2222', '#962828', '#c0302d', '#e8472f', '#ff7a3d']
+MIN_HEAT = 0.005            # Lines with less of the run get no heat bar
+
+# Run in the child interpreter: argv is [output json, interval, script, script args...].
+# cProfile measures functions; a thread samples the main thread's stack for
+# the time spent on every line (callees included).
+PROFILE_SCRIPT = r'''
+import cProfile, json, os, pstats, runpy, sys, threading, time
+out, interval, path = sys.argv[1], float(sys.argv[2]), sys.argv[3]
+sys.argv = sys.argv[3:]
+sys.path[0] = os.path.dirname(os.path.abspath(path))
+main = threading.get_ident()
+lines = {}
+count = [0]
+stop = threading.Event()
+def sample():
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(main)
+        seen = set()
+        while frame is not None:
+            key = (frame.f_code.co_filename, frame.f_lineno)
+            if key not in seen:
+                seen.add(key)
+                lines[key] = lines.get(key, 0) + 1
+            frame = frame.f_back
+        count[0] += 1
+sys.setswitchinterval(interval)
+profile = cProfile.Profile()
+sampler = threading.Thread(target=sample, daemon=True)
+start = time.perf_counter()
+sampler.start()
+try:
+    profile.runcall(runpy.run_path, path, run_name='__main__')
+except SystemExit:
+    pass
+finally:
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    functions = [[f, l, n, nc, tt, ct] for (f, l, n), (cc, nc, tt, ct, _)
+                 in pstats.Stats(profile).stats.items()]
+    with open(out, 'w') as file:
+        json.dump({'elapsed': elapsed, 'samples': count[0], 'functions': functions,
+                   'lines': [[f, l, c] for (f, l), c in lines.items()]}, file)
+'''
+
+
+def python_command():
+    """Interpreter to run scripts with; a frozen build is not one"""
+    if not getattr(sys, 'frozen', False):
+        return sys.executable
+    return shutil.which('python3') or shutil.which('python') or 'python'
+
+
+def path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class ProfileResult:
+    """Function table and per-line sample counts of one profiled run"""
+    def __init__(self, data):
+        self.elapsed = data['elapsed']
+        self.samples = max(1, data['samples'])
+        # (function, file, line, calls, own seconds, total seconds)
+        # runpy's frames only wrap the script and would top every table
+        self.functions = [(name, path, line, calls, own, total)
+                          for path, line, name, calls, own, total in data['functions']
+                          if 'runpy' not in path]
+        self.lines = {}     # path_key -> {0-based line: samples}
+        for path, line, count in data['lines']:
+            if line and not path.startswith('<'):
+                self.lines.setdefault(path_key(path), {})[line - 1] = count
+
+    def heat_for(self, path):
+        """{0-based line: fraction of the run spent on it} for a file"""
+        counts = self.lines.get(path_key(path), {})
+        return {line: count / self.samples for line, count in counts.items()
+                if count / self.samples >= MIN_HEAT}
+
+
+def heat_color(fraction):
+    return HEAT_COLORS[min(len(HEAT_COLORS) - 1, int(fraction * len(HEAT_COLORS)))]
+
+
+class ProfileRun:
+    """A script running under the profiler in a subprocess
+
+    A thread streams the script's output onto `output` and, once it
+    exits, puts ('done', ProfileResult) or ('error', message) there too.
+    """
+    def __init__(self, path, args=(), cwd=None):
+        self.path = path
+        self.output = queue.Queue()
+        fd, self.result_path = tempfile.mkstemp(suffix='.json', prefix='profile-')
+        os.close(fd)
+        self.process = subprocess.Popen(
+            [python_command(), '-c', PROFILE_SCRIPT, self.result_path, str(SAMPLE_INTERVAL),
+             path, *args],
+            cwd=cwd or os.path.dirname(path), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, errors='replace')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        for line in self.process.stdout:
+            self.output.put(('output', line))
+        code = self.process.wait()
+        try:
+            with open(self.result_path) as file:
+                self.output.put(('done', ProfileResult(json.load(file))))
+        except (OSError, ValueError, KeyError) as e:
+            self.output.put(('error', f"exit code {code}" if code else str(e)))
+        finally:
+            try:
+                os.remove(self.result_path)
+            except OSError:
+                pass
+
+    def cancel(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+
+
+class ProfilerPanel(ttk.Frame):
+    """Run and Debug panel: run the current file under the profiler
+
+    get_script() returns (path, modified) of the file to run or None;
+    on_result(result) gets each finished ProfileResult (None to clear the
+    heat), on_output(text) the script's output and on_open(path, line)
+    is called when a function is double-clicked.
+    """
+    POLL_MS = 50
+    COLUMNS = (('function', 180), ('location', 160), ('calls', 60), ('own', 70), ('total', 70))
+
+    def __init__(self, parent, get_script, on_result, on_output, on_open):
+        super().__init__(parent)
+        self.get_script = get_script
+        self.on_result = on_result
+        self.on_output = on_output
+        self.on_open = on_open
+        self.run = None
+        self.poll_job = None
+        self.result = None
+        self.hottest = []
+        self.sort_column = 'total'
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x')
+        self.run_button = ttk.Button(toolbar, text="Run with Profiler", command=self.start)
+        self.run_button.pack(side='left')
+        ttk.Button(toolbar, text="Stop", command=self.stop).pack(side='left')
+        ttk.Button(toolbar, text="Clear", command=self.clear).pack(side='left')
+        self.status = ttk.Label(self, text="")
+        self.status.pack(fill='x')
+
+        self.table = ttk.Treeview(self, columns=[name for name, _ in self.COLUMNS],
+                                  show='headings')
+        for name, width in self.COLUMNS:
+            self.table.heading(name, text=name.title(),
+                               command=lambda column=name: self.sort_by(column))
+            self.table.column(name, width=width, stretch=name == 'function',
+                              anchor='w' if name in ('function', 'location') else 'e')
+        self.table.pack(fill='both', expand=True)
+        self.table.bind('<Double-1>', self.open_selected)
+        self.rows = {}  # Table item -> (path, line)
+
+    def start(self):
+        if self.run is not None:
+            return
+        script = self.get_script()
+        if script is None:
+            self.status.config(text="Save the file to profile it first")
+            return
+        path, modified = script
+        try:
+            self.run = ProfileRun(path)
+        except Exception as e:
+            self.status.config(text=f"Error: {str(e)}")
+            return
+        note = " (unsaved changes are not included)" if modified else ""
+        self.status.config(text=f"Profiling {os.path.basename(path)}...{note}")
+        self.run_button.state(['disabled'])
+        self.on_output(f"\n$ profile {path}\n")
+        self.poll_job = self.after(self.POLL_MS, self.poll)
+
+    def stop(self):
+        if self.run is not None:
+            self.run.cancel()
+
+    def clear(self):
+        self.result = None
+        self.hottest = []
+        self.table.delete(*self.table.get_children())
+        self.rows = {}
+        self.status.config(text="")
+        self.on_result(None)
+
+    def poll(self):
+        self.poll_job = None
+        finished = None
+        try:
+            while True:
+                kind, value = self.run.output.get_nowait()
+                if kind == 'output':
+                    self.on_output(value)
+                else:
+                    finished = (kind, value)
+                    break
+        except queue.Empty:
+            pass
+        if finished is None:
+            self.poll_job = self.after(self.POLL_MS, self.poll)
+            return
+        self.run = None
+        self.run_button.state(['!disabled'])
+        kind, value = finished
+        if kind == 'error':
+            self.status.config(text=f"Error: {value}")
+            return
+        self.result = value
+        self.hottest = sorted(value.functions, key=lambda f: -f[5])[:MAX_ROWS]
+        self.status.config(text=f"{value.elapsed:.3f} s, {len(value.functions)} functions")
+        self.fill_table()
+        self.on_result(value)
+
+    def sort_by(self, column):
+        self.sort_column = column
+        self.fill_table()
+
+    def fill_table(self):
+        """Show the hottest MAX_ROWS functions, ordered by the chosen column"""
+        self.table.delete(*self.table.get_children())
+        self.rows = {}
+        key = {'function': lambda f: f[0].lower(),
+               'location': lambda f: (f[1], f[2]),
+               'calls': lambda f: -f[3],
+               'own': lambda f: -f[4],
+               'total': lambda f: -f[5]}[self.sort_column]
+        for name, path, line, calls, own, total in sorted(self.hottest, key=key):
+            location = f"{os.path.basename(path)}:{line}" if line else "built-in"
+            item = self.table.insert('', 'end', values=(name, location, calls,
+                                                        f"{own:.4f}", f"{total:.4f}"))
+            if line:
+                self.rows[item] = (path, line)
+
+    def open_selected(self, event=None):
+        selection = self.table.selection()
+        if selection and selection[0] in self.rows:
+            self.on_open(*self.rows[selection[0]])
+
+    def destroy(self):
+        self.stop()
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        super().destroy()
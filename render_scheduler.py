@@ -0,0 +1,84 @@
+import time
+
+
+class RenderTask:
+    def __init__(self, name, callback, interval, delay, budget):
+        self.name = name
+        self.callback = callback
+        self.interval = interval / 1000     # Minimum seconds between runs
+        self.delay = delay / 1000           # Quiet time needed after the last mark
+        self.budget = budget                # Milliseconds per run, None for one-shot work
+        self.last_run = 0
+        self.due = 0
+
+
+class RenderScheduler:
+    """Coalesces an editor's redraw work into at most one run per idle cycle
+
+    Components register named tasks once, and event handlers only mark them
+    dirty.  However many keystrokes, scrolls and edits arrive before Tk goes
+    idle, each dirty task then runs once, in registration order.  A task
+    with an interval runs at most once per interval (throttling), one with
+    a delay only once marks stop arriving for that long (debouncing), and
+    one with a budget is called with a perf_counter() deadline and returns
+    True if it stopped early with work left, which runs it again after its
+    interval.
+    """
+    def __init__(self, widget):
+        self.widget = widget
+        self.tasks = []
+        self.by_name = {}
+        self.dirty = set()
+        self.job = None
+        self.job_due = None
+
+    def add_task(self, name, callback, interval=0, delay=0, budget=None):
+        task = RenderTask(name, callback, interval, delay, budget)
+        self.tasks.append(task)
+        self.by_name[name] = task
+
+    def mark(self, name):
+        """Ask for a task to run; repeated marks before it runs are free"""
+        task = self.by_name[name]
+        task.due = max(task.last_run + task.interval, time.monotonic() + task.delay)
+        self.dirty.add(name)
+        self.schedule()
+
+    def schedule(self):
+        if not self.dirty:
+            return
+        now = time.monotonic()
+        due = max(now, min(self.by_name[name].due for name in self.dirty))
+        if self.job is not None:
+            if self.job_due <= due:
+                return
+            self.widget.after_cancel(self.job)
+        self.job_due = due
+        if due <= now:
+            self.job = self.widget.after_idle(self.run)
+        else:
+            self.job = self.widget.after(int((due - now) * 1000) + 1, self.run)
+
+    def run(self):
+        """Run every dirty task that is due, once"""
+        self.job = None
+        now = time.monotonic()
+        try:
+            for task in self.tasks:
+                if task.name not in self.dirty or task.due > now:
+                    continue
+                self.dirty.discard(task.name)
+                task.last_run = now
+                if task.budget is None:
+                    task.callback()
+                elif task.callback(time.perf_counter() + task.budget / 1000):
+                    task.due = now + task.interval
+                    self.dirty.add(task.name)
+        finally:
+            self.schedule()
+
+    def cancel(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+        self.dirty.clear()
@@ -0,0 +1,384 @@
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import tkinter as tk
+
+from autosave import atomic_write
+from search_engine import BINARY_SNIFF, SearchJob
+from trigram_index import INDEX_DIR, make_index_dir
+
+JOURNAL_DIR = 'journal'     # Under INDEX_DIR: one directory per replace, newest last
+PREVIEW_LINES = 20          # Changed lines shown per file
+MAX_JOURNALS = 10           # Older replaces can no longer be undone
+
+
+def file_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def replace_text(text, query, regex, replacement):
+    """(new text, number of replacements)"""
+    if regex:
+        return re.compile(query, re.MULTILINE).subn(replacement, text)
+    return text.replace(query, replacement), text.count(query)
+
+
+def read_text(path):
+    """(bytes, text) of a UTF-8 text file, or None for binaries and other encodings
+
+    Newlines are kept as they are, so writing the text back changes nothing
+    but the replaced matches.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if b'\0' in data[:BINARY_SNIFF]:
+        return None
+    try:
+        return data, data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+
+def plan_replacements(root, names, query, regex, replacement, limit):
+    """Worker: [(name, hash, count, [(line, old, new)])] for files that would change
+
+    Runs in a pool process, so it only takes and returns plain data.
+    """
+    matches = re.compile(query).search if regex else (lambda line: query in line)
+    plans = []
+    for name in names:
+        try:
+            read = read_text(os.path.join(root, name))
+        except OSError:
+            continue
+        if read is None:
+            continue
+        data, text = read
+        new_text, count = replace_text(text, query, regex, replacement)
+        if not count or new_text == text:
+            continue
+        preview = []
+        for i, line in enumerate(text.splitlines(), 1):
+            if matches(line):
+                new_line = replace_text(line, query, regex, replacement)[0]
+                preview.append((i, line.strip(), new_line.strip()))
+                if len(preview) >= PREVIEW_LINES:
+                    break
+        plans.append((name, file_hash(data), count, preview))
+        if len(plans) >= limit:
+            break
+    return plans
+
+
+def write_journal_batch(path, records):
+    """Save (name, before hash, after hash, original bytes) records, synced
+
+    One JSON header line lists the records and the original contents
+    follow back to back, so a batch costs a single fsync.
+    """
+    header = json.dumps([[name, before, after, len(data)]
+                         for name, before, after, data in records]).encode() + b'\n'
+    pieces = [(header, 0, len(header))] + [(data, 0, len(data)) for _, _, _, data in records]
+    atomic_write(path, pieces, binary=True)
+
+
+def read_journal_batch(path, root):
+    """Records of a journal batch, checked before anything is restored from it
+
+    Journals live inside the project, so a cloned repository can ship one:
+    every record must have the right types and name a file below root, or
+    the whole batch is rejected with ValueError.
+    """
+    with open(path, 'rb') as file:
+        header = json.loads(file.readline())
+        body = file.read()
+    if not isinstance(header, list):
+        raise ValueError("journal header is not a list")
+    top = os.path.realpath(root)
+    records, offset = [], 0
+    for entry in header:
+        if not (isinstance(entry, list) and len(entry) == 4):
+            raise ValueError("malformed journal record")
+        name, before, after, size = entry
+        if not (isinstance(name, str) and isinstance(before, str) and isinstance(after, str)
+                and len(before) == len(after) == 32 and type(size) is int and size >= 0):
+            raise ValueError("malformed journal record")
+        if (not name or '\0' in name or os.path.isabs(name)
+                or os.pardir in re.split(r'[\\/]', name)):
+            raise ValueError(f"journal names a path outside the project: {name!r}")
+        real = os.path.realpath(os.path.join(root, name))
+        if real == top or os.path.commonpath([top, real]) != top:
+            raise ValueError(f"journal names a path outside the project: {name!r}")
+        records.append((name, before, after, body[offset:offset + size]))
+        offset += size
+    if offset != len(body):
+        raise ValueError("journal contents do not match its header")
+    return records
+
+
+def apply_replacements(root, journal, batch_id, plans, query, regex, replacement):
+    """Worker: rewrite a batch of planned files, journaling them first
+
+    A file whose content no longer hashes to its planned value was edited
+    after the preview and is left alone.  Returns [(name, status)] with
+    status 'replaced', 'changed' or an error message.
+    """
+    results, records, writes = [], [], []
+    for name, digest in plans:
+        path = os.path.join(root, name)
+        try:
+            read = read_text(path)
+        except OSError as e:
+            results.append((name, str(e)))
+            continue
+        if read is None or file_hash(read[0]) != digest:
+            results.append((name, 'changed'))
+            continue
+        data, text = read
+        new_data = replace_text(text, query, regex, replacement)[0].encode('utf-8')
+        records.append((name, digest, file_hash(new_data), data))
+        writes.append((name, path, new_data))
+    if records:
+        # Nothing is touched before the originals are safely on disk
+        write_journal_batch(os.path.join(journal, f'{batch_id:06d}.batch'), records)
+    for name, path, new_data in writes:
+        try:
+            atomic_write(path, [(new_data, 0, len(new_data))], binary=True)
+            results.append((name, 'replaced'))
+        except OSError as e:
+            results.append((name, str(e)))
+    return results
+
+
+def undo_replacements(root, batch_path):
+    """Worker: restore the files of one journal batch
+
+    Only files still holding exactly what the replace wrote are restored;
+    ones edited since are reported as 'conflict'.  Returns [(name, status)]
+    with status 'restored', 'unchanged', 'conflict' or an error message.
+    """
+    try:
+        records = read_journal_batch(batch_path, root)
+    except (OSError, ValueError) as e:
+        return [(os.path.basename(batch_path), f"invalid journal: {e}")]
+    results = []
+    for name, before, after, data in records:
+        path = os.path.join(root, name)
+        try:
+            with open(path, 'rb') as file:
+                current = file_hash(file.read())
+        except OSError:
+            current = None
+        if current == before:
+            results.append((name, 'unchanged'))
+        elif current != after:
+            results.append((name, 'conflict'))
+        else:
+            try:
+                atomic_write(path, [(data, 0, len(data))], binary=True)
+                results.append((name, 'restored'))
+            except OSError as e:
+                results.append((name, str(e)))
+    return results
+
+
+def journal_root(root):
+    return os.path.join(root, INDEX_DIR, JOURNAL_DIR)
+
+
+def latest_journal(root):
+    """Directory of the last replace that can still be undone, or None"""
+    try:
+        names = sorted(os.listdir(journal_root(root)))
+    except OSError:
+        return None
+    return os.path.join(journal_root(root), names[-1]) if names else None
+
+
+class ReplacePreviewJob(SearchJob):
+    """Find the files a replace would change, streaming their plans
+
+    Reuses SearchJob's file listing (trigram index candidates when built)
+    and batching; each result on the queue is a list of plans from
+    plan_replacements.
+    """
+    MAX_FILES = 100000
+
+    def __init__(self, pool, root, query, regex, replacement, index):
+        if regex:
+            re.compile(query)   # Surface bad patterns to the caller
+        super().__init__(pool, root, query, regex, index, self.MAX_FILES)
+        self.replacement = replacement
+
+    def submit(self, batch):
+        return self.pool.submit(plan_replacements, self.root, batch, self.query, self.regex,
+                                self.replacement, self.max_hits - self.hits)
+
+
+class BatchJob:
+    """Runs a worker over batches in the pool, streaming results in order of completion
+
+    Workers return [(name, status)]; `statuses` counts them.  Cancelling
+    stops handing out batches; the ones already running finish, so every
+    file is either fully written (and journaled) or untouched.  None on
+    `results` means the job is over.
+    """
+    IN_FLIGHT = 16
+
+    def __init__(self, pool, function, batches, on_finish=None):
+        self.pool = pool
+        self.function = function
+        self.batches = batches      # Argument tuples, one call each
+        self.on_finish = on_finish  # Called on the job's thread once all batches ran
+        self.statuses = Counter()
+        self.error = None
+        self.cancelled = threading.Event()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        pending = set()
+        try:
+            batches = iter(self.batches)
+            while True:
+                while len(pending) < self.IN_FLIGHT and not self.cancelled.is_set():
+                    args = next(batches, None)
+                    if args is None:
+                        break
+                    pending.add(self.pool.submit(self.function, *args))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results = future.result()
+                    self.statuses.update(status for _, status in results)
+                    self.results.put(results)
+            if not self.cancelled.is_set() and self.on_finish is not None:
+                self.on_finish()
+        except Exception as e:
+            self.error = e
+        finally:
+            wait(pending)
+            self.results.put(None)
+
+
+def start_apply(pool, root, plans, query, regex, replacement, files_per_task=64):
+    """Apply previewed plans [(name, hash)], journaled for undo_last()"""
+    make_index_dir(root)
+    journal = os.path.join(journal_root(root), f'{time.time_ns():020d}')
+    os.makedirs(journal, exist_ok=True)
+    for name in sorted(os.listdir(journal_root(root)))[:-MAX_JOURNALS]:
+        shutil.rmtree(os.path.join(journal_root(root), name), ignore_errors=True)
+    batches = [(root, journal, i, plans[start:start + files_per_task], query, regex, replacement)
+               for i, start in enumerate(range(0, len(plans), files_per_task))]
+    return BatchJob(pool, apply_replacements, batches).start()
+
+
+def start_undo(pool, root):
+    """Undo the last replace; its journal is dropped once every file was restored
+
+    Returns None when there is nothing to undo.
+    """
+    journal = latest_journal(root)
+    if journal is None:
+        return None
+    batches = [(root, os.path.join(journal, name))
+               for name in sorted(os.listdir(journal)) if name.endswith('.batch')]
+    job = BatchJob(pool, undo_replacements, batches)
+
+    def finish():
+        # Keep the journal while a file could not be put back, to retry later
+        if set(job.statuses) <= {'restored', 'unchanged'}:
+            shutil.rmtree(journal, ignore_errors=True)
+
+    job.on_finish = finish
+    return job.start()
+
+
+class VirtualList(tk.Canvas):
+    """Scrollable list of text rows that only draws the rows in view
+
+    Rows are (text, colour, payload) tuples kept in a plain list, so a
+    list of a million rows costs no more to show or scroll than a dozen.
+    on_activate(payload) is called on double-click.
+    """
+    ROW_HEIGHT = 18
+
+    def __init__(self, parent, on_activate=None, font=('Consolas', 10)):
+        super().__init__(parent, bg='#1e1e1e', highlightthickness=0)
+        self.on_activate = on_activate
+        self.font = font
+        self.rows = []
+        self.top = 0
+        self.items = []         # Reusable text items, one per visible row
+        self.yscrollcommand = None
+        self.redraw_job = None
+        self.bind('<Configure>', lambda e: self.schedule_redraw())
+        self.bind('<MouseWheel>', lambda e: self.scroll_by(-3 if e.delta > 0 else 3))
+        self.bind('<Button-4>', lambda e: self.scroll_by(-3))
+        self.bind('<Button-5>', lambda e: self.scroll_by(3))
+        self.bind('<Double-1>', self.activate)
+
+    def set_rows(self, rows):
+        self.rows = list(rows)
+        self.top = 0
+        self.schedule_redraw()
+
+    def append(self, rows):
+        self.rows.extend(rows)
+        self.schedule_redraw()
+
+    def visible_count(self):
+        return max(1, self.winfo_height() // self.ROW_HEIGHT)
+
+    def scroll_by(self, rows):
+        self.top = max(0, min(self.top + rows, len(self.rows) - self.visible_count()))
+        self.schedule_redraw()
+
+    def yview(self, *args):
+        """Scrollbar protocol: 'moveto' fraction or 'scroll' n units/pages"""
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.rows))
+            self.scroll_by(0)
+        elif args[0] == 'scroll':
+            step = self.visible_count() if args[2] == 'pages' else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def schedule_redraw(self):
+        if self.redraw_job is None:
+            self.redraw_job = self.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_job = None
+        count = self.visible_count() + 1
+        rows = self.rows[self.top:self.top + count]
+        while len(self.items) < len(rows):
+            self.items.append(self.create_text(4, 0, anchor='nw', font=self.font))
+        for i, (text, colour, _) in enumerate(rows):
+            self.coords(self.items[i], 4, i * self.ROW_HEIGHT)
+            self.itemconfigure(self.items[i], text=text, fill=colour, state='normal')
+        for item in self.items[len(rows):]:
+            self.itemconfigure(item, state='hidden')
+        if self.yscrollcommand is not None:
+            total = max(1, len(self.rows))
+            self.yscrollcommand(self.top / total, min(1.0, (self.top + count - 1) / total))
+
+    def activate(self, event):
+        index = self.top + event.y // self.ROW_HEIGHT
+        if self.on_activate is not None and index < len(self.rows):
+            self.on_activate(self.rows[index][2])
@@ -0,0 +1,314 @@
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor, ALL_COMPLETED,
+                                FIRST_COMPLETED, wait)
+
+from trigram_index import SKIP_DIRS, required_literals
+
+BINARY_SNIFF = 8192     # Bytes checked for NUL when deciding a file is binary
+
+
+def gitignore_regex(pattern):
+    """Translate one .gitignore glob into a regex over '/'-separated paths"""
+    out, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            out.append('[^/]*')
+        elif char == '?':
+            out.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return re.compile(''.join(out) + '$')
+
+
+class GitIgnore:
+    """.gitignore rules of a project, including nested .gitignore files
+
+    Rules are read lazily per directory and the verdict for every directory
+    is cached, so checking a path costs a few dictionary lookups once its
+    parents have been seen.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.rules = {}     # Directory ('' for the root) -> [(regex, negate, dir_only, anchored)]
+        self.verdicts = {}  # Directory -> ignored?
+
+    def rules_for(self, directory):
+        rules = self.rules.get(directory)
+        if rules is None:
+            rules = self.rules[directory] = []
+            try:
+                with open(os.path.join(self.root, directory, '.gitignore'), 'r',
+                          errors='replace') as file:
+                    lines = file.read().splitlines()
+            except OSError:
+                lines = []
+            for line in lines:
+                line = line.rstrip()
+                if not line or line.startswith('#'):
+                    continue
+                negate = line.startswith('!')
+                if negate:
+                    line = line[1:]
+                dir_only = line.endswith('/')
+                line = line.rstrip('/')
+                anchored = '/' in line
+                rules.append((gitignore_regex(line.lstrip('/')), negate, dir_only, anchored))
+        return rules
+
+    def ignored(self, name, is_dir=False):
+        """Whether a path relative to the root is ignored, parents included"""
+        parts = name.replace(os.sep, '/').split('/')
+        for depth in range(1, len(parts)):
+            directory = '/'.join(parts[:depth])
+            verdict = self.verdicts.get(directory)
+            if verdict is None:
+                verdict = self.verdicts[directory] = self.matches(parts[:depth], True)
+            if verdict:
+                return True
+        return self.matches(parts, is_dir)
+
+    def matches(self, parts, is_dir):
+        """Last matching rule wins, deeper .gitignore files after shallower ones"""
+        ignored = False
+        for depth in range(len(parts)):
+            rules = self.rules_for('/'.join(parts[:depth]))
+            relative = '/'.join(parts[depth:])
+            for regex, negate, dir_only, anchored in rules:
+                if dir_only and not is_dir:
+                    continue
+                if regex.match(relative if anchored else parts[-1]):
+                    ignored = not negate
+        return ignored
+
+    def walk(self):
+        """Yield relative paths of every file that is not ignored"""
+        stack = ['']
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(os.scandir(os.path.join(self.root, directory)),
+                                 key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                name = f'{directory}/{entry.name}' if directory else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS and not self.ignored(name, True):
+                            stack.append(name)
+                    elif entry.is_file() and not self.ignored(name):
+                        yield name
+                except OSError:
+                    continue
+
+
+def search_files(root, names, query, regex, limit):
+    """Worker: matching lines in a batch of files, skipping binaries
+
+    Runs in a pool process, so it only takes and returns plain data.
+    """
+    if regex:
+        pattern = re.compile(query)
+        matches = pattern.search
+        # Only literals every match must contain: running the regex on the
+        # whole text would miss lines it matches on their own (\Afoo, foo\Z)
+        literals = required_literals(query)
+        if pattern.flags & re.IGNORECASE:
+            literals = [literal.lower() for literal in literals]
+            prefilter = lambda text: all(map(text.lower().__contains__, literals))
+        else:
+            prefilter = lambda text: all(map(text.__contains__, literals))
+    else:
+        prefilter = matches = lambda text: query in text
+    hits = []
+    for name in names:
+        try:
+            with open(os.path.join(root, name), 'rb') as file:
+                data = file.read()
+        except OSError:
+            continue
+        if b'\0' in data[:BINARY_SNIFF]:
+            continue
+        text = data.decode('utf-8', errors='replace')
+        # Whole-file check first: most files in a batch have no hit at all
+        if not prefilter(text):
+            continue
+        for i, line in enumerate(text.splitlines(), 1):
+            if matches(line):
+                hits.append((name, i, line.strip()))
+                if len(hits) >= limit:
+                    return hits
+    return hits
+
+
+class SearchJob:
+    """One running search, streaming batches of hits through a queue
+
+    A coordinator thread lists the files (from the trigram index when it is
+    built, otherwise by walking the tree), hands them to the pool in
+    batches and puts each batch's hits on `results`.  None on the queue
+    means the search finished.
+    """
+    FILES_PER_TASK = 64
+    IN_FLIGHT = 16          # Tasks submitted ahead of the results
+
+    def __init__(self, pool, root, query, regex, index, max_hits):
+        self.pool = pool
+        self.root = root
+        self.query = query
+        self.regex = regex
+        self.index = index
+        self.max_hits = max_hits
+        self.hits = 0
+        self.error = None
+        self.cancelled = threading.Event()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def capped(self):
+        return self.hits >= self.max_hits
+
+    def files(self):
+        ignore = GitIgnore(self.root)
+        if self.index is None or not self.index.files:
+            yield from ignore.walk()
+            return
+        literals = required_literals(self.query) if self.regex else [self.query]
+        with self.index.lock:
+            self.index.refresh()
+            names = self.index.candidates(literals)
+        for name in names:
+            if not ignore.ignored(name):
+                yield name
+
+    def run(self):
+        pending = set()
+        try:
+            batch = []
+            for name in self.files():
+                if self.cancelled.is_set() or self.capped:
+                    break
+                batch.append(name)
+                if len(batch) >= self.FILES_PER_TASK:
+                    pending.add(self.submit(batch))
+                    batch = []
+                    if len(pending) >= self.IN_FLIGHT:
+                        pending = self.collect(pending, FIRST_COMPLETED)
+            if batch and not self.cancelled.is_set():
+                pending.add(self.submit(batch))
+            self.collect(pending)
+            if self.index is not None and not self.index.files and not self.cancelled.is_set():
+                # First search in this project: build the index for the next one
+                with self.index.lock:
+                    self.index.refresh(force=True)
+        except Exception as e:
+            self.error = e
+        finally:
+            for future in pending:
+                future.cancel()
+            self.results.put(None)
+
+    def submit(self, batch):
+        return self.pool.submit(search_files, self.root, batch, self.query,
+                                self.regex, self.max_hits - self.hits)
+
+    def collect(self, pending, return_when=ALL_COMPLETED):
+        """Wait for tasks and stream their hits; returns the ones still running"""
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=return_when)
+            for future in done:
+                if self.cancelled.is_set() or self.capped:
+                    continue
+                hits = future.result()[:self.max_hits - self.hits]
+                if hits:
+                    self.hits += len(hits)
+                    self.results.put(hits)
+            if self.cancelled.is_set() or self.capped:
+                for future in pending:
+                    future.cancel()
+                return set()
+            if done and return_when == FIRST_COMPLETED:
+                break
+        return pending
+
+
+def pool_context():
+    """Start workers from a clean process: forking this one would copy Tk and
+    the locks its threads (watcher, git, autosave, LSP) may be holding"""
+    try:
+        return multiprocessing.get_context('forkserver')
+    except ValueError:
+        return multiprocessing.get_context('spawn')
+
+
+class SearchEngine:
+    """Owns the worker pool shared by every search of a CodeEditor"""
+    MAX_HITS = 5000
+
+    def __init__(self):
+        self.pool = None
+        self.job = None
+
+    def get_pool(self):
+        if self.pool is None:
+            try:
+                self.pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                                mp_context=pool_context())
+            except (OSError, NotImplementedError):
+                # No multiprocessing on this platform: threads still keep Tk responsive
+                self.pool = ThreadPoolExecutor(max_workers=4)
+        return self.pool
+
+    def start(self, root, query, regex=False, index=None):
+        """Cancel any running search and start a new one"""
+        self.cancel()
+        if regex:
+            re.compile(query)   # Surface bad patterns to the caller
+        self.job = SearchJob(self.get_pool(), root, query, regex, index, self.MAX_HITS).start()
+        return self.job
+
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def shutdown(self):
+        self.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
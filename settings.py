@@ -29,6 +29,13 @@ class Settings(ttk.Frame):
         self.auto_save_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(editor_frame, text="Auto Save", variable=self.auto_save_var).pack(anchor='w')
 
+        max_tabs_frame = ttk.Frame(editor_frame)
+        max_tabs_frame.pack(anchor='w')
+        ttk.Label(max_tabs_frame, text="Editors kept loaded:").pack(side='left')
+        self.max_live_tabs_var = tk.IntVar(value=self.main_app.code_editor.tabs.max_live)
+        ttk.Spinbox(max_tabs_frame, from_=1, to=200, width=5,
+                    textvariable=self.max_live_tabs_var).pack(side='left', padx=5)
+
         # API Tester settings
         api_tester_frame = ttk.LabelFrame(self, text="API Tester Settings", padding=10)
         api_tester_frame.pack(fill='x', padx=10, pady=5)
@@ -78,12 +85,22 @@ class Settings(ttk.Frame):
             self.main_app.git_manager.github.user_data = None
             messagebox.showinfo("Success", "Signed out of GitHub successfully!")
 
+    def max_live_tabs(self):
+        """The Spinbox value, or the current cap if what was typed is not a number"""
+        try:
+            return max(1, self.max_live_tabs_var.get())
+        except tk.TclError:
+            value = self.main_app.code_editor.tabs.max_live
+            self.max_live_tabs_var.set(value)
+            return value
+
     def save_settings(self):
         # Save settings logic
         settings = {
             "wrap_text": self.wrap_text_var.get(),
             "show_line_numbers": self.show_line_numbers_var.get(),
             "auto_save": self.auto_save_var.get(),
+            "max_live_tabs": self.max_live_tabs(),
             "follow_redirects": self.follow_redirects_var.get(),
             "verify_ssl": self.verify_ssl_var.get(),
             "enable_logging": self.enable_logging_var.get(),
@@ -97,10 +114,13 @@ class Settings(ttk.Frame):
         messagebox.showinfo("Success", "Settings saved successfully!")
 
     def apply_settings_to_tabs(self, settings):
-        # Apply settings to Code Editor
+        # Apply settings to Code Editor; hibernated tabs pick them up on rehydrate
+        self.main_app.code_editor.editor_settings = settings
         for editor in self.main_app.code_editor.editors:
-            editor.text_area.config(wrap='word' if settings["wrap_text"] else 'none')
-            editor.line_numbers.pack_forget() if not settings["show_line_numbers"] else editor.line_numbers.pack(side='left', fill='y')
+            self.main_app.code_editor.apply_editor_settings(editor)
+        self.main_app.code_editor.autosaver.enabled = settings["auto_save"]
+        self.main_app.code_editor.tabs.max_live = settings["max_live_tabs"]
+        self.main_app.code_editor.tabs.enforce(keep=self.main_app.code_editor.get_current_editor())
 
         # Apply settings to API Tester
         self.main_app.api_tester.follow_redirects = settings["follow_redirects"]
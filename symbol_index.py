@@ -0,0 +1,350 @@
+import ast
+import hashlib
+import os
+import sqlite3
+import threading
+from bisect import bisect_right
+from concurrent.futures import as_completed
+
+from pygments.lexers import get_lexer_for_filename
+from pygments.token import Token
+from pygments.util import ClassNotFound
+
+from search_engine import BINARY_SNIFF, GitIgnore
+from trigram_index import INDEX_DIR, make_index_dir
+
+INDEX_FILE = 'symbols.db'
+SCHEMA_VERSION = 3     # 2: columns count characters, not UTF-8 bytes; 3: no nested locals
+MAX_FILE = 2 << 20      # Bigger files (generated, minified) are not parsed
+POOL_THRESHOLD = 200    # Changed files needed before parsing moves to the process pool
+FILES_PER_TASK = 100
+MAX_NAMES = 100000      # Most common definition names kept in memory for completion
+
+lexers = {}     # Extension -> Pygments lexer or None, per process (lookups scan plugins)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS files (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE NOT NULL,
+        hash TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS symbols (
+        name TEXT NOT NULL COLLATE NOCASE,
+        kind TEXT NOT NULL,
+        container TEXT NOT NULL,
+        file_id INTEGER NOT NULL,
+        line INTEGER NOT NULL,
+        col INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+    CREATE INDEX IF NOT EXISTS symbols_file ON symbols (file_id);
+'''
+
+
+def python_symbols(source):
+    """(name, kind, container, line, col) for the definitions in Python source
+
+    ast's col_offset counts UTF-8 bytes; col is converted to characters,
+    which is what a Text index needs.
+    """
+    symbols = []
+    lines = source.split('\n')
+
+    def column(lineno, offset):
+        line = lines[lineno - 1] if lineno <= len(lines) else ''
+        if line.isascii():
+            return offset
+        return len(line.encode('utf-8')[:offset].decode('utf-8', errors='ignore'))
+
+    def visit(node, container, in_class, in_function):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if isinstance(child, ast.ClassDef):
+                    kind = 'class'
+                else:
+                    kind = 'method' if in_class else 'function'
+                symbols.append((child.name, kind, container, child.lineno,
+                                column(child.lineno, child.col_offset)))
+                visit(child, f'{container}.{child.name}' if container else child.name,
+                      isinstance(child, ast.ClassDef),
+                      in_function or not isinstance(child, ast.ClassDef))
+            elif isinstance(child, (ast.Assign, ast.AnnAssign)) and not in_function:
+                # Module and class level names only; locals are not worth indexing
+                targets = child.targets if isinstance(child, ast.Assign) else [child.target]
+                for target in targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append((target.id, 'variable', container, target.lineno,
+                                        column(target.lineno, target.col_offset)))
+            elif isinstance(child, (ast.If, ast.Try, ast.With, ast.For, ast.While)):
+                visit(child, container, in_class, in_function)
+
+    visit(ast.parse(source), '', False, False)
+    return symbols
+
+
+def token_symbols(lexer, source):
+    """Definitions picked out of a Pygments token stream, for other languages"""
+    newlines = [i for i, char in enumerate(source) if char == '\n']
+    symbols = []
+    for index, tokentype, value in lexer.get_tokens_unprocessed(source):
+        if tokentype in Token.Name.Class:
+            kind = 'class'
+        elif tokentype in Token.Name.Function:
+            kind = 'function'
+        else:
+            continue
+        name = value.strip()
+        if name:
+            line = bisect_right(newlines, index - 1)
+            col = index - (newlines[line - 1] + 1 if line else 0)
+            symbols.append((name, kind, '', line + 1, col))
+    return symbols
+
+
+def file_symbols(name, source):
+    if name.endswith(('.py', '.pyw')):
+        try:
+            return python_symbols(source)
+        except (SyntaxError, ValueError, RecursionError):
+            pass    # Half-typed code still gets the token-based pass
+    extension = os.path.splitext(name)[1].lower() or os.path.basename(name)
+    if extension not in lexers:
+        try:
+            lexers[extension] = get_lexer_for_filename(name, stripnl=False, ensurenl=False)
+        except ClassNotFound:
+            lexers[extension] = None
+    if lexers[extension] is None:
+        return []
+    return token_symbols(lexers[extension], source)
+
+
+def index_files(root, entries):
+    """Worker: [(name, hash, mtime_ns, size, symbols or None)] for a batch
+
+    entries are (name, known hash); symbols is None when the content still
+    hashes to the known value, so unchanged files are never re-parsed.
+    Runs in a pool process, so it only takes and returns plain data.
+    """
+    results = []
+    for name, known in entries:
+        path = os.path.join(root, name)
+        try:
+            stat = os.stat(path)
+            with open(path, 'rb') as file:
+                data = file.read(MAX_FILE + 1)
+        except OSError:
+            continue
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest == known:
+            results.append((name, digest, stat.st_mtime_ns, stat.st_size, None))
+            continue
+        symbols = []
+        if len(data) <= MAX_FILE and b'\0' not in data[:BINARY_SNIFF]:
+            try:
+                symbols = file_symbols(name, data.decode('utf-8', errors='replace'))
+            except Exception:
+                symbols = []
+        results.append((name, digest, stat.st_mtime_ns, stat.st_size, symbols))
+    return results
+
+
+class SymbolIndex:
+    """Project-wide index of definitions for go-to-definition and symbol search
+
+    Python files are parsed with ast and everything else is read from the
+    Pygments token stream.  Definitions live in .quantam/symbols.db, keyed
+    by each file's content hash, so only files whose content really
+    changed are parsed again.  Indexing runs on a background thread that
+    farms a large first build out to the process pool; lookups use their
+    own connection on the calling thread and are plain index queries.
+    """
+    def __init__(self, root, get_pool=None):
+        self.root = root
+        self.path = os.path.join(root, INDEX_DIR, INDEX_FILE)
+        self.get_pool = get_pool
+        self.reader = None
+        self.condition = threading.Condition()
+        self.pending = False
+        self.full = False       # Walk the whole project
+        self.paths = set()      # Changed paths ('/'-separated, relative to root)
+        self.indexing = False
+        self.closed = False
+        self.error = None
+        self.thread = None
+        self.names = None       # (sorted names, their counts), replaced whole by the builder
+
+    def connect(self):
+        """Builder connection: creates or migrates the schema"""
+        make_index_dir(self.root)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')     # Readers never wait for the builder
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript('DROP TABLE IF EXISTS symbols; DROP TABLE IF EXISTS files;')
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.executescript(SCHEMA)
+        return conn
+
+    # Building
+
+    def refresh(self, full=True):
+        """Bring the index up to date in the background"""
+        with self.condition:
+            self.pending = True
+            self.full = self.full or full
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def apply_changes(self, change_set):
+        """FileWatcher subscriber: re-index only the paths that changed"""
+        with self.condition:
+            self.paths.update(path.replace(os.sep, '/') for path in change_set.changes)
+        self.refresh(full=change_set.overflow)
+
+    def run(self):
+        """Thread body: serve refresh requests with the builder's own connection"""
+        conn = None
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    break
+                full, paths = self.full, self.paths
+                self.pending, self.full, self.paths = False, False, set()
+                self.indexing = True
+            try:
+                conn = conn or self.connect()
+                self.update(conn, full, paths)
+                self.error = None
+            except Exception as e:
+                self.error = e
+            finally:
+                with self.condition:
+                    self.indexing = False
+        if conn is not None:
+            conn.close()
+
+    def update(self, conn, full, paths):
+        known = {path: (file_id, file_hash, mtime_ns, size) for file_id, path, file_hash, mtime_ns, size
+                 in conn.execute('SELECT id, path, hash, mtime_ns, size FROM files')}
+        ignore = GitIgnore(self.root)
+        if full:
+            names = list(ignore.walk())
+            gone = known.keys() - set(names)
+        else:
+            names, gone = [], set()
+            for path in paths:
+                if os.path.isfile(os.path.join(self.root, path)):
+                    if not ignore.ignored(path):
+                        names.append(path)
+                else:
+                    # A deleted directory takes everything below it along
+                    gone.update(name for name in known
+                                if name == path or name.startswith(path + '/'))
+        changed = []
+        for name in names:
+            entry = known.get(name)
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            if entry is None or entry[2:] != (stat.st_mtime_ns, stat.st_size):
+                changed.append((name, entry[1] if entry else None))
+        with conn:
+            for name in gone:
+                self.delete_file(conn, known[name][0])
+        if not changed:
+            if self.names is None:
+                self.load_names(conn)
+            return
+        batches = [changed[i:i + FILES_PER_TASK] for i in range(0, len(changed), FILES_PER_TASK)]
+        pool = self.get_pool() if self.get_pool and len(changed) >= POOL_THRESHOLD else None
+        if pool is None:
+            results = (index_files(self.root, batch) for batch in batches)
+        else:
+            futures = [pool.submit(index_files, self.root, batch) for batch in batches]
+            results = (future.result() for future in as_completed(futures))
+        for batch in results:
+            if self.closed:
+                return
+            with conn:
+                for name, digest, mtime_ns, size, symbols in batch:
+                    self.store(conn, known.get(name), name, digest, mtime_ns, size, symbols)
+        if full or self.names is None:
+            self.load_names(conn)
+
+    def load_names(self, conn):
+        rows = conn.execute('''SELECT name COLLATE BINARY, count(*) FROM symbols
+                               GROUP BY name COLLATE BINARY ORDER BY count(*) DESC
+                               LIMIT ?''', (MAX_NAMES,)).fetchall()
+        rows.sort()
+        self.names = ([name for name, _ in rows], [count for _, count in rows])
+
+    def store(self, conn, entry, name, digest, mtime_ns, size, symbols):
+        if symbols is None and entry is not None:
+            # Touched but identical: just remember the new stat
+            conn.execute('UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?',
+                         (mtime_ns, size, entry[0]))
+            return
+        if entry is not None:
+            self.delete_file(conn, entry[0])
+        file_id = conn.execute('INSERT INTO files (path, hash, mtime_ns, size) VALUES (?, ?, ?, ?)',
+                               (name, digest, mtime_ns, size)).lastrowid
+        conn.executemany('INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)',
+                         [(symbol, kind, container, file_id, line, col)
+                          for symbol, kind, container, line, col in symbols or ()])
+
+    def delete_file(self, conn, file_id):
+        conn.execute('DELETE FROM symbols WHERE file_id = ?', (file_id,))
+        conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    # Queries (on the caller's thread)
+
+    def query(self, sql, args):
+        if not os.path.exists(self.path):
+            return []
+        if self.reader is None:
+            self.reader = sqlite3.connect(self.path, timeout=1)
+        try:
+            return self.reader.execute(sql, args).fetchall()
+        except sqlite3.OperationalError:
+            return []   # The builder has not created the tables yet
+
+    def definitions(self, name):
+        """[(path, line, col, kind, container)] for symbols named exactly name"""
+        return self.query('''
+            SELECT files.path, line, col, kind, container FROM symbols
+            JOIN files ON files.id = symbols.file_id
+            WHERE name = ?1 AND name = ?1 COLLATE BINARY
+            ORDER BY kind = 'variable', files.path, line''', (name,))
+
+    def search(self, query, limit=200):
+        """[(name, kind, container, path, line, col)], prefix matches first"""
+        pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        columns = '''SELECT name, kind, container, files.path, line, col FROM symbols
+                     JOIN files ON files.id = symbols.file_id'''
+        # The NOCASE index serves the prefix query; only the rest needs a scan
+        hits = self.query(f'''{columns} WHERE name >= ? AND name < ?
+                              ORDER BY length(name), name LIMIT ?''',
+                          (query, query + '\U0010ffff', limit))
+        if len(hits) < limit:
+            seen = {hit[3:5] + hit[:1] for hit in hits}
+            for hit in self.query(f'''{columns} WHERE name LIKE ? ESCAPE '\\'
+                                      ORDER BY length(name), name LIMIT ?''',
+                                  (f'%{pattern}%', limit)):
+                if hit[3:5] + hit[:1] not in seen and len(hits) < limit:
+                    hits.append(hit)
+        return hits
@@ -0,0 +1,370 @@
+import time
+
+from pygments.lexer import RegexLexer, ExtendedRegexLexer
+from pygments.lexers import get_lexer_for_filename, PythonLexer, TextLexer
+from pygments.token import Token, _TokenType
+from pygments.util import ClassNotFound
+
+# Pygments token types mapped to the tags set up in EditorTab.configure_tags.
+# Order matters: the most specific types come first.
+TOKEN_TAGS = [
+    (Token.Name.Function, 'function'),
+    (Token.Name.Decorator, 'function'),
+    (Token.Name.Class, 'class'),
+    (Token.Keyword, 'keyword'),
+    (Token.Name.Builtin, 'keyword'),
+    (Token.Comment, 'comment'),
+    (Token.Literal.String, 'string'),
+    (Token.Literal.Number, 'number'),
+]
+HIGHLIGHT_TAGS = sorted(set(tag for _, tag in TOKEN_TAGS))
+
+ROOT_STATE = ('root',)
+# Start state of a line inside a token that began k lines up: ('#span', k, *stack)
+SPAN = '#span'
+
+
+def get_lexer_for_file(filename):
+    """Pick a Pygments lexer for a filename, Python for new buffers"""
+    if not filename or filename == "Untitled":
+        return PythonLexer()
+    try:
+        return get_lexer_for_filename(filename)
+    except ClassNotFound:
+        return TextLexer()
+
+
+class SyntaxHighlighter:
+    """Incremental, viewport-limited Pygments highlighter for an EditorTab
+
+    The lexer state at the start of every line is cached.  After an edit only
+    the dirty lines are re-lexed, resuming from the cached state of the first
+    dirty line, and lexing stops as soon as the state flowing out of a line
+    matches the cached state of the next one.  Tags are only applied to the
+    visible lines plus a margin; the rest of the file is lexed for state in
+    the background, IDLE_BUDGET milliseconds at a time, once typing pauses.
+    """
+    MARGIN = 50         # Lines tagged above and below the viewport
+    IDLE_CHUNK = 100    # Lines lexed between deadline checks past the viewport
+    IDLE_BUDGET = 8     # Milliseconds of background lexing per run
+    MAX_SPAN = 500      # Lines a multi-line token is re-lexed across before giving up
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.lexer = None
+        self.tag_cache = {}
+        self.scheduler = editor.scheduler
+        self.scheduler.add_task('highlight', self.highlight_viewport)
+        self.scheduler.add_task('lex', self.lex_in_background, interval=10, delay=50,
+                                budget=self.IDLE_BUDGET)
+        self.state_listeners = []   # Called with a 0-based line whose start state changed
+        self.folds = None           # FoldIndex: folded lines are neither lexed nor tagged here
+        self.waiting = None         # Visible line below a fold, left to the background lexer
+        self.set_lexer(PythonLexer())
+
+    def set_lexer(self, lexer):
+        """Switch lexer and throw away all cached state"""
+        self.lexer = lexer
+        self.stateful = (isinstance(lexer, RegexLexer)
+                         and not isinstance(lexer, ExtendedRegexLexer))
+        self.tag_cache = {}
+        self.reset()
+
+    def reset(self):
+        """Forget every cached line state, e.g. after loading a new file"""
+        count = self.line_count()
+        self.states = [None] * count    # Lexer stack at the start of each line
+        self.tagged = bytearray(count)  # 1 when the line's tags match states[i]
+        if count:
+            self.states[0] = ROOT_STATE
+        self.waiting = None
+        self.frontier = 0       # Lines before this have trusted start states
+        self.candidate_end = 0  # Lines before this have states worth checking
+        self.dirty_end = 0      # No convergence check before this line
+        for tag in HIGHLIGHT_TAGS:
+            self.text_area.tag_remove(tag, '1.0', 'end')
+        self.schedule()
+
+    def line_count(self):
+        return self.editor.document.line_count()
+
+    def get_line(self, lineno):
+        """Text of a 0-based line, with its newline"""
+        return self.editor.document.get_line(lineno) + '\n'
+
+    def get_text(self, first, stop):
+        """Text of 0-based lines first..stop-1, each with its newline"""
+        document = self.editor.document
+        text = document.get_text(document.line_start(first), document.line_start(stop))
+        return text + '\n' if stop >= self.line_count() else text
+
+    def on_edit(self, first, old_last, new_last):
+        """Splice the line caches after lines first..old_last became first..new_last
+
+        Line numbers are 1-based and inclusive, as reported by EditorTab.
+        """
+        start = first - 1
+        removed = old_last - first + 1
+        added = new_last - first + 1
+        # The first edited line keeps its start state, the rest are unknown
+        self.states[start + 1:start + removed] = [None] * (added - 1)
+        self.tagged[start:start + removed] = bytes(added)
+        delta = added - removed
+        if self.candidate_end > start:
+            self.candidate_end = max(self.candidate_end + delta, start + added)
+        if self.frontier > start:
+            self.candidate_end = max(self.candidate_end, self.frontier + delta)
+            self.frontier = start
+        if self.dirty_end > start + removed:
+            self.dirty_end += delta
+        self.dirty_end = max(self.dirty_end, start + added)
+        self.schedule()
+
+    def schedule(self):
+        """Highlight the viewport once the current event has been handled"""
+        self.scheduler.mark('highlight')
+
+    def visible_range(self):
+        """0-based first and last line currently on screen"""
+        top = int(self.text_area.index('@0,0').split('.')[0]) - 1
+        height = self.text_area.winfo_height()
+        bottom = int(self.text_area.index(f'@0,{height}').split('.')[0]) - 1
+        return top, bottom
+
+    def highlight_viewport(self):
+        """Lex and tag whatever is dirty inside the viewport plus margin"""
+        if not self.states:
+            return
+        top, bottom = self.visible_range()
+        first = max(0, top - self.MARGIN)
+        last = min(len(self.states) - 1, bottom + self.MARGIN)
+        segments = [(first, last)]
+        if self.folds is not None and self.folds.folded:
+            segments = self.folds.visible_segments(first, last)
+        for i, (first, last) in enumerate(segments):
+            if i and self.frontier < first:
+                # Lexing through a folded region waits for the background
+                self.waiting = first if self.waiting is None else min(self.waiting, first)
+                break
+            self.highlight_lines(first, last)
+
+        if self.frontier < len(self.states):
+            self.scheduler.mark('lex')
+
+    def highlight_lines(self, first, last):
+        # Bring trusted states up to the window, tagging only inside it
+        if self.frontier <= last:
+            self.advance(last + 1, first, last)
+
+        # Lines behind the frontier that were never tagged (scrolled into view)
+        start = None
+        for lineno in range(first, min(last, self.frontier - 1) + 1):
+            if not self.tagged[lineno]:
+                if start is None:
+                    start = lineno
+            elif start is not None:
+                self.retag(start, lineno - 1)
+                start = None
+        if start is not None:
+            self.retag(start, min(last, self.frontier - 1))
+
+    def lex_in_background(self, deadline):
+        """Carry trusted state further down the file until the deadline"""
+        while self.frontier < len(self.states):
+            if time.perf_counter() >= deadline:
+                return True
+            self.advance(min(len(self.states), self.frontier + self.IDLE_CHUNK), 0, -1)
+            if self.waiting is not None and self.frontier >= self.waiting:
+                self.waiting = None
+                self.schedule()
+        return False
+
+    def advance(self, stop, tag_first, tag_last):
+        """Lex from the frontier up to line stop, tagging lines in the window"""
+        lineno = self.frontier
+        stack = self.states[lineno] or ROOT_STATE
+        batch_start, batch = None, {}
+        converged = False
+        while lineno < stop:
+            tokens, end_stack = self.lex_line(lineno, stack)
+            current = self.tagged[lineno] and self.states[lineno] == stack
+            if tag_first <= lineno <= tag_last and not current:
+                if batch_start is None:
+                    batch_start = lineno
+                self.collect_tags(batch, lineno, tokens)
+                self.tagged[lineno] = 1
+            else:
+                if batch_start is not None:
+                    self.apply_tags(batch_start, lineno - 1, batch)
+                    batch_start, batch = None, {}
+                if not current:
+                    self.tagged[lineno] = 0
+            if self.states[lineno] != stack:
+                self.states[lineno] = stack
+                self.notify_state_change(lineno)
+            lineno += 1
+            stack = end_stack
+            if lineno >= len(self.states):
+                break
+            if (self.dirty_end <= lineno < self.candidate_end
+                    and self.states[lineno] == stack):
+                # The rest was lexed from this very state before the edit
+                if batch_start is not None:
+                    self.apply_tags(batch_start, lineno - 1, batch)
+                    batch_start = None
+                lineno = self.candidate_end
+                converged = True
+                break
+        if batch_start is not None:
+            self.apply_tags(batch_start, lineno - 1, batch)
+        if not converged and lineno < len(self.states):
+            if self.states[lineno] != stack:
+                self.states[lineno] = stack
+                self.tagged[lineno] = 0
+                self.notify_state_change(lineno)
+        self.frontier = lineno
+        if self.frontier >= self.candidate_end:
+            self.candidate_end = 0
+        if self.frontier >= self.dirty_end:
+            self.dirty_end = 0
+
+    def notify_state_change(self, lineno):
+        for callback in self.state_listeners:
+            callback(lineno)
+
+    def retag(self, first, last):
+        """Re-tag lines whose start states are trusted but whose tags are stale"""
+        batch = {}
+        for lineno in range(first, last + 1):
+            tokens, _ = self.lex_line(lineno, self.states[lineno])
+            self.collect_tags(batch, lineno, tokens)
+            self.tagged[lineno] = 1
+        self.apply_tags(first, last, batch)
+
+    def line_tokens(self, lineno):
+        """Tokens of a 0-based line, lexed from its cached state when trusted"""
+        stack = self.states[lineno] if lineno < self.frontier else None
+        tokens, _ = self.lex_line(lineno, stack or ROOT_STATE)
+        return tokens
+
+    def lex_line(self, lineno, stack):
+        """Lex one line starting from stack, returning (tokens, end_stack)
+
+        A single match can run past the newline, e.g. a C block comment, so
+        the lexer sees up to MAX_SPAN lines beyond this one.  When the last
+        match does run on, the next line starts in a span state and is lexed
+        by re-running the lexer from the line where that match began.
+        """
+        if not self.stateful:
+            line = self.get_line(lineno)
+            return list(self.lexer.get_tokens_unprocessed(line)), ROOT_STATE
+        first = lineno
+        if stack[0] == SPAN:
+            first, stack = lineno - stack[1], stack[2:]
+        count = self.line_count()
+        text = self.get_text(first, min(count, lineno + 1 + self.MAX_SPAN))
+        document = self.editor.document
+        base = document.line_start(first)
+        start = document.line_start(lineno) - base
+        end = document.line_start(lineno + 1) - base if lineno + 1 < count else len(text)
+        tokens, end_stack, spans = lex_regex_line(self.lexer, text, stack, start, end)
+        if spans and lineno + 1 - first <= self.MAX_SPAN:
+            end_stack = (SPAN, lineno + 1 - first) + stack
+        return tokens, end_stack
+
+    def tag_for(self, tokentype):
+        tag = self.tag_cache.get(tokentype, False)
+        if tag is False:
+            tag = None
+            for parent, name in TOKEN_TAGS:
+                if tokentype in parent:
+                    tag = name
+                    break
+            self.tag_cache[tokentype] = tag
+        return tag
+
+    def collect_tags(self, batch, lineno, tokens):
+        row = lineno + 1
+        for pos, tokentype, value in tokens:
+            tag = self.tag_for(tokentype)
+            if tag and value.strip():
+                ranges = batch.setdefault(tag, [])
+                ranges.append(f'{row}.{pos}')
+                ranges.append(f'{row}.{pos + len(value.rstrip(chr(10)))}')
+
+    def apply_tags(self, first, last, batch):
+        """Replace highlight tags on lines first..last with one call per tag"""
+        start, end = f'{first + 1}.0', f'{last + 1}.end'
+        for tag in HIGHLIGHT_TAGS:
+            self.text_area.tag_remove(tag, start, end)
+        for tag, ranges in batch.items():
+            self.text_area.tag_add(tag, *ranges)
+
+
+def lex_regex_line(lexer, text, stack, start=0, end=None):
+    """Run a RegexLexer over text from a given state stack
+
+    Mirrors RegexLexer.get_tokens_unprocessed but only returns the tokens
+    inside text[start:end], clipped and relative to start, and stops at end.
+    Also hands back the state stack there, so lexing can resume on the next
+    line, and whether a non-blank match runs on past end.
+    """
+    if end is None:
+        end = len(text)
+    pos = 0
+    spans = False
+    tokens = []
+    tokendefs = lexer._tokens
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    while True:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if m.end() > end and not m.group().isspace():
+                    spans = True
+                if action is not None:
+                    if type(action) is _TokenType:
+                        tokens.append((pos, action, m.group()))
+                    else:
+                        tokens.extend(action(lexer, m))
+                pos = m.end()
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == '#push':
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+        else:
+            if pos >= end:
+                break
+            if text[pos] == '\n':
+                # At EOL with no rule matching, Pygments resets to root
+                statestack = ['root']
+                statetokens = tokendefs['root']
+                tokens.append((pos, Token.Text.Whitespace, '\n'))
+            else:
+                tokens.append((pos, Token.Error, text[pos]))
+            pos += 1
+        if pos >= end:
+            break
+    clipped = []
+    for index, tokentype, value in tokens:
+        if index + len(value) > start and index < end:
+            value = value[max(0, start - index):end - index]
+            clipped.append((max(0, index - start), tokentype, value))
+    return clipped, tuple(statestack), spans
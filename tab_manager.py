@@ -0,0 +1,187 @@
+import json
+import zlib
+from collections import OrderedDict
+
+DEFAULT_MAX_LIVE = 12
+
+
+class UndoLog:
+    """The user's undo and redo stacks of an EditorTab, kept beside Tk's own
+
+    Tk's undo stack dies with the widget, so the tab records each user edit
+    as (start_line, start_col, end_line, end_col, deleted, text) in groups
+    and moves groups between the stacks as Tk undoes and redoes them.  The
+    tab turns Tk's autoseparators off and puts a separator wherever a group
+    starts here, so both sides always agree on the groups.  Runs of typing
+    or deleting on one line share a group, like Tk's autoseparators do.  A
+    group holding an edit too big to keep its text is None: it can be
+    undone while the widget lives, but not rebuilt after hibernating.
+    """
+    def __init__(self):
+        self.undo = []      # Groups, most recent last
+        self.redo = []      # Groups undone, next to redo last
+        self.open = False   # Whether the next edit may join undo[-1]
+
+    def clear(self):
+        self.undo = []
+        self.redo = []
+        self.open = False
+
+    def separate(self):
+        self.open = False
+
+    def begins_group(self, start_line, start_col, end_line, end_col, text):
+        """Whether an edit about to happen needs a separator before it"""
+        if not self.open or not self.undo or self.undo[-1] is None:
+            return True
+        p_line, p_col, p_end_line, p_end_col, p_deleted, p_text = self.undo[-1][-1]
+        if (start_line != p_line or end_line != start_line or p_end_line != p_line
+                or '\n' in text or '\n' in p_text):
+            return True
+        if text and start_col == end_col and p_text and not p_deleted:
+            return start_col != p_col + len(p_text)
+        if not text and start_col != end_col and p_deleted and not p_text:
+            return end_col != p_col and start_col != p_col     # Backspace or Delete
+        return True
+
+    def record(self, edit, new_group):
+        """A user's TextEdit was applied; new_group as begins_group said"""
+        self.redo = []
+        if edit.deleted is None:
+            self.undo.append(None)
+            self.open = False
+            return
+        entry = (edit.start_line, edit.start_col, edit.end_line, edit.end_col,
+                 edit.deleted, edit.text)
+        if new_group:
+            self.undo.append([entry])
+        else:
+            self.undo[-1].append(entry)
+        self.open = True
+
+    def undone(self):
+        self.redo.append(self.undo.pop())
+        self.open = False
+
+    def redone(self):
+        self.undo.append(self.redo.pop())
+        self.open = False
+
+    def pack(self):
+        """Compress the stacks for a hibernating tab and let go of them
+
+        Groups that cannot be rebuilt are dropped along with everything
+        that could only be undone or redone after them.
+        """
+        undo, redo = self.undo, self.redo
+        if None in undo:
+            undo = undo[len(undo) - undo[::-1].index(None):]
+        if None in redo:
+            redo = redo[len(redo) - redo[::-1].index(None):]
+        self.clear()
+        if not undo and not redo:
+            return b''
+        return zlib.compress(json.dumps([undo, redo]).encode())
+
+    def unpack(self, data):
+        self.undo, self.redo = json.loads(zlib.decompress(data)) if data else ([], [])
+        self.open = False
+
+
+class TabSnapshot:
+    """What a hibernated EditorTab needs to look as it did
+
+    The text itself stays in the tab's Document; the snapshot holds the
+    cursor, the scroll position and the packed UndoLog.
+    """
+    def __init__(self, cursor='1.0', view=(0.0, 0.0), undo=b''):
+        self.cursor = cursor
+        self.view = view
+        self.undo = undo
+
+    @classmethod
+    def capture(cls, editor):
+        text_area = editor.text_area
+        return cls(text_area.index('insert'),
+                   (text_area.xview()[0], text_area.yview()[0]), editor.undo_log.pack())
+
+    def restore(self, editor):
+        """Put the view state back on a freshly built, filled editor"""
+        text_area = editor.text_area
+        editor.undo_log.unpack(self.undo)
+        if editor.undo_log.undo or editor.undo_log.redo:
+            editor.tracking = False
+            try:
+                self.replay(text_area, editor.undo_log)
+            finally:
+                editor.tracking = True
+        text_area.mark_set('insert', self.cursor)
+        text_area.xview_moveto(self.view[0])
+        text_area.yview_moveto(self.view[1])
+
+    def replay(self, text_area, log):
+        """Rebuild Tk's undo and redo stacks from the log's groups
+
+        The undo groups are rewound and then redone with undo recording on;
+        the redo groups are applied the same way and undone again.  Both
+        passes bypass edit tracking, so the Document is not touched.
+        """
+        text_area.configure(undo=False)
+        for group in reversed(log.undo):
+            for start_line, start_col, end_line, end_col, deleted, text in reversed(group):
+                last_line = start_line + text.count('\n')
+                last_col = (start_col + len(text) if '\n' not in text
+                            else len(text) - text.rfind('\n') - 1)
+                text_area.replace(f'{start_line + 1}.{start_col}', f'{last_line + 1}.{last_col}',
+                                  deleted)
+        text_area.configure(undo=True)
+        text_area.edit_reset()
+        for group in log.undo + log.redo[::-1]:
+            text_area.edit_separator()
+            for start_line, start_col, end_line, end_col, deleted, text in group:
+                text_area.replace(f'{start_line + 1}.{start_col}',
+                                  f'{end_line + 1}.{end_col}', text)
+        text_area.edit_separator()
+        for _ in log.redo:
+            text_area.edit_undo()
+
+
+class TabManager:
+    """Keeps at most max_live EditorTabs with widgets, least recently used out
+
+    Tabs past the cap are hibernated: their widgets (the Text with its
+    undo stack, tags and marks, the gutter and minimap) are destroyed and
+    only the Document and a TabSnapshot remain.  Activating a hibernated
+    tab rebuilds it and calls on_rehydrate(editor) so the owner can bind
+    its events again.
+    """
+    def __init__(self, max_live=DEFAULT_MAX_LIVE, on_rehydrate=None):
+        self.max_live = max_live
+        self.on_rehydrate = on_rehydrate
+        self.live = OrderedDict()   # EditorTab -> None, most recently used last
+
+    def add(self, editor):
+        self.live[editor] = None
+        self.enforce(keep=editor)
+
+    def remove(self, editor):
+        self.live.pop(editor, None)
+
+    def activate(self, editor):
+        """Make sure editor has its widgets and mark it most recently used"""
+        if editor.hibernated:
+            editor.rehydrate()
+            if self.on_rehydrate is not None:
+                self.on_rehydrate(editor)
+        self.live[editor] = None
+        self.live.move_to_end(editor)
+        self.enforce(keep=editor)
+
+    def enforce(self, keep=None):
+        """Hibernate the least recently used tabs beyond the cap"""
+        for editor in list(self.live):
+            if len(self.live) <= max(1, self.max_live):
+                break
+            if editor is not keep:
+                del self.live[editor]
+                editor.hibernate()
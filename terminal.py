@@ -0,0 +1,506 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import font as tkfont
+import codecs
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+
+try:
+    import pty
+    import fcntl
+    import struct
+    import termios
+except ImportError:
+    pty = None
+
+# CSI (group 1: parameters, group 2: final byte), OSC, an escape with
+# intermediate bytes such as the charset designation ESC ( B, or a two-byte escape
+ESCAPE_RE = re.compile(r'\x1b(?:\[([0-?]*)[ -/]*([@-~])|\][^\x07\x1b]*(?:\x07|\x1b\\)'
+                       r'|[ -/]+[0-~]|[0-Z\\-~])')
+# An escape sequence cut off by the end of a chunk
+PARTIAL_RE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*\x1b?|[ -/]+)?$')
+CONTROL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1a\x1c-\x1f\x7f]')
+
+# Colours 0-15, as VS Code's dark terminal theme draws them
+BASIC_COLORS = ['#000000', '#cd3131', '#0dbc79', '#e5e510', '#2472c8', '#bc3fbc', '#11a8cd', '#e5e5e5',
+                '#666666', '#f14c4c', '#23d18b', '#f5f543', '#3b8eea', '#d670d6', '#29b8db', '#ffffff']
+CUBE_LEVELS = [0, 95, 135, 175, 215, 255]
+
+
+def xterm_color(n):
+    """Hex colour of entry n of the xterm 256-colour palette"""
+    if n < 16:
+        return BASIC_COLORS[n]
+    if n < 232:
+        n -= 16
+        r, g, b = CUBE_LEVELS[n // 36], CUBE_LEVELS[n // 6 % 6], CUBE_LEVELS[n % 6]
+    else:
+        r = g = b = 8 + (n - 232) * 10
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def nearest_color(r, g, b):
+    """Palette entry closest to a 24-bit colour, so tags stay few"""
+    def level(v):
+        return min(range(6), key=lambda i: abs(CUBE_LEVELS[i] - v))
+    return 16 + 36 * level(r) + 6 * level(g) + level(b)
+
+
+class AnsiParser:
+    """Turns terminal output into (text, tags) runs
+
+    SGR colour and style codes become tag names from a small fixed family
+    (fg<n>, bg<n>, bold, underline), so the Text widget reuses the same few
+    tags however much is printed.  Other escape sequences are dropped.
+    State carries over between chunks, including escapes split across
+    them.  A bare carriage return comes back as its own '\\r' run, which
+    the caller turns into overwriting the current line.
+    """
+    def __init__(self):
+        self.rest = ''
+        self.reset()
+
+    def reset(self):
+        self.fg = None
+        self.bg = None
+        self.bold = False
+        self.underline = False
+        self.inverse = False
+
+    def tags(self):
+        fg, bg = (self.bg, self.fg) if self.inverse else (self.fg, self.bg)
+        if self.inverse:
+            fg = 0 if fg is None else fg
+            bg = 7 if bg is None else bg
+        tags = []
+        if fg is not None:
+            tags.append(f'fg{fg + 8 if self.bold and fg < 8 else fg}')
+        if bg is not None:
+            tags.append(f'bg{bg}')
+        if self.bold:
+            tags.append('bold')
+        if self.underline:
+            tags.append('underline')
+        return tuple(tags)
+
+    def feed(self, text):
+        text = self.rest + text
+        self.rest = ''
+        partial = PARTIAL_RE.search(text)
+        if partial:
+            self.rest = text[partial.start():]
+            text = text[:partial.start()]
+        if text.endswith('\r'):
+            self.rest = '\r' + self.rest   # Might be the first half of \r\n
+            text = text[:-1]
+        text = text.replace('\r\n', '\n')
+        runs = []
+        position = 0
+        for match in ESCAPE_RE.finditer(text):
+            self.add_text(runs, text[position:match.start()])
+            position = match.end()
+            if match.group(2) == 'm':
+                self.select_graphic_rendition(match.group(1))
+        self.add_text(runs, text[position:])
+        return runs
+
+    def add_text(self, runs, text):
+        text = CONTROL_RE.sub('', text)
+        if not text:
+            return
+        tags = self.tags()
+        for i, piece in enumerate(text.split('\r')):
+            if i:
+                runs.append(('\r', ()))
+            if piece:
+                runs.append((piece, tags))
+
+    def select_graphic_rendition(self, parameters):
+        codes = [int(code) if code.isdigit() else 0
+                 for code in parameters.replace(':', ';').split(';')]
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            if code == 0:
+                self.reset()
+            elif code == 1:
+                self.bold = True
+            elif code == 4:
+                self.underline = True
+            elif code == 7:
+                self.inverse = True
+            elif code == 22:
+                self.bold = False
+            elif code == 24:
+                self.underline = False
+            elif code == 27:
+                self.inverse = False
+            elif 30 <= code <= 37:
+                self.fg = code - 30
+            elif 90 <= code <= 97:
+                self.fg = code - 90 + 8
+            elif code == 39:
+                self.fg = None
+            elif 40 <= code <= 47:
+                self.bg = code - 40
+            elif 100 <= code <= 107:
+                self.bg = code - 100 + 8
+            elif code == 49:
+                self.bg = None
+            elif code in (38, 48) and i + 1 < len(codes):
+                color = None
+                if codes[i + 1] == 5 and i + 2 < len(codes):
+                    color = min(codes[i + 2], 255)
+                    i += 2
+                elif codes[i + 1] == 2 and i + 4 < len(codes):
+                    color = nearest_color(*(min(v, 255) for v in codes[i + 2:i + 5]))
+                    i += 4
+                if code == 38:
+                    self.fg = color
+                else:
+                    self.bg = color
+            i += 1
+
+
+def default_shell():
+    if os.name == 'nt':
+        return [os.environ.get('COMSPEC', 'cmd.exe')]
+    return [os.environ.get('SHELL', '/bin/sh')]
+
+
+class ShellSession:
+    """One persistent shell on a pseudo-terminal, read on a background thread
+
+    Output arrives on `output` as decoded text chunks, with None once the
+    shell has exited.  Where there are no pseudo-terminals (Windows) the
+    shell runs on plain pipes instead.
+    """
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, cwd=None, command=None):
+        self.cwd = cwd or os.getcwd()
+        self.command = command or default_shell()
+        self.output = queue.Queue()
+        self.process = None
+        self.pid = None
+        self.fd = None
+        self.uses_pty = pty is not None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.thread = None
+
+    def start(self):
+        # SGR colours are rendered, so let programs know they may use them
+        env = dict(os.environ, TERM='xterm-256color', PAGER='cat', GIT_PAGER='cat')
+        if self.uses_pty:
+            self.pid, self.fd = pty.fork()
+            if self.pid == 0:
+                # Child: become the shell, the pty is already our controlling terminal
+                try:
+                    os.chdir(self.cwd)
+                    os.execvpe(self.command[0], self.command, env)
+                finally:
+                    os._exit(127)
+        else:
+            flags = getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0)
+            self.process = subprocess.Popen(self.command, cwd=self.cwd, env=env,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT, creationflags=flags)
+            self.pid = self.process.pid
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def read_loop(self):
+        """Thread body: push output chunks until the shell goes away"""
+        while True:
+            try:
+                if self.uses_pty:
+                    data = os.read(self.fd, self.READ_SIZE)
+                else:
+                    data = self.process.stdout.read1(self.READ_SIZE)
+            except OSError:
+                data = b''  # EIO once the pty's other side is closed
+            if not data:
+                break
+            self.output.put(self.decoder.decode(data))
+        self.output.put(None)
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        try:
+            if self.uses_pty:
+                os.write(self.fd, data)
+            else:
+                self.process.stdin.write(data.replace(b'\n', os.linesep.encode()))
+                self.process.stdin.flush()
+        except OSError:
+            pass
+
+    def interrupt(self):
+        """Ctrl-C for the command running in the foreground"""
+        try:
+            if self.uses_pty:
+                os.write(self.fd, b'\x03')  # The tty turns this into SIGINT
+            elif os.name == 'nt':
+                self.process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                self.process.send_signal(signal.SIGINT)
+        except (OSError, ValueError):
+            pass
+
+    def resize(self, rows, cols):
+        if self.uses_pty and self.fd is not None:
+            try:
+                fcntl.ioctl(self.fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+            except OSError:
+                pass
+
+    def close(self):
+        """Hang up on the shell and reap it"""
+        if self.uses_pty:
+            if self.fd is not None:
+                try:
+                    os.kill(self.pid, signal.SIGHUP)
+                except OSError:
+                    pass
+                try:
+                    os.close(self.fd)
+                except OSError:
+                    pass
+                self.fd = None
+                # Reap it without blocking Tk
+                threading.Thread(target=self.reap, daemon=True).start()
+        elif self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def reap(self):
+        try:
+            os.waitpid(self.pid, 0)
+        except ChildProcessError:
+            pass
+
+
+class Terminal(ttk.Frame):
+    """A terminal tab: output view, command line and one ShellSession
+
+    Output is drained from the session queue every POLL_MS and inserted in
+    one call per tick (at most MAX_CHUNK characters), so a chatty build
+    never starves the Tk event loop.  The widget is a ring of at most
+    MAX_LINES lines of scrollback: once it overflows, the oldest lines
+    plus TRIM_LINES more are deleted in a single call, so trimming happens
+    rarely and inserts stay cheap however long the shell runs.
+    """
+    POLL_MS = 30
+    MAX_CHUNK = 256 * 1024
+    MAX_LINES = 10000
+    TRIM_LINES = 1000
+
+    def __init__(self, parent, cwd=None):
+        super().__init__(parent)
+        self.cwd = cwd
+        self.session = None
+        self.poll_job = None
+        self.backlog = []
+        self.exited = False
+        self.parser = AnsiParser()
+        self.styled = set()     # Tags already configured on the output widget
+        self.create_widgets()
+        self.start_shell()
+
+    def create_widgets(self):
+        self.output = tk.Text(self,
+            bg='#1e1e1e',
+            fg='#d4d4d4',
+            insertbackground='#d4d4d4',
+            font=('Consolas', 10),
+            wrap='char')
+        scroll = ttk.Scrollbar(self, orient='vertical', command=self.output.yview)
+        self.output.configure(yscrollcommand=scroll.set)
+
+        cmd_frame = ttk.Frame(self)
+        cmd_frame.pack(side='bottom', fill='x')
+        scroll.pack(side='right', fill='y')
+        self.output.pack(fill='both', expand=True)
+
+        ttk.Label(cmd_frame, text="➜").pack(side='left')
+        self.cmd_input = ttk.Entry(cmd_frame)
+        self.cmd_input.pack(side='left', fill='x', expand=True)
+        self.cmd_input.bind('<Return>', lambda e: self.send_input())
+        self.cmd_input.bind('<Control-c>', self.on_control_c)
+        ttk.Button(cmd_frame, text="^C", width=3, command=self.interrupt).pack(side='left')
+
+        self.output.bind('<Key>', lambda e: 'break' if e.char and e.state & 4 == 0 else None)
+        self.output.bind('<Configure>', lambda e: self.resize())
+        self.font = tkfont.Font(font=self.output.cget('font'))
+
+    def start_shell(self):
+        try:
+            self.session = ShellSession(self.cwd).start()
+            self.exited = False
+            self.parser = AnsiParser()
+        except Exception as e:
+            self.append(f"Error: {str(e)}\n")
+            self.session = None
+            return
+        self.resize()
+        self.schedule_poll()
+
+    def schedule_poll(self):
+        if self.poll_job is None:
+            self.poll_job = self.after(self.POLL_MS, self.poll)
+
+    def poll(self):
+        """Move whatever the reader thread produced into the widget"""
+        self.poll_job = None
+        session = self.session
+        if session is None:
+            return
+        size = sum(len(chunk) for chunk in self.backlog)
+        while size < self.MAX_CHUNK and not self.exited:
+            try:
+                chunk = session.output.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.exited = True
+                break
+            self.backlog.append(chunk)
+            size += len(chunk)
+        if self.backlog:
+            text = ''.join(self.backlog)
+            self.backlog = [text[self.MAX_CHUNK:]] if len(text) > self.MAX_CHUNK else []
+            self.append(text[:self.MAX_CHUNK])
+        if self.exited and not self.backlog:
+            session.close()
+            self.session = None
+            self.append("\n[Process exited - press Enter to restart]\n")
+            return
+        self.schedule_poll()
+
+    def append(self, text):
+        at_bottom = self.output.yview()[1] >= 1.0
+        args = []
+        for run, tags in self.parser.feed(text):
+            if run == '\r':
+                # Carriage return: the next text replaces the current line
+                self.flush(args)
+                self.output.delete('end-1c linestart', 'end-1c')
+                continue
+            for tag in tags:
+                if tag not in self.styled:
+                    self.style_tag(tag)
+            args += (run, tags)
+        self.flush(args)
+        self.trim()
+        if at_bottom:
+            self.output.see('end')
+
+    def flush(self, args):
+        """Insert collected (text, tags) runs with one widget call"""
+        if args:
+            self.output.insert('end', *args)
+            args.clear()
+
+    def style_tag(self, tag):
+        if tag == 'bold':
+            bold = self.font.copy()
+            bold.configure(weight='bold')
+            self.output.tag_configure(tag, font=bold)
+        elif tag == 'underline':
+            self.output.tag_configure(tag, underline=True)
+        elif tag.startswith('fg'):
+            self.output.tag_configure(tag, foreground=xterm_color(int(tag[2:])))
+        else:
+            self.output.tag_configure(tag, background=xterm_color(int(tag[2:])))
+            self.output.tag_lower(tag)
+        self.styled.add(tag)
+
+    def trim(self):
+        """Drop the oldest lines in bulk once scrollback overflows"""
+        lines = int(self.output.index('end-1c').split('.')[0])
+        if lines > self.MAX_LINES:
+            excess = lines - self.MAX_LINES + self.TRIM_LINES
+            self.output.delete('1.0', f'{excess + 1}.0')
+
+    def send_input(self):
+        command = self.cmd_input.get()
+        self.cmd_input.delete(0, tk.END)
+        self.run(command)
+
+    def run(self, command):
+        """Type a command line into the shell"""
+        if self.session is None:
+            self.start_shell()
+            if self.session is None:
+                return
+        if not self.session.uses_pty:
+            self.append(command + '\n')  # Pipes do not echo
+        self.session.write(command + '\n')
+
+    def on_control_c(self, event):
+        if self.cmd_input.selection_present():
+            return None  # Let Ctrl-C copy the selection
+        self.interrupt()
+        return 'break'
+
+    def interrupt(self):
+        if self.session is not None:
+            self.session.interrupt()
+
+    def resize(self):
+        if self.session is None:
+            return
+        width = max(1, self.output.winfo_width() // max(1, self.font.measure('0')))
+        height = max(1, self.output.winfo_height() // max(1, self.font.metrics('linespace')))
+        self.session.resize(height, width)
+
+    def destroy(self):
+        if self.poll_job is not None:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        super().destroy()
+
+
+class TerminalPanel(ttk.Frame):
+    """Bottom-panel host for any number of Terminal tabs"""
+    def __init__(self, parent, cwd_getter=None):
+        super().__init__(parent)
+        self.cwd_getter = cwd_getter or (lambda: None)
+        self.count = 0
+
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill='x')
+        ttk.Button(toolbar, text="+ New Terminal", command=self.new_terminal).pack(side='left')
+        ttk.Button(toolbar, text="Kill Terminal", command=self.close_terminal).pack(side='left')
+
+        self.tabs = ttk.Notebook(self)
+        self.tabs.pack(fill='both', expand=True)
+        self.new_terminal()
+
+    def new_terminal(self):
+        self.count += 1
+        terminal = Terminal(self.tabs, self.cwd_getter())
+        self.tabs.add(terminal, text=f"{os.path.basename(default_shell()[0])} {self.count}")
+        self.tabs.select(terminal)
+        return terminal
+
+    def current(self):
+        selected = self.tabs.select()
+        return self.nametowidget(selected) if selected else None
+
+    def close_terminal(self):
+        terminal = self.current()
+        if terminal is not None:
+            terminal.destroy()
+
+    def run(self, command):
+        """Run a command in the selected terminal, opening one if needed"""
+        terminal = self.current() or self.new_terminal()
+        terminal.run(command)
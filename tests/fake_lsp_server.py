@@ -0,0 +1,114 @@
+"""A small stdio language server for testing lsp_client
+
+Keeps the text of every open document by applying didChange ranges
+(UTF-16 positions), publishes a warning for each 'TODO' and answers
+completion with fixed items.  The custom 'fake/state' request returns the
+texts it holds and how many incremental changes it was sent.
+"""
+import json
+import sys
+
+COMPLETIONS = [{'label': 'print'}, {'label': 'property', 'insertText': 'property'}]
+
+
+def read_message(stream):
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode('ascii').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return json.loads(stream.read(length))
+
+
+def send(payload):
+    body = json.dumps(payload).encode('utf-8')
+    sys.stdout.buffer.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    sys.stdout.buffer.flush()
+
+
+def utf16_column(line, units):
+    col = 0
+    while col < len(line) and units > 0:
+        units -= 2 if ord(line[col]) > 0xFFFF else 1
+        col += 1
+    return col
+
+
+def utf16_units(text):
+    return sum(2 if ord(char) > 0xFFFF else 1 for char in text)
+
+
+def offset_of(text, position):
+    lines = text.split('\n')
+    line = position['line']
+    return (sum(len(other) + 1 for other in lines[:line])
+            + utf16_column(lines[line], position['character']))
+
+
+def apply_changes(text, changes):
+    for change in changes:
+        if 'range' not in change:
+            text = change['text']
+            continue
+        start = offset_of(text, change['range']['start'])
+        end = offset_of(text, change['range']['end'])
+        text = text[:start] + change['text'] + text[end:]
+    return text
+
+
+def diagnostics(text):
+    found = []
+    for number, line in enumerate(text.split('\n')):
+        if 'TODO' in line:
+            start = utf16_units(line[:line.index('TODO')])
+            found.append({'range': {'start': {'line': number, 'character': start},
+                                    'end': {'line': number, 'character': start + 4}},
+                          'severity': 2, 'message': 'todo left in'})
+    return found
+
+
+def main():
+    texts = {}
+    incremental = 0
+    while True:
+        message = read_message(sys.stdin.buffer)
+        if message is None:
+            break
+        method = message.get('method')
+        params = message.get('params') or {}
+        if method == 'initialize':
+            send({'jsonrpc': '2.0', 'id': message['id'],
+                  'result': {'capabilities': {'textDocumentSync': 2, 'completionProvider': {}}}})
+            # Servers ask for settings; the client must answer
+            send({'jsonrpc': '2.0', 'id': 'config', 'method': 'workspace/configuration',
+                  'params': {'items': [{'section': 'fake'}]}})
+        elif method == 'textDocument/didOpen':
+            document = params['textDocument']
+            texts[document['uri']] = document['text']
+        elif method == 'textDocument/didChange':
+            uri = params['textDocument']['uri']
+            changes = params['contentChanges']
+            incremental += sum('range' in change for change in changes)
+            texts[uri] = apply_changes(texts[uri], changes)
+            send({'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics',
+                  'params': {'uri': uri, 'version': params['textDocument']['version'],
+                             'diagnostics': diagnostics(texts[uri])}})
+        elif method == 'textDocument/completion':
+            send({'jsonrpc': '2.0', 'id': message['id'], 'result': {'items': COMPLETIONS}})
+        elif method == 'fake/state':
+            send({'jsonrpc': '2.0', 'id': message['id'],
+                  'result': {'texts': texts, 'incremental': incremental}})
+        elif method == 'shutdown':
+            send({'jsonrpc': '2.0', 'id': message['id'], 'result': None})
+        elif method == 'exit':
+            break
+
+
+if __name__ == '__main__':
+    main()
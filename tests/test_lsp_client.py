@@ -0,0 +1,143 @@
+import os
+import random
+import sys
+import time
+
+import pytest
+
+from diagnostics import Linter
+from document import Document
+from lsp_client import LspManager
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_lsp_server.py')
+
+
+class FakeText:
+    def tag_configure(self, *args, **options):
+        pass
+
+    def tag_add(self, *args):
+        pass
+
+    def tag_remove(self, *args):
+        pass
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.marked = []
+
+    def add_task(self, name, callback, delay=0):
+        pass
+
+    def mark(self, name):
+        self.marked.append(name)
+
+
+class FakeEditor:
+    """Just enough of an EditorTab (and of Tk's after) for lsp_client"""
+    def __init__(self, path, text=''):
+        self.file_path = path
+        self.filename = os.path.basename(path)
+        self.document = Document(text)
+        self.hibernated = False
+        self.lsp = None
+        self.diagnostics = {}
+        self.text_area = FakeText()
+        self.scheduler = FakeScheduler()
+        self.linter = Linter(self, None)
+        self.linter.python = True
+        self.applied = []
+        self.linter.apply = self.applied.append
+        self.jobs = {}
+        self.next_job = 0
+
+    def after(self, ms, callback):
+        self.next_job += 1
+        self.jobs[self.next_job] = callback
+        return self.next_job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run_pending(self):
+        jobs, self.jobs = self.jobs, {}
+        for callback in jobs.values():
+            callback()
+
+
+def wait_for(editor, predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        editor.run_pending()
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def served(tmp_path):
+    """(manager, editor) with the editor's file open in the fake server"""
+    editor = FakeEditor(str(tmp_path / 'module.py'), "import os\nprint('é😀')\n")
+    manager = LspManager(editor, {'python': (('.py',), [sys.executable, SERVER])},
+                         root_getter=lambda: str(tmp_path))
+    manager.attach(editor)
+    wait_for(editor, lambda: editor.lsp.opened)
+    yield manager, editor
+    manager.shutdown()
+
+
+def server_state(editor):
+    return editor.lsp.client.connection.request('fake/state').result(timeout=5)
+
+
+def test_edits_are_synced_incrementally(served):
+    manager, editor = served
+    document = editor.document
+    rng = random.Random(7)
+    for i in range(200):
+        start_line = rng.randrange(document.line_count())
+        end_line = min(document.line_count() - 1, start_line + rng.choice([0, 0, 1]))
+        start_col = rng.randrange(len(document.get_line(start_line)) + 1)
+        if end_line == start_line:
+            end_col = rng.randrange(start_col, len(document.get_line(end_line)) + 1)
+        else:
+            end_col = rng.randrange(len(document.get_line(end_line)) + 1)
+        text = rng.choice(['a', '😀', '\n', 'é\nb', ''])
+        document.replace_range(start_line, start_col, end_line, end_col, text)
+        if i % 25 == 0:
+            editor.run_pending()
+    editor.run_pending()
+    state = server_state(editor)
+    assert state['texts'][editor.lsp.uri] == document.get_text()
+    assert state['incremental'] > 0
+
+
+def test_diagnostics_use_character_columns(served):
+    manager, editor = served
+    editor.document.replace_range(2, 0, 2, 0, "x = '😀'  # TODO\n")
+    wait_for(editor, lambda: editor.lsp.diagnostics)
+    assert editor.lsp.diagnostics == [(2, 11, 'warning', 'todo left in')]
+    assert editor.applied[-1] == editor.lsp.diagnostics
+
+
+def test_completions(served):
+    manager, editor = served
+    words = []
+    editor.lsp.complete(1, 2, words.append)
+    wait_for(editor, lambda: words)
+    assert words == [['print', 'property']]
+
+
+def test_linter_falls_back_when_the_server_is_not_running(served, tmp_path):
+    manager, editor = served
+    assert editor.linter.served()
+    broken = FakeEditor(str(tmp_path / 'other.py'))
+    manager = LspManager(broken, {'python': (('.py',), [sys.executable, '-c', 'pass'])})
+    manager.attach(broken)
+    try:
+        wait_for(broken, lambda: broken.lsp.client.status != 'starting')
+        assert not broken.linter.served()
+        assert 'lint' in broken.scheduler.marked
+    finally:
+        manager.shutdown()
@@ -0,0 +1,77 @@
+import math
+
+from pygments.lexers import CLexer
+from pygments.token import Comment, Keyword
+
+from document import Document
+from syntax_highlighter import SyntaxHighlighter
+
+SOURCE = '''int a = 1;
+/* a block comment
+   int b = (2;
+   that ends here */ int c = 3;
+int d = 4;
+'''
+
+
+class FakeText:
+    def tag_add(self, *args):
+        pass
+
+    def tag_remove(self, *args):
+        pass
+
+    def index(self, spec):
+        return '1.0'
+
+    def winfo_height(self):
+        return 0
+
+
+class FakeScheduler:
+    def add_task(self, name, callback, **options):
+        pass
+
+    def mark(self, name):
+        pass
+
+
+class FakeEditor:
+    """Just enough of an EditorTab for the highlighter"""
+    def __init__(self, text):
+        self.document = Document(text)
+        self.text_area = FakeText()
+        self.scheduler = FakeScheduler()
+
+
+def lexed(text):
+    editor = FakeEditor(text)
+    highlighter = SyntaxHighlighter(editor)
+    highlighter.set_lexer(CLexer())
+    highlighter.lex_in_background(math.inf)
+    return editor, highlighter
+
+
+def kinds(highlighter, lineno):
+    """(text, token type) of the non-blank tokens on a 0-based line"""
+    return [(value.strip(), tokentype) for _, tokentype, value in highlighter.line_tokens(lineno)
+            if value.strip()]
+
+
+def test_block_comment_spans_lines():
+    _, highlighter = lexed(SOURCE)
+    assert kinds(highlighter, 1) == [('/* a block comment', Comment.Multiline)]
+    assert kinds(highlighter, 2) == [('int b = (2;', Comment.Multiline)]
+    assert kinds(highlighter, 3)[0] == ('that ends here */', Comment.Multiline)
+    assert ('int', Keyword.Type) in kinds(highlighter, 3)
+    assert kinds(highlighter, 4)[0] == ('int', Keyword.Type)
+
+
+def test_closing_a_comment_relexes_the_lines_below():
+    editor, highlighter = lexed(SOURCE)
+    editor.document.replace_range(2, 0, 2, 0, '*/')
+    highlighter.on_edit(2, 2, 2)
+    highlighter.lex_in_background(math.inf)
+    assert kinds(highlighter, 2)[0] == ('*/', Comment.Multiline)
+    assert ('int', Keyword.Type) in kinds(highlighter, 2)
+    assert kinds(highlighter, 3)[0][1] not in Comment
@@ -0,0 +1,357 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+INDEX_DIR = '.quantam'
+INDEX_FILE = 'trigrams.idx'
+INDEX_MAGIC = b'QTRIGRAM\n'
+SKIP_DIRS = {'.git', '.hg', '.svn', INDEX_DIR}
+
+
+def make_index_dir(root):
+    """Create the project's .quantam directory, ignored by git, and return its path
+
+    It holds indexes and replace journals with copies of file contents,
+    none of which belongs in a commit.
+    """
+    directory = os.path.join(root, INDEX_DIR)
+    os.makedirs(directory, exist_ok=True)
+    ignore = os.path.join(directory, '.gitignore')
+    if not os.path.exists(ignore):
+        try:
+            with open(ignore, 'w') as file:
+                file.write('*\n')
+        except OSError:
+            pass
+    return directory
+
+
+def trigrams_of(data):
+    """Set of lower-cased byte trigrams in data"""
+    data = data.lower()
+    return {data[i:i + 3] for i in range(len(data) - 2)}
+
+
+def required_literals(pattern):
+    """Literal strings every match of a regex must contain
+
+    Walks the parsed pattern and collects the runs of plain characters that
+    sit on the regex's mandatory path; anything optional or alternating
+    ends a run.  An empty list means the regex cannot narrow the search.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    literals = []
+
+    def walk(items):
+        run = []
+        for op, arg in items:
+            name = str(op)
+            if name == 'LITERAL':
+                run.append(chr(arg))
+                continue
+            if len(run) >= 3:
+                literals.append(''.join(run))
+            run = []
+            if name == 'SUBPATTERN':
+                if not arg[1] & re.IGNORECASE:
+                    walk(arg[-1])
+            elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') and arg[0] >= 1:
+                walk(arg[2])
+        if len(run) >= 3:
+            literals.append(''.join(run))
+
+    walk(parsed)
+    if parsed.state.flags & re.IGNORECASE:
+        # Trigrams are only case-folded for ASCII
+        literals = [literal for literal in literals if literal.isascii()]
+    return literals
+
+
+class TrigramIndex:
+    """Persistent trigram index of a project's files for search_in_files
+
+    Every indexed file gets an id and each lower-cased byte trigram maps to a
+    sorted array of the ids of files containing it.  A query is narrowed to
+    the files holding all of its trigrams before any file is opened, so
+    only a handful of candidates are read and verified.  The index lives in
+    .quantam/ inside the project and is brought up to date incrementally by
+    comparing mtimes and sizes; changed files get a fresh id and their old
+    one is tombstoned until the next compaction.
+
+    The file holds data only, never pickles, since it comes with whatever
+    project is opened: a JSON header line and then every posting list's
+    ids as raw array bytes.  Anything that does not validate is ignored
+    and the index is rebuilt.
+    """
+    VERSION = 2
+    MAX_FILE = 8 << 20      # Bigger files are always candidates, never indexed
+    REFRESH_SECONDS = 30    # How stale the index may get between searches
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, INDEX_DIR, INDEX_FILE)
+        self.files = {}         # Relative path -> (id, mtime_ns, size)
+        self.names = {}         # Live id -> relative path
+        self.postings = {}      # Trigram -> array of ids
+        self.unindexed = set()  # Ids of files too big to index
+        self.dead = 0           # Tombstoned ids still in postings
+        self.next_id = 0
+        self.refreshed = 0
+        self.dirty = False
+        self.watched = False    # A FileWatcher feeds changes, so no rescans are needed
+        self.backlog = []       # Change sets waiting for the lock
+        self.lock = threading.RLock()   # Held while a search thread uses the index
+        self.load()
+
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                if file.readline() != INDEX_MAGIC:
+                    return
+                state = json.loads(file.readline())
+                data = file.read()
+            loaded = self.parse_state(state, data)
+        except (OSError, ValueError, TypeError, KeyError, OverflowError):
+            return
+        if loaded is not None:
+            self.files, self.postings, self.unindexed, self.dead, self.next_id = loaded
+            self.names = {entry[0]: name for name, entry in self.files.items()}
+
+    def parse_state(self, state, data):
+        """Validated (files, postings, unindexed, dead, next_id) of a saved index, or None"""
+        ids = array('I')
+        if (not isinstance(state, dict) or state.get('version') != self.VERSION
+                or state.get('byteorder') != sys.byteorder
+                or state.get('itemsize') != ids.itemsize):
+            return None
+        next_id, dead = state['next_id'], state['dead']
+        if not (type(next_id) is int and type(dead) is int and 0 <= dead and 0 <= next_id < 1 << 32):
+            return None
+        files = {}
+        for name, file_id, mtime, size in state['files']:
+            if not (isinstance(name, str) and type(file_id) is int and type(mtime) is int
+                    and type(size) is int and 0 <= file_id < next_id):
+                return None
+            # Only plain paths below the project: the file may have been tampered with
+            if os.path.isabs(name) or os.pardir in name.split(os.sep):
+                return None
+            files[name] = (file_id, mtime, size)
+        unindexed = set(state['unindexed'])
+        if not all(type(i) is int for i in unindexed):
+            return None
+        trigrams, counts = state['trigrams'].encode('latin-1'), state['counts']
+        if (len(trigrams) != 3 * len(counts) or not all(type(n) is int and n > 0 for n in counts)
+                or sum(counts) * ids.itemsize != len(data)):
+            return None
+        ids.frombytes(data)
+        postings = {}
+        offset = 0
+        for i, count in enumerate(counts):
+            postings[trigrams[3 * i:3 * i + 3]] = ids[offset:offset + count]
+            offset += count
+        return files, postings, unindexed, dead, next_id
+
+    def save(self):
+        """Write the index atomically if anything changed"""
+        if not self.dirty:
+            return
+        trigrams = list(self.postings)
+        state = {'version': self.VERSION, 'byteorder': sys.byteorder,
+                 'itemsize': array('I').itemsize, 'next_id': self.next_id, 'dead': self.dead,
+                 'files': [[name, *entry] for name, entry in self.files.items()],
+                 'unindexed': sorted(self.unindexed),
+                 'trigrams': b''.join(trigrams).decode('latin-1'),
+                 'counts': [len(self.postings[trigram]) for trigram in trigrams]}
+        make_index_dir(self.root)
+        temp = self.path + '.tmp'
+        with open(temp, 'wb') as file:
+            file.write(INDEX_MAGIC)
+            file.write(json.dumps(state, separators=(',', ':')).encode('ascii') + b'\n')
+            for trigram in trigrams:
+                self.postings[trigram].tofile(file)
+        os.replace(temp, self.path)
+        self.dirty = False
+
+    # Keeping up to date
+
+    def walk(self):
+        """Yield (relative path, stat) for every file in the project"""
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        yield os.path.relpath(entry.path, self.root), entry.stat()
+                except OSError:
+                    continue
+
+    def refresh(self, force=False):
+        """Re-index files whose mtime or size changed and drop deleted ones"""
+        self.apply_backlog()
+        if not force and self.refreshed and (
+                self.watched or time.time() - self.refreshed < self.REFRESH_SECONDS):
+            self.save()
+            return
+        seen = set()
+        for name, stat in self.walk():
+            seen.add(name)
+            entry = self.files.get(name)
+            if entry is None or entry[1:] != (stat.st_mtime_ns, stat.st_size):
+                self.update_file(name, stat)
+        for name in [name for name in self.files if name not in seen]:
+            self.remove_file(name)
+        if self.dead > len(self.files):
+            self.compact()
+        self.refreshed = time.time()
+        self.save()
+
+    def apply_changes(self, change_set):
+        """FileWatcher subscriber: queue the paths that changed for re-indexing
+
+        Called on the Tk thread, so nothing is read here: the next search
+        applies the backlog on its own thread when it refreshes the index.
+        """
+        self.watched = True
+        self.backlog.append(change_set)
+
+    def apply_backlog(self):
+        while self.backlog:
+            change_set = self.backlog.pop(0)
+            if change_set.overflow:
+                self.refreshed = 0  # Events were lost: walk the tree next time
+            for name, kind in change_set.changes.items():
+                if kind == 'deleted':
+                    # A deleted or moved directory takes everything below it along
+                    prefix = name + os.sep
+                    for other in [other for other in self.files if other.startswith(prefix)]:
+                        self.remove_file(other)
+                    self.remove_file(name)
+                elif os.path.isfile(os.path.join(self.root, name)):
+                    self.update_file(name)
+
+    def update_file(self, name, stat=None):
+        """(Re-)index one file given its path relative to the project"""
+        path = os.path.join(self.root, name)
+        self.remove_file(name)
+        try:
+            stat = stat or os.stat(path)
+            data = b''
+            if stat.st_size <= self.MAX_FILE:
+                with open(path, 'rb') as file:
+                    data = file.read()
+        except OSError:
+            return
+        file_id = self.next_id
+        self.next_id += 1
+        self.files[name] = (file_id, stat.st_mtime_ns, stat.st_size)
+        self.names[file_id] = name
+        if stat.st_size > self.MAX_FILE:
+            self.unindexed.add(file_id)
+        elif b'\0' not in data[:8192]:
+            # Ids only grow, so appending keeps every posting list sorted.
+            # Binary files get no postings and so never become candidates.
+            for trigram in trigrams_of(data):
+                ids = self.postings.get(trigram)
+                if ids is None:
+                    ids = self.postings[trigram] = array('I')
+                ids.append(file_id)
+        self.dirty = True
+
+    def remove_file(self, name):
+        entry = self.files.pop(name, None)
+        if entry is not None:
+            del self.names[entry[0]]
+            if entry[0] in self.unindexed:
+                self.unindexed.discard(entry[0])
+            else:
+                self.dead += 1
+            self.dirty = True
+
+    def compact(self):
+        """Drop tombstoned ids from the posting lists"""
+        live = self.names
+        for trigram, ids in list(self.postings.items()):
+            kept = array('I', (i for i in ids if i in live))
+            if kept:
+                self.postings[trigram] = kept
+            else:
+                del self.postings[trigram]
+        self.dead = 0
+        self.dirty = True
+
+    # Querying
+
+    def candidates(self, literals):
+        """Relative paths that may contain all of the given literal strings"""
+        trigrams = set()
+        for literal in literals:
+            trigrams |= trigrams_of(literal.encode('utf-8'))
+        if not trigrams:
+            return sorted(self.files)
+        postings = []
+        for trigram in trigrams:
+            ids = self.postings.get(trigram)
+            if ids is None:
+                postings = []
+                break
+            postings.append(ids)
+        ids = set()
+        if postings:
+            postings.sort(key=len)
+            ids = set(postings[0])
+            for other in postings[1:]:
+                ids.intersection_update(other)
+                if not ids:
+                    break
+        ids |= self.unindexed
+        return sorted(self.names[i] for i in ids if i in self.names)
+
+    def search(self, query, regex=False, limit=None):
+        """Yield (relative path, line number, line) for every matching line"""
+        if regex:
+            try:
+                pattern = re.compile(query)
+            except re.error:
+                return
+            literals = required_literals(query)
+            matches = pattern.search
+        else:
+            if not query:
+                return
+            literals = [query]
+            matches = lambda line: query in line
+        self.refresh()
+        found = 0
+        for name in self.candidates(literals):
+            try:
+                with open(os.path.join(self.root, name), 'r', errors='replace') as file:
+                    for i, line in enumerate(file, 1):
+                        if matches(line):
+                            yield name, i, line.strip()
+                            found += 1
+                            if limit and found >= limit:
+                                return
+            except OSError:
+                continue